@@ -0,0 +1,129 @@
+# agents/blob_store.py
+
+import contextlib
+import hashlib
+import os
+import threading
+import zlib
+
+# Key marking a details value that was moved to the blob store
+BLOB_REF_KEY = "$blob"
+DIGEST_PREFIX = "sha256:"
+
+
+class BlobStore:
+    """
+    Base class for content-addressed blob stores. Blobs are keyed by the
+    SHA-256 digest of their uncompressed content, so identical payloads are
+    stored once no matter how many events reference them.
+    """
+
+    def put(self, data: bytes) -> str:
+        """
+        Stores `data` (if not already present) and returns its digest ("sha256:<hex>").
+        """
+        digest = DIGEST_PREFIX + hashlib.sha256(data).hexdigest()
+        if not self.exists(digest):
+            self._write(digest, zlib.compress(data, 6))
+        return digest
+
+    def get(self, digest: str) -> bytes:
+        """
+        Returns the content of a blob.
+
+        Raises:
+            KeyError: If no blob with this digest exists.
+        """
+        return zlib.decompress(self._read(digest))
+
+    def exists(self, digest: str) -> bool:
+        raise NotImplementedError
+
+    def _write(self, digest: str, compressed: bytes):
+        raise NotImplementedError
+
+    def _read(self, digest: str) -> bytes:
+        raise NotImplementedError
+
+
+class LocalBlobStore(BlobStore):
+    """
+    Stores zlib-compressed blobs in a local directory, sharded by digest prefix
+    (e.g. `ab/cd/abcd...`).
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, digest: str) -> str:
+        hex_digest = digest[len(DIGEST_PREFIX) :] if digest.startswith(DIGEST_PREFIX) else digest
+        return os.path.join(self.root, hex_digest[:2], hex_digest[2:4], hex_digest)
+
+    def exists(self, digest: str) -> bool:
+        return os.path.exists(self._path(digest))
+
+    def _write(self, digest: str, compressed: bytes):
+        path = self._path(digest)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(compressed)
+        os.replace(tmp_path, path)  # Atomic: readers never see a partial blob
+
+    def _read(self, digest: str) -> bytes:
+        try:
+            with open(self._path(digest), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            raise KeyError(digest) from None
+
+
+class InMemoryBlobStore(BlobStore):
+    """
+    An in-process stand-in for an object store, for tests and benchmarks.
+    """
+
+    def __init__(self):
+        self._blobs = {}
+
+    def exists(self, digest: str) -> bool:
+        return digest in self._blobs
+
+    def _write(self, digest: str, compressed: bytes):
+        self._blobs[digest] = compressed
+
+    def _read(self, digest: str) -> bytes:
+        return self._blobs[digest]
+
+
+def is_blob_ref(value) -> bool:
+    return isinstance(value, dict) and BLOB_REF_KEY in value
+
+
+def externalize_details(details: dict, store: BlobStore, threshold: int) -> dict:
+    """
+    Returns a copy of `details` where every string value of at least `threshold`
+    characters is replaced by a reference `{"$blob": digest, "length": n}` to its
+    content in `store`.
+    """
+    externalized = {}
+    for key, value in details.items():
+        if isinstance(value, str) and len(value) >= threshold:
+            value = {BLOB_REF_KEY: store.put(value.encode("utf-8")), "length": len(value)}
+        externalized[key] = value
+    return externalized
+
+
+def resolve_details(details: dict, store: BlobStore) -> dict:
+    """
+    Returns a copy of `details` with every blob reference replaced by its text.
+    References to missing blobs are left as they are.
+    """
+    resolved = {}
+    for key, value in details.items():
+        if is_blob_ref(value):
+            with contextlib.suppress(KeyError):
+                value = store.get(value[BLOB_REF_KEY]).decode("utf-8")
+        resolved[key] = value
+    return resolved
@@ -71,15 +71,38 @@
 #         print("Coding Agent: Finished and sent code.")
 
 # agents/coding_agent.py
-import time  # For measuring duration
-
-import asyncio
 from google.adk.agents import Agent  # type: ignore
 
+from .llm_calls import compact_payload, generate_text, stream_text
+from .mailbox import mailbox_details
+from .metrics import LLM_LATENCY
+from .token_budget import estimate_tokens
+from .tracing import span
+from .transport import TransportMixin
 from .utils import llm_model, log_agent_event  # Use llm_model instead of llm
+from .workflow import STREAM_END_MARKER, ReadinessMixin
 
 
-class CodingAgent(Agent):
+def is_valid_python(code: str) -> bool:
+    """
+    Cheap validity check for generated code: it must compile once any Markdown
+    code fence around it is removed.
+    """
+    lines = code.strip().splitlines()
+    if lines and lines[0].startswith("```"):
+        lines = lines[1:]
+    if lines and lines[-1].strip() == "```":
+        lines = lines[:-1]
+    if not lines:
+        return False
+    try:
+        compile("\n".join(lines), "<generated>", "exec")
+        return True
+    except (SyntaxError, ValueError):
+        return False
+
+
+class CodingAgent(ReadinessMixin, TransportMixin, Agent):
     """
     The CodingAgent is responsible for writing production-ready code
     based on provided requirements, using a Large Language Model.
@@ -108,81 +131,136 @@ class CodingAgent(Agent):
             content (str): The text content of the message, which contains the requirements.
             sender_id (str): The ID of the agent that sent the requirements.
             context (dict): A dictionary containing contextual information, including the trace_id.
+                            When it sets "stream", code is sent back in chunks as it is generated,
+                            followed by a message carrying STREAM_END_MARKER and the full code.
         """
         trace_id = context.get(
             "trace_id", "UNKNOWN_TRACE"
         )  # Get trace_id from message context
-        start_time = time.time()
-
-        await log_agent_event(
-            event_type="AGENT_START",
-            agent_id=self.name,
-            trace_id=trace_id,
-            message_summary=f"Received requirements for coding from {sender_id}: {content[:100]}...",
-            source_agent_id=sender_id,
-            details={"input_requirements": content},
-        )
-        print(f"{self.name}: Processing requirements from {sender_id}: {content}")
-
-        # Simulate processing time
-        await asyncio.sleep(1)  # Shorter delay for LLM calls
-
-        # Use LLM to generate code
-        llm_prompt = f"{self.instruction}\n\nRequirements:\n{content}\n\nExample: def fibonacci(n):\n    # implementation"
-        llm_call_start = time.time()
-        try:
-            # For google-generativeai, it's model.generate_content
-            llm_response = await self.llm.generate_content(llm_prompt)
-            generated_code = llm_response.text
-        except Exception as e:
-            generated_code = f"ERROR: LLM failed to generate code: {e}"
-            print(f"LLM Error in {self.name}: {e}")
-        llm_call_end = time.time()
-
-        if not generated_code.strip():
-            generated_code = "# No code generated. Requirements might be unclear or LLM issue."  # Fallback
-
-        # Simulate a potential failure based on keyword
-        status = "SUCCESS"
-        if "force_code_fail" in content.lower():
-            generated_code = "ERROR: Code generation failed due to forced error."
-            status = "FAILURE"
+        stream = bool(context.get("stream"))
+        # The task span is a child of the sender's span, whose ID arrives in the context
+        async with span(
+            f"{self.name}.handle_message", kind="task", agent_id=self.name, trace_id=trace_id, context=context
+        ) as task_span:
             await log_agent_event(
-                event_type="ERROR",
+                event_type="AGENT_START",
                 agent_id=self.name,
                 trace_id=trace_id,
-                message_summary="Forced code generation failure.",
-                status="FAILURE",
-                details={"input_text": content},
+                message_summary=f"Received requirements for coding from {sender_id}: {content[:100]}...",
+                source_agent_id=sender_id,
+                details={"input_requirements": content, **mailbox_details(context)},
             )
+            print(f"{self.name}: Processing requirements from {sender_id}: {content}")
 
-        # Send response back to sender
-        await self.send_message(
-            recipient_id=sender_id,
-            content=generated_code,  # Content is directly the string
-            context={"trace_id": trace_id},  # Propagate trace_id back
-        )
-        await log_agent_event(
-            event_type="LLM_CALL_COMPLETE",  # New event type for LLM interactions
-            agent_id=self.name,
-            trace_id=trace_id,
-            message_summary="LLM call for code generation completed.",
-            status=status,
-            duration_ms=int((llm_call_end - llm_call_start) * 1000),
-            details={
-                "llm_prompt": llm_prompt,
-                "llm_response_snippet": generated_code[:500],  # Log a snippet
-            },
-        )
+            # Use LLM to generate code. Requirements over the stage's token budget are compacted first.
+            prompt_template = (
+                "{instruction}\n\nRequirements:\n{requirements}\n\nExample: def fibonacci(n):\n    # implementation"
+            )
+            compaction = await compact_payload(
+                self.llm,
+                "coding",
+                content,
+                estimate_tokens(prompt_template.format(instruction=self.instruction, requirements="")),
+                agent_id=self.name,
+                trace_id=trace_id,
+            )
+            llm_prompt = prompt_template.format(instruction=self.instruction, requirements=compaction.text)
+            llm_result = None
+            llm_error = None
+            async with span(f"{self.name}.llm_call", kind="llm", attributes={"streamed": stream}) as llm_span:
+                try:
+                    if stream:
+                        # Forward chunks to the sender as they arrive
+                        async def forward_chunk(chunk: str):
+                            await self.send_message(
+                                recipient_id=sender_id, content=chunk, context={"trace_id": trace_id, "stream": True}
+                            )
 
-        end_time = time.time()
-        await log_agent_event(
-            event_type="TASK_COMPLETE",
-            agent_id=self.name,
-            trace_id=trace_id,
-            message_summary=f"Generated code and sent to {sender_id}: {generated_code[:100]}...",
-            status=status,
-            duration_ms=int((end_time - start_time) * 1000),
-            details={"generated_code": generated_code},
-        )
-        print(f"{self.name}: Finished and sent code.")
+                        llm_result = await stream_text(
+                            self.llm,
+                            llm_prompt,
+                            agent_id=self.name,
+                            trace_id=trace_id,
+                            on_chunk=forward_chunk,
+                            instruction=self.instruction,
+                        )
+                    else:
+                        # Repeated prompts are served from the response cache
+                        llm_result = await generate_text(
+                            self.llm,
+                            llm_prompt,
+                            agent_id=self.name,
+                            trace_id=trace_id,
+                            instruction=self.instruction,
+                            validator=is_valid_python,  # Picks among speculative candidates, if enabled
+                        )
+                    generated_code = llm_result.text
+                    llm_span.set_attribute("llm_source", llm_result.source)
+                    llm_span.set_attribute("llm_queue_wait_ms", llm_result.queue_wait_ms)
+                    llm_span.set_attribute("ttft_ms", llm_result.ttft_ms)
+                except Exception as e:
+                    llm_span.record_error(e)
+                    llm_error = str(e)
+                    generated_code = f"ERROR: LLM failed to generate code: {e}"
+                    print(f"LLM Error in {self.name}: {e}")
+            LLM_LATENCY.labels(self.name).observe(llm_span.elapsed_ms() / 1000)
+
+            if not generated_code.strip():
+                generated_code = "# No code generated. Requirements might be unclear or LLM issue."  # Fallback
+
+            # Simulate a potential failure based on keyword
+            status = "SUCCESS"
+            if "force_code_fail" in content.lower():
+                generated_code = "ERROR: Code generation failed due to forced error."
+                status = "FAILURE"
+                task_span.status = status
+                await log_agent_event(
+                    event_type="ERROR",
+                    agent_id=self.name,
+                    trace_id=trace_id,
+                    message_summary="Forced code generation failure.",
+                    status="FAILURE",
+                    details={"input_text": content},
+                )
+
+            # Send response back to sender. A stream ends with the marker plus the final
+            # code, which also covers fallbacks and forced failures.
+            reply_context = {"trace_id": trace_id, "stream_end": True} if stream else {"trace_id": trace_id}
+            await self.send_message(
+                recipient_id=sender_id,
+                content=f"{STREAM_END_MARKER}{generated_code}" if stream else generated_code,
+                context=task_span.inject(reply_context),
+            )
+            await log_agent_event(
+                event_type="LLM_CALL_COMPLETE",  # New event type for LLM interactions
+                agent_id=self.name,
+                trace_id=trace_id,
+                message_summary="LLM call for code generation completed.",
+                status=status,
+                duration_ms=int(llm_span.elapsed_ms()),
+                details={
+                    "llm_prompt": llm_prompt,
+                    "llm_response_snippet": generated_code[:500],  # Log a snippet
+                    "llm_response": llm_result.text if llm_result else None,  # Raw model output, for replay
+                    "llm_error": llm_error,
+                    "llm_source": llm_result.source if llm_result else None,
+                    "llm_queue_wait_ms": llm_result.queue_wait_ms if llm_result else None,
+                    "streamed": stream,
+                    "ttft_ms": llm_result.ttft_ms if llm_result else None,
+                    "tokens_per_sec": llm_result.tokens_per_sec if llm_result else None,
+                    "prompt_tokens_estimated": estimate_tokens(llm_prompt),
+                    "prompt_tokens": llm_result.prompt_tokens if llm_result else None,  # As counted by the model
+                    "token_budget": compaction.to_dict() if compaction.compacted else None,
+                },
+            )
+
+            await log_agent_event(
+                event_type="TASK_COMPLETE",
+                agent_id=self.name,
+                trace_id=trace_id,
+                message_summary=f"Generated code and sent to {sender_id}: {generated_code[:100]}...",
+                status=status,
+                duration_ms=int(task_span.elapsed_ms()),
+                details={"generated_code": generated_code},
+            )
+            print(f"{self.name}: Finished and sent code.")
@@ -0,0 +1,185 @@
+# agents/event_backends.py
+
+import json
+import os
+import threading
+
+from .events import EVENT_COLUMNS
+from .trace_store import TraceStore
+
+# Creates the agent_events table and migrates older tables to the current row schema
+BIGQUERY_SCHEMA_FILE = "schema/agent_events.sql"
+
+
+class EventBackend:
+    """
+    Base class for event storage backends.
+
+    A backend writes batches of event rows. `insert_rows` is blocking and is
+    called from a worker thread by the event sinks; like
+    `bigquery.Client.insert_rows_json` it returns a list of per-row errors,
+    empty on success. Rows are de-duplicated on `event_id` (`row_ids`).
+    """
+
+    name = "base"
+
+    def insert_rows(self, rows: list, row_ids: list) -> list:
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class BigQueryBackend(EventBackend):
+    """
+    Streams events into a BigQuery table. The client is created on first insert.
+
+    The streaming API rejects rows with fields the table does not have, so the
+    table's columns are read on first insert and columns it lacks are left out
+    of every row (with one warning) until the table is migrated with
+    BIGQUERY_SCHEMA_FILE and the process restarted.
+    """
+
+    name = "bigquery"
+
+    def __init__(self, project_id: str, dataset: str, table: str, client=None):
+        """
+        Initializes the BigQueryBackend.
+
+        Args:
+            project_id (str): The Google Cloud project holding the dataset.
+            dataset (str): The BigQuery dataset name.
+            table (str): The BigQuery table name.
+            client (bigquery.Client, optional): An existing client to use. Defaults to None.
+        """
+        self.project_id = project_id
+        self.dataset = dataset
+        self.table = table
+        self._client = client
+        self._table_ref = None
+        self._columns = None  # Columns to send, or False to send every column
+
+    @property
+    def client(self):
+        if self._client is None:
+            from google.cloud import bigquery
+
+            self._client = bigquery.Client(project=self.project_id)
+        return self._client
+
+    @property
+    def table_ref(self):
+        if self._table_ref is None:
+            self._table_ref = self.client.dataset(self.dataset).table(self.table)
+        return self._table_ref
+
+    def _table_columns(self):
+        if self._columns is None:
+            try:
+                columns = {field.name for field in self.client.get_table(self.table_ref).schema}
+            except Exception as e:
+                print(f"Could not read the schema of {self.dataset}.{self.table}, sending every column: {e}")
+                self._columns = False
+                return self._columns
+            missing = [column for column in EVENT_COLUMNS if column not in columns]
+            if missing:
+                print(
+                    f"BigQuery table {self.dataset}.{self.table} has no column(s) {', '.join(missing)}; "
+                    f"leaving them out of event rows until it is migrated with {BIGQUERY_SCHEMA_FILE}."
+                )
+            self._columns = frozenset(columns) if missing else False
+        return self._columns
+
+    def insert_rows(self, rows: list, row_ids: list) -> list:
+        columns = self._table_columns()
+        if columns:
+            rows = [{key: value for key, value in row.items() if key in columns} for row in rows]
+        # Event IDs double as insert IDs so that retried batches are de-duplicated
+        return self.client.insert_rows_json(self.table_ref, rows, row_ids=row_ids)
+
+
+class SQLiteBackend(EventBackend):
+    """
+    Stores events in a local, indexed SQLite trace store (WAL mode, bulk
+    `executemany`). Suitable for high-volume local runs and load tests, and
+    queryable with `python -m agents.trace_store`.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path: str):
+        """
+        Initializes the SQLiteBackend, creating the database and tables if needed.
+
+        Args:
+            path (str): Path of the SQLite database file.
+        """
+        self.path = path
+        self.store = TraceStore(path)
+
+    def insert_rows(self, rows: list, row_ids: list) -> list:
+        self.store.ingest(rows)
+        return []
+
+    def close(self):
+        self.store.close()
+
+
+class JsonlBackend(EventBackend):
+    """
+    Appends events as newline-delimited JSON to a local file, in the same
+    format as a BigQuery NDJSON export.
+    """
+
+    name = "jsonl"
+
+    def __init__(self, path: str):
+        """
+        Initializes the JsonlBackend.
+
+        Args:
+            path (str): Path of the file to append to.
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        # Held open across batches so that each insert is a single append; closed by close()
+        self._file = open(path, "a", encoding="utf-8")  # noqa: SIM115
+
+    def insert_rows(self, rows: list, row_ids: list) -> list:
+        data = "".join(json.dumps(row, default=str) + "\n" for row in rows)
+        with self._lock:
+            self._file.write(data)
+            self._file.flush()
+        return []
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+EVENT_BACKENDS = {
+    BigQueryBackend.name: BigQueryBackend,
+    SQLiteBackend.name: SQLiteBackend,
+    JsonlBackend.name: JsonlBackend,
+}
+
+
+def create_event_backend(kind: str, **kwargs) -> EventBackend:
+    """
+    Creates an event backend by name.
+
+    Args:
+        kind (str): One of "bigquery", "sqlite" or "jsonl".
+        **kwargs: Constructor arguments for the chosen backend.
+
+    Returns:
+        EventBackend: The new backend.
+    """
+    try:
+        backend_cls = EVENT_BACKENDS[kind.lower()]
+    except KeyError:
+        raise ValueError(f"Unknown event backend '{kind}', expected one of {sorted(EVENT_BACKENDS)}.") from None
+    return backend_cls(**kwargs)
@@ -0,0 +1,194 @@
+# agents/event_sink.py
+
+import time
+
+import asyncio
+
+from .metrics import SINK_DELIVERY_FAILURES, SINK_FLUSH_LAG, SINK_QUEUE_DEPTH, SINK_ROWS_DELIVERED
+
+_STOP = object()  # Queued by close(): the worker stops once every row queued before it is delivered
+
+
+class BatchingEventSink:
+    """
+    A background, batching sink for agent events.
+
+    Events are put on a bounded in-memory queue and a single worker task drains
+    them in batches, flushing whenever a batch is full or the flush interval has
+    elapsed. The blocking insert call runs in a worker thread so the event loop
+    (and every other agent) keeps running while rows are shipped.
+
+    Each row carries its `event_id`, which is passed as the insert ID on every
+    attempt so that a retried batch is de-duplicated by the warehouse.
+
+    Queue depth and flush lag (the time from queueing the oldest row of a batch
+    until the batch is delivered) are reported to `agents.metrics`.
+
+    The worker is stopped by a sentinel queued by `close`. It also stops when
+    cancelled (e.g. by `asyncio.run` tearing down the loop), even while other
+    tasks are still logging events from their `finally` blocks.
+    """
+
+    def __init__(
+        self,
+        insert_rows,
+        max_batch_size: int = 500,
+        flush_interval: float = 1.0,
+        max_queue_size: int = 10000,
+        max_retries: int = 3,
+        retry_backoff: float = 0.5,
+    ):
+        """
+        Initializes the BatchingEventSink.
+
+        Args:
+            insert_rows (callable): A blocking callable `insert_rows(rows, row_ids)` that
+                                    writes a batch and returns a list of per-row errors
+                                    (empty on success), like `bigquery.Client.insert_rows_json`.
+                                    It runs in a worker thread; a coroutine function is
+                                    awaited on the event loop instead.
+            max_batch_size (int, optional): Maximum number of rows per insert. Defaults to 500.
+            flush_interval (float, optional): Seconds to wait before flushing a partial batch. Defaults to 1.0.
+            max_queue_size (int, optional): Capacity of the in-memory queue. When full, producers
+                                            wait for the worker to catch up. Defaults to 10000.
+            max_retries (int, optional): Attempts per batch after the first one fails. Defaults to 3.
+            retry_backoff (float, optional): Base delay in seconds between retries, doubled on
+                                             every attempt. Defaults to 0.5.
+        """
+        self._insert_rows = insert_rows
+        self._insert_is_async = asyncio.iscoroutinefunction(insert_rows)
+        self.max_batch_size = max_batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self._queue = asyncio.Queue(maxsize=max_queue_size)
+        self._worker = None
+        self._closed = False
+
+    def _ensure_worker(self):
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.get_running_loop().create_task(self._run())
+
+    async def submit(self, row: dict):
+        """
+        Queues a single event row for delivery.
+
+        Args:
+            row (dict): The event row. Must contain an `event_id`.
+        """
+        if self._closed:
+            raise RuntimeError("Event sink is closed.")
+        self._ensure_worker()
+        await self._queue.put((time.monotonic(), row))  # Waits only when the queue is full (back-pressure)
+        SINK_QUEUE_DEPTH.set(self._queue.qsize())
+
+    async def flush(self):
+        """
+        Waits until every event queued so far has been delivered (or given up on).
+        """
+        if self._worker is None:
+            return
+        self._ensure_worker()  # A worker cancelled from outside is restarted to drain the queue
+        await self._queue.join()
+
+    async def close(self):
+        """
+        Flushes all pending events and stops the background worker.
+        """
+        self._closed = True
+        await self.flush()
+        if self._worker is not None:
+            if not self._worker.done():
+                await self._queue.put(_STOP)
+            await asyncio.gather(self._worker, return_exceptions=True)
+            self._worker = None
+
+    async def _get(self, timeout: float = None):
+        """
+        Takes the next queued item, or returns None if none arrives within
+        `timeout` seconds. This waits on an explicit get task: before Python
+        3.12, asyncio.wait_for can return the item and swallow a cancellation
+        of the worker that lands just as the get completes.
+        """
+        getter = asyncio.ensure_future(self._queue.get())
+        try:
+            await asyncio.wait({getter}, timeout=timeout)
+        except asyncio.CancelledError:
+            if not getter.cancel():
+                self._queue.task_done()  # Taken just as the worker was cancelled; dropped with it
+            raise
+        if getter.cancel():
+            return None  # Timed out; the cancelled get leaves the queue untouched
+        return getter.result()
+
+    async def _run(self):
+        """
+        Worker loop: collects rows into a batch until it is full or the flush
+        interval expires, then ships the batch.
+        """
+        loop = asyncio.get_running_loop()
+        batch = []
+        try:
+            while True:
+                item = await self._get()
+                if item is _STOP:
+                    self._queue.task_done()
+                    return
+                batch = [item]
+                deadline = loop.time() + self.flush_interval
+                while len(batch) < self.max_batch_size:
+                    timeout = deadline - loop.time()
+                    item = await self._get(timeout) if timeout > 0 else None
+                    if item is None or item is _STOP:
+                        break
+                    batch.append(item)
+                rows, batch = batch, []
+                await self._ship(rows)
+                if item is _STOP:
+                    self._queue.task_done()
+                    return
+        except asyncio.CancelledError:
+            if batch:
+                print(f"Event sink cancelled; dropping {len(batch)} undelivered events.")
+                for _ in batch:
+                    self._queue.task_done()
+            raise
+
+    async def _ship(self, batch: list):
+        SINK_QUEUE_DEPTH.set(self._queue.qsize())
+        try:
+            await self._deliver([row for _, row in batch])
+        finally:
+            SINK_FLUSH_LAG.observe(time.monotonic() - batch[0][0])
+            for _ in batch:
+                self._queue.task_done()
+
+    async def _deliver(self, batch: list):
+        """
+        Inserts one batch, retrying with exponential backoff. Retries reuse the
+        rows' `event_id` values as insert IDs so nothing is written twice.
+        """
+        row_ids = [row["event_id"] for row in batch]
+        for attempt in range(self.max_retries + 1):
+            started = time.time()
+            try:
+                if self._insert_is_async:
+                    errors = await self._insert_rows(batch, row_ids)
+                else:
+                    errors = await asyncio.to_thread(self._insert_rows, batch, row_ids)
+                if errors:
+                    print(f"Event sink insert errors ({len(errors)} of {len(batch)} rows): {errors}")
+                SINK_ROWS_DELIVERED.inc(len(batch) - len(errors or ()))
+                return
+            except Exception as e:
+                if attempt == self.max_retries:
+                    SINK_DELIVERY_FAILURES.inc()
+                    print(
+                        f"CRITICAL ERROR delivering {len(batch)} events after {attempt + 1} attempts: {e}"
+                    )
+                    return
+                print(
+                    f"Event sink insert failed after {int((time.time() - started) * 1000)}ms "
+                    f"(attempt {attempt + 1}), retrying: {e}"
+                )
+                await asyncio.sleep(self.retry_backoff * (2**attempt))
@@ -0,0 +1,406 @@
+# agents/event_spool.py
+
+import contextlib
+import json
+import os
+import threading
+import time
+
+import asyncio
+
+from .metrics import SINK_ROWS_DELIVERED, SPOOL_DEAD_LETTERED, SPOOL_PENDING_BYTES
+
+CHECKPOINT_FILE = "checkpoint.json"
+DEAD_LETTER_FILE = "dead_letter.jsonl"
+SEGMENT_SUFFIX = ".jsonl"
+FSYNC_POLICIES = ("always", "interval", "never")
+
+# Per-row error reasons of the BigQuery streaming API that a later retry can fix.
+# "stopped" rows were valid but not inserted because another row of the request was not.
+RETRYABLE_ROW_REASONS = frozenset({"stopped", "backendError", "internalError", "timeout", "rateLimitExceeded"})
+
+
+class SpoolFullError(Exception):
+    """
+    Raised when appending to the spool would exceed its configured size limit.
+    """
+
+
+class EventSpool:
+    """
+    An append-only, segment-rotated local log of event rows.
+
+    Rows are written as newline-delimited JSON to the active segment file. Once
+    a segment grows past `segment_max_bytes` a new one is started; drained
+    segments are deleted by the SpoolReplayer. The hot path is a single local
+    sequential write.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        segment_max_bytes: int = 16 * 1024 * 1024,
+        max_spool_bytes: int = 1024 * 1024 * 1024,
+        fsync: str = "interval",
+        fsync_interval: float = 1.0,
+    ):
+        """
+        Initializes the EventSpool, resuming after any segments already on disk.
+
+        Args:
+            directory (str): Directory holding the segment files and the replay checkpoint.
+            segment_max_bytes (int, optional): Size at which the active segment is rotated. Defaults to 16 MiB.
+            max_spool_bytes (int, optional): Total on-disk size above which appends are refused
+                                             with SpoolFullError (back-pressure). Defaults to 1 GiB.
+            fsync (str, optional): "always" to fsync after every append, "interval" to fsync at most
+                                   every `fsync_interval` seconds, or "never" to leave it to the OS.
+                                   Defaults to "interval".
+            fsync_interval (float, optional): Seconds between fsyncs for the "interval" policy. Defaults to 1.0.
+        """
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"Unknown fsync policy '{fsync}', expected one of {FSYNC_POLICIES}.")
+        self.directory = directory
+        self.segment_max_bytes = segment_max_bytes
+        self.max_spool_bytes = max_spool_bytes
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval
+        self._lock = threading.Lock()
+        self._last_fsync = time.monotonic()
+
+        os.makedirs(directory, exist_ok=True)
+        existing = self.segments()
+        self._next_seq = int(existing[-1][: -len(SEGMENT_SUFFIX)]) + 1 if existing else 0
+        self._total_bytes = sum(os.path.getsize(self.segment_path(name)) for name in existing)
+        self._active_name = None
+        self._active_file = None
+        self._open_new_segment()
+
+    def segment_path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def segments(self) -> list:
+        """
+        Returns the names of all segment files, oldest first.
+        """
+        return sorted(
+            name
+            for name in os.listdir(self.directory)
+            if name.endswith(SEGMENT_SUFFIX) and name[: -len(SEGMENT_SUFFIX)].isdigit()
+        )
+
+    @property
+    def active_segment(self) -> str:
+        return self._active_name
+
+    @property
+    def total_bytes(self) -> int:
+        return self._total_bytes
+
+    def _open_new_segment(self):
+        if self._active_file is not None:
+            self._sync()
+            self._active_file.close()
+        self._active_name = f"{self._next_seq:020d}{SEGMENT_SUFFIX}"
+        self._next_seq += 1
+        # Held open for appends until the segment is rotated or the spool closed
+        self._active_file = open(self.segment_path(self._active_name), "ab")  # noqa: SIM115
+
+    def _sync(self):
+        self._active_file.flush()
+        os.fsync(self._active_file.fileno())
+        self._last_fsync = time.monotonic()
+
+    def append(self, rows: list):
+        """
+        Appends rows to the active segment.
+
+        Args:
+            rows (list): Event rows (JSON-serializable dicts).
+
+        Raises:
+            SpoolFullError: If the spool is already at its size limit.
+        """
+        data = b"".join(json.dumps(row, default=str).encode("utf-8") + b"\n" for row in rows)
+        with self._lock:
+            if self._total_bytes + len(data) > self.max_spool_bytes:
+                raise SpoolFullError(
+                    f"Event spool at {self.directory} is full ({self._total_bytes} bytes)."
+                )
+            self._active_file.write(data)
+            self._total_bytes += len(data)
+            if self.fsync == "always" or (
+                self.fsync == "interval" and time.monotonic() - self._last_fsync >= self.fsync_interval
+            ):
+                self._sync()
+            else:
+                self._active_file.flush()  # Make the rows visible to the replayer
+            if self._active_file.tell() >= self.segment_max_bytes:
+                self._open_new_segment()
+
+    def rotate(self):
+        """
+        Seals the active segment (if it holds any data) and starts a new one.
+        """
+        with self._lock:
+            if self._active_file.tell() > 0:
+                self._open_new_segment()
+
+    def remove_segment(self, name: str):
+        """
+        Deletes a drained segment. The active segment is never removed.
+        """
+        with self._lock:
+            if name == self._active_name:
+                return
+            path = self.segment_path(name)
+            self._total_bytes -= os.path.getsize(path)
+            os.remove(path)
+
+    def close(self):
+        with self._lock:
+            if self._active_file is not None:
+                self._sync()
+                self._active_file.close()
+                self._active_file = None
+
+
+class SpoolReplayer:
+    """
+    Drains EventSpool segments to the warehouse in bulk.
+
+    Progress is recorded in a checkpoint file (segment name and byte offset) that
+    is only advanced after a batch has been accepted, so a crash or an outage
+    replays from the last acknowledged row. Retried rows keep their `event_id`
+    insert IDs, so replays are de-duplicated by the warehouse.
+
+    Rows the warehouse rejects for good (e.g. an invalid field) would otherwise
+    block the spool forever, so they are moved to a dead-letter file in the
+    spool directory, with their errors, and the rest of the batch is retried.
+    """
+
+    def __init__(self, spool: EventSpool, insert_rows, batch_size: int = 500):
+        """
+        Initializes the SpoolReplayer.
+
+        Args:
+            spool (EventSpool): The spool to drain.
+            insert_rows (callable): A blocking callable `insert_rows(rows, row_ids)` returning a list
+                                    of per-row errors, like `bigquery.Client.insert_rows_json`.
+            batch_size (int, optional): Maximum rows per insert. Defaults to 500.
+        """
+        self.spool = spool
+        self._insert_rows = insert_rows
+        self.batch_size = batch_size
+        self._checkpoint_path = os.path.join(spool.directory, CHECKPOINT_FILE)
+        self.dead_letter_path = os.path.join(spool.directory, DEAD_LETTER_FILE)
+
+    def load_checkpoint(self) -> tuple:
+        """
+        Returns the (segment name, byte offset) of the next row to replay.
+        """
+        try:
+            with open(self._checkpoint_path) as f:
+                checkpoint = json.load(f)
+            return checkpoint["segment"], checkpoint["offset"]
+        except (FileNotFoundError, ValueError, KeyError):
+            return None, 0
+
+    def _save_checkpoint(self, segment: str, offset: int):
+        tmp_path = self._checkpoint_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"segment": segment, "offset": offset}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self._checkpoint_path)
+
+    def pending_bytes(self) -> int:
+        """
+        Returns the number of spooled bytes not yet acknowledged by the warehouse.
+        """
+        segment, offset = self.load_checkpoint()
+        pending = 0
+        for name in self.spool.segments():
+            if segment is not None and name < segment:
+                continue
+            size = os.path.getsize(self.spool.segment_path(name))
+            pending += size - offset if name == segment else size
+        return pending
+
+    def replay_once(self) -> int:
+        """
+        Replays every complete row currently in the spool.
+
+        Returns:
+            int: The number of rows accepted by the warehouse.
+
+        Raises:
+            Exception: Whatever `insert_rows` raised. The checkpoint is left at the
+                       last acknowledged batch.
+        """
+        replayed = 0
+        segment, offset = self.load_checkpoint()
+        for name in self.spool.segments():
+            if segment is not None and name < segment:
+                self.spool.remove_segment(name)  # Left over from a crash after the checkpoint moved on
+                continue
+            start = offset if name == segment else 0
+            is_active = name == self.spool.active_segment
+            replayed_here, end = self._replay_segment(name, start)
+            replayed += replayed_here
+            if is_active:
+                self._save_checkpoint(name, end)
+                break
+            self.spool.remove_segment(name)
+            segment, offset = None, 0
+        return replayed
+
+    def _replay_segment(self, name: str, offset: int) -> tuple:
+        replayed = 0
+        with open(self.spool.segment_path(name), "rb") as f:
+            f.seek(offset)
+            data = f.read()
+        end = data.rfind(b"\n") + 1  # Ignore a trailing partial line still being written
+        batch, batch_end = [], offset
+        position = offset
+        for line in data[:end].splitlines(keepends=True):
+            position += len(line)
+            if line.strip():
+                batch.append(json.loads(line))
+            if len(batch) >= self.batch_size:
+                self._insert_batch(batch)
+                replayed += len(batch)
+                batch, batch_end = [], position
+                self._save_checkpoint(name, batch_end)
+        if batch:
+            self._insert_batch(batch)
+            replayed += len(batch)
+        return replayed, position
+
+    def _insert_batch(self, batch: list):
+        while batch:
+            errors = self._insert_rows(batch, [row["event_id"] for row in batch])
+            if not errors:
+                return
+            rejected = {error["index"]: error.get("errors", []) for error in errors if not _is_retryable(error)}
+            if not rejected:
+                raise RuntimeError(f"Warehouse rejected {len(errors)} of {len(batch)} spooled rows: {errors}")
+            self._dead_letter([(batch[index], row_errors) for index, row_errors in sorted(rejected.items())])
+            batch = [row for index, row in enumerate(batch) if index not in rejected]
+
+    def _dead_letter(self, rejected: list):
+        """
+        Appends (row, errors) pairs to the dead-letter file, where they can be
+        inspected, fixed and re-inserted by hand.
+        """
+        with open(self.dead_letter_path, "a", encoding="utf-8") as f:
+            for row, errors in rejected:
+                f.write(json.dumps({"row": row, "errors": errors}, default=str) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        SPOOL_DEAD_LETTERED.inc(len(rejected))
+        print(f"Event spool moved {len(rejected)} rejected row(s) to {self.dead_letter_path}: {rejected[0][1]}")
+
+
+def _is_retryable(error: dict) -> bool:
+    reasons = [row_error.get("reason") for row_error in error.get("errors", [])]
+    return "index" not in error or not reasons or all(reason in RETRYABLE_ROW_REASONS for reason in reasons)
+
+
+class SpooledEventSink:
+    """
+    An event sink that writes every event to an EventSpool first and drains the
+    spool to the warehouse from a background task. Exposes the same
+    `submit`/`flush`/`close` interface as BatchingEventSink.
+    """
+
+    def __init__(
+        self,
+        spool: EventSpool,
+        replayer: SpoolReplayer,
+        replay_interval: float = 1.0,
+        backpressure_timeout: float = 30.0,
+    ):
+        """
+        Initializes the SpooledEventSink.
+
+        Args:
+            spool (EventSpool): The local spool events are appended to.
+            replayer (SpoolReplayer): The replayer draining `spool`.
+            replay_interval (float, optional): Seconds between background replays. Defaults to 1.0.
+            backpressure_timeout (float, optional): How long `submit` waits for space when the spool
+                                                    is full before dropping the event. Defaults to 30.0.
+        """
+        self.spool = spool
+        self.replayer = replayer
+        self.replay_interval = replay_interval
+        self.backpressure_timeout = backpressure_timeout
+        self._wake = None
+        self._worker = None
+        self._replay_lock = None
+
+    def _ensure_worker(self):
+        if self._worker is None or self._worker.done():
+            self._wake = asyncio.Event()
+            self._replay_lock = asyncio.Lock()
+            self._worker = asyncio.get_running_loop().create_task(self._run())
+
+    async def submit(self, row: dict):
+        """
+        Appends a single event row to the spool, waiting for the replayer to free
+        space if the spool is full.
+        """
+        self._ensure_worker()
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.backpressure_timeout
+        while True:
+            try:
+                self.spool.append([row])
+                return
+            except SpoolFullError as e:
+                if loop.time() >= deadline:
+                    print(f"CRITICAL ERROR dropping event {row.get('event_id')}: {e}")
+                    return
+                self._wake.set()
+                await asyncio.sleep(min(self.replay_interval, 0.1))
+
+    def _replay_blocking(self) -> int:
+        try:
+            return self.replayer.replay_once()
+        finally:
+            SPOOL_PENDING_BYTES.set(self.replayer.pending_bytes())
+
+    async def _replay(self) -> bool:
+        async with self._replay_lock:
+            try:
+                SINK_ROWS_DELIVERED.inc(await asyncio.to_thread(self._replay_blocking))
+                return True
+            except Exception as e:
+                print(f"Event spool replay failed, will retry: {e}")
+                return False
+
+    async def _run(self):
+        while True:
+            with contextlib.suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(self._wake.wait(), self.replay_interval)
+            self._wake.clear()
+            await self._replay()
+
+    async def flush(self):
+        """
+        Replays everything spooled so far. If the warehouse is unreachable the
+        events stay on disk and are replayed later.
+        """
+        if self._worker is None:
+            return
+        await self._replay()
+
+    async def close(self):
+        """
+        Flushes the spool, stops the background replayer and closes the spool.
+        """
+        await self.flush()
+        if self._worker is not None:
+            self._worker.cancel()
+            await asyncio.gather(self._worker, return_exceptions=True)
+            self._worker = None
+        self.spool.close()
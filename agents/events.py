@@ -0,0 +1,155 @@
+# agents/events.py
+
+import ast
+import datetime
+import json
+
+import uuid
+
+# Bumped whenever the shape of an event row changes.
+# 1: details stored as a Python repr string. 2: details stored as JSON.
+# 3: span_id and parent_span_id columns.
+SCHEMA_VERSION = 3
+
+# Columns of the agent_events table, in the order used by the local backends
+EVENT_COLUMNS = (
+    "timestamp",
+    "trace_id",
+    "event_id",
+    "agent_id",
+    "event_type",
+    "message_summary",
+    "source_agent_id",
+    "target_agent_id",
+    "duration_ms",
+    "status",
+    "details",
+    "schema_version",
+    "span_id",
+    "parent_span_id",
+)
+
+try:  # Use a fast JSON encoder when one is installed
+    import orjson
+
+    def dumps_json(value) -> str:
+        return orjson.dumps(value, default=str).decode("utf-8")
+
+    JSON_ENCODER = "orjson"
+except ImportError:
+    # A prebuilt encoder avoids constructing a JSONEncoder on every call
+    dumps_json = json.JSONEncoder(default=str, separators=(",", ":")).encode
+
+    JSON_ENCODER = "json"
+
+
+def loads_details(raw: str) -> dict:
+    """
+    Parses a stored `details` value: JSON for schema version 2 and later, a
+    Python repr string for rows written by schema version 1.
+    """
+    if raw is None or isinstance(raw, dict):
+        return raw
+    try:
+        return json.loads(raw)
+    except ValueError:
+        try:
+            return ast.literal_eval(raw)
+        except (ValueError, SyntaxError):
+            return {"raw": raw}
+
+
+class AgentEvent:
+    """
+    A single agent event, as written to the agent_events table.
+    """
+
+    __slots__ = (
+        "timestamp",
+        "trace_id",
+        "event_id",
+        "agent_id",
+        "event_type",
+        "message_summary",
+        "source_agent_id",
+        "target_agent_id",
+        "duration_ms",
+        "status",
+        "details",
+        "span_id",
+        "parent_span_id",
+    )
+
+    def __init__(
+        self,
+        event_type: str,
+        agent_id: str,
+        trace_id: str,
+        message_summary: str = None,
+        source_agent_id: str = None,
+        target_agent_id: str = None,
+        duration_ms: int = None,
+        status: str = None,
+        details: dict = None,
+        timestamp: str = None,
+        event_id: str = None,
+        span_id: str = None,
+        parent_span_id: str = None,
+    ):
+        self.timestamp = timestamp or datetime.datetime.now(datetime.timezone.utc).isoformat()
+        self.trace_id = trace_id
+        self.event_id = event_id or str(uuid.uuid4())
+        self.agent_id = agent_id
+        self.event_type = event_type
+        self.message_summary = message_summary
+        self.source_agent_id = source_agent_id
+        self.target_agent_id = target_agent_id
+        self.duration_ms = duration_ms
+        self.status = status
+        self.details = details
+        self.span_id = span_id
+        self.parent_span_id = parent_span_id
+
+    def to_row(self) -> dict:
+        """
+        Returns the event as a table row, with `details` encoded as JSON text
+        (accepted by BigQuery JSON and legacy STRING columns alike) and the
+        schema version it was written with.
+        """
+        return {
+            "timestamp": self.timestamp,
+            "trace_id": self.trace_id,
+            "event_id": self.event_id,
+            "agent_id": self.agent_id,
+            "event_type": self.event_type,
+            "message_summary": self.message_summary,
+            "source_agent_id": self.source_agent_id,
+            "target_agent_id": self.target_agent_id,
+            "duration_ms": self.duration_ms,
+            "status": self.status,
+            "details": dumps_json(self.details) if self.details else None,
+            "schema_version": SCHEMA_VERSION,
+            "span_id": self.span_id,
+            "parent_span_id": self.parent_span_id,
+        }
+
+    @classmethod
+    def from_row(cls, row: dict) -> "AgentEvent":
+        """
+        Builds an event from a stored row of any schema version.
+        """
+        return cls(
+            event_type=row.get("event_type"),
+            agent_id=row.get("agent_id"),
+            trace_id=row.get("trace_id"),
+            message_summary=row.get("message_summary"),
+            source_agent_id=row.get("source_agent_id"),
+            target_agent_id=row.get("target_agent_id"),
+            duration_ms=row.get("duration_ms"),
+            status=row.get("status"),
+            details=loads_details(row.get("details")),
+            timestamp=row.get("timestamp"),
+            event_id=row.get("event_id"),
+            span_id=row.get("span_id"),
+            parent_span_id=row.get("parent_span_id"),
+        )
@@ -0,0 +1,220 @@
+# agents/fakes.py
+"""
+In-process stand-ins for the GenerativeModel and the BigQuery client, for
+benchmarks and offline runs. Both take a latency distribution and a failure
+rate, so the real agent, LLM-call and event-sink code runs unchanged against
+them.
+
+    set_llm_model(FakeLLM(latency_ms=400, failure_rate=0.01))
+    set_event_backend(BigQueryBackend("fake", "adk_traces", "agent_events", client=FakeBigQueryClient()))
+"""
+
+import hashlib
+import math
+import random
+import threading
+import time
+from types import SimpleNamespace
+
+import asyncio
+
+from .events import EVENT_COLUMNS
+
+
+class FakeLLMError(RuntimeError):
+    """
+    Raised by FakeLLM for an injected failure.
+    """
+
+
+class LatencyDistribution:
+    """
+    A log-normal latency distribution, parameterized by its median and the
+    standard deviation of the underlying normal (`sigma`, 0 for a constant).
+    Service latencies are right-skewed, which a log-normal models well enough
+    for capacity planning.
+    """
+
+    def __init__(self, median_ms: float, sigma: float = 0.5, rng: random.Random = None):
+        self.median_ms = median_ms
+        self.sigma = sigma
+        self._rng = rng or random.Random()
+
+    def sample_ms(self) -> float:
+        if self.sigma <= 0 or self.median_ms <= 0:
+            return max(0.0, self.median_ms)
+        return self._rng.lognormvariate(math.log(self.median_ms), self.sigma)
+
+
+class FakeLLM:
+    """
+    A fake GenerativeModel. `generate_content` sleeps for a sampled latency and
+    returns text derived from the prompt, with `usage_metadata` token counts;
+    `generate_content_stream` spreads the same latency over several chunks.
+
+    The text is a block of Python comments and assignments, so it is both a
+    plausible requirements document and code that passes the CodingAgent's
+    validator.
+    """
+
+    def __init__(
+        self,
+        latency_ms: float = 200.0,
+        sigma: float = 0.5,
+        failure_rate: float = 0.0,
+        throttle_rate: float = 0.0,
+        output_chars: int = 1200,
+        stream_chunks: int = 8,
+        seed: int = None,
+        model_name: str = "fake-llm",
+    ):
+        """
+        Initializes the FakeLLM.
+
+        Args:
+            latency_ms (float, optional): Median latency of a call in milliseconds. Defaults to 200.0.
+            sigma (float, optional): Log-normal spread of the latency; 0 makes it constant. Defaults to 0.5.
+            failure_rate (float, optional): Fraction of calls that raise FakeLLMError. Defaults to 0.0.
+            throttle_rate (float, optional): Fraction of calls rejected with a 429-style FakeLLMError,
+                                             which the LLMGovernor backs off and retries. Defaults to 0.0.
+            output_chars (int, optional): Approximate length of each response. Defaults to 1200.
+            stream_chunks (int, optional): Number of chunks a streamed response is split into. Defaults to 8.
+            seed (int, optional): Seed for latencies and failures, for repeatable runs. Defaults to None.
+            model_name (str, optional): The reported model name. Defaults to "fake-llm".
+        """
+        self._rng = random.Random(seed)
+        self.latency = LatencyDistribution(latency_ms, sigma, self._rng)
+        self.failure_rate = failure_rate
+        self.throttle_rate = throttle_rate
+        self.output_chars = output_chars
+        self.stream_chunks = max(1, stream_chunks)
+        self.model_name = model_name
+        self.name = model_name
+        self.calls = 0
+        self.failures = 0
+        self.throttled = 0
+
+    def _respond(self, prompt: str) -> str:
+        digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:16]
+        lines = [f"# Fake response {digest} to a {len(prompt)}-character prompt"]
+        index = 0
+        while sum(len(line) + 1 for line in lines) < self.output_chars:
+            lines.append(f"value_{index} = {index} * 2  # item {index}")
+            index += 1
+        return "\n".join(lines) + "\n"
+
+    def _usage(self, prompt: str, text: str):
+        return SimpleNamespace(prompt_token_count=len(prompt) // 4 + 1, candidates_token_count=len(text) // 4 + 1)
+
+    def _profile(self, prompt: str) -> tuple:
+        """
+        Returns the (latency distribution, failure rate) for `prompt`. Override
+        to model callers with different latencies.
+        """
+        return self.latency, self.failure_rate
+
+    def _outcome(self, prompt: str) -> tuple:
+        """
+        Draws the latency in seconds and the injected error (or None) of one call.
+        """
+        self.calls += 1
+        latency, failure_rate = self._profile(prompt)
+        draw = self._rng.random()
+        error = None
+        if draw < self.throttle_rate:
+            self.throttled += 1
+            error = FakeLLMError("429 Resource exhausted (injected by FakeLLM).")
+        elif draw < self.throttle_rate + failure_rate:
+            self.failures += 1
+            error = FakeLLMError("Injected fake LLM failure.")
+        return latency.sample_ms() / 1000, error
+
+    async def generate_content(self, prompt: str, stream: bool = False):
+        if stream:
+            return self.generate_content_stream(prompt)
+        latency, error = self._outcome(prompt)
+        await asyncio.sleep(latency)
+        if error is not None:
+            raise error
+        text = self._respond(prompt)
+        return SimpleNamespace(text=text, usage_metadata=self._usage(prompt, text))
+
+    async def generate_content_stream(self, prompt: str):
+        latency, error = self._outcome(prompt)
+        text = self._respond(prompt)
+        step = -(-len(text) // self.stream_chunks)
+        delay = latency / self.stream_chunks
+        for index, start in enumerate(range(0, len(text), step)):
+            await asyncio.sleep(delay)
+            if error is not None and index == self.stream_chunks // 2:
+                raise error
+            last = start + step >= len(text)
+            yield SimpleNamespace(
+                text=text[start : start + step], usage_metadata=self._usage(prompt, text) if last else None
+            )
+
+
+class FakeBigQueryClient:
+    """
+    A fake `bigquery.Client` for BigQueryBackend. `insert_rows_json` blocks for
+    a sampled latency (it runs in the event sink's worker thread, like the real
+    call), fails a configurable fraction of batches, and de-duplicates rows on
+    their insert IDs the way the streaming API does. Like the real table, it
+    rejects rows with fields that are not among its `columns`.
+    """
+
+    def __init__(
+        self,
+        latency_ms: float = 50.0,
+        sigma: float = 0.3,
+        failure_rate: float = 0.0,
+        seed: int = None,
+        columns: tuple = EVENT_COLUMNS,
+    ):
+        """
+        Initializes the FakeBigQueryClient.
+
+        Args:
+            latency_ms (float, optional): Median latency of an insert in milliseconds. Defaults to 50.0.
+            sigma (float, optional): Log-normal spread of the latency. Defaults to 0.3.
+            failure_rate (float, optional): Fraction of inserts that raise. Defaults to 0.0.
+            seed (int, optional): Seed for latencies and failures. Defaults to None.
+            columns (tuple, optional): The table's columns. Defaults to the current EVENT_COLUMNS.
+        """
+        self._rng = random.Random(seed)
+        self.latency = LatencyDistribution(latency_ms, sigma, self._rng)
+        self.failure_rate = failure_rate
+        self.columns = tuple(columns)
+        self._lock = threading.Lock()
+        self._row_ids = set()
+        self.rows = 0  # Unique rows stored
+        self.inserts = 0
+        self.failures = 0
+
+    def dataset(self, dataset: str):
+        return SimpleNamespace(table=lambda table: f"{dataset}.{table}")
+
+    def get_table(self, table):
+        return SimpleNamespace(schema=[SimpleNamespace(name=column) for column in self.columns])
+
+    def insert_rows_json(self, table, rows: list, row_ids: list = None) -> list:
+        with self._lock:
+            latency_ms = self.latency.sample_ms()
+            fail = self.failure_rate and self._rng.random() < self.failure_rate
+            self.inserts += 1
+        time.sleep(latency_ms / 1000)
+        if fail:
+            with self._lock:
+                self.failures += 1
+            raise ConnectionError(f"Injected fake BigQuery failure inserting into {table}.")
+        errors = []
+        with self._lock:
+            for index, (row, row_id) in enumerate(zip(rows, row_ids or [None] * len(rows))):
+                unknown = sorted(set(row) - set(self.columns))
+                if unknown:
+                    message = f"no such field: {unknown[0]}."
+                    errors.append({"index": index, "errors": [{"reason": "invalid", "message": message}]})
+                elif row_id is None or row_id not in self._row_ids:
+                    self._row_ids.add(row_id)
+                    self.rows += 1
+        return errors
@@ -0,0 +1,155 @@
+# agents/llm_cache.py
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import asyncio
+
+
+def cache_key(model_name: str, instruction: str, prompt: str) -> str:
+    """
+    Returns the content address of an LLM call: a SHA-256 over the model name,
+    the agent instruction and the full prompt.
+    """
+    payload = json.dumps([model_name, instruction, prompt], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class MemoryLRUCache:
+    """
+    An in-memory least-recently-used cache with a fixed number of entries.
+    """
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+
+    def get(self, key: str):
+        value = self._entries.get(key)
+        if value is not None:
+            self._entries.move_to_end(key)
+        return value
+
+    def put(self, key: str, value: str):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class DiskCache:
+    """
+    An on-disk cache backed by SQLite. Entries expire `ttl_seconds` after they
+    were written; expired rows are evicted periodically on write.
+    """
+
+    def __init__(self, path: str, ttl_seconds: float = 7 * 24 * 3600, evict_every: int = 100):
+        """
+        Initializes the DiskCache.
+
+        Args:
+            path (str): Path of the SQLite database file.
+            ttl_seconds (float, optional): Lifetime of an entry. Defaults to 7 days.
+            evict_every (int, optional): Run TTL eviction after this many writes. Defaults to 100.
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.evict_every = evict_every
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache (key TEXT PRIMARY KEY, value TEXT, expires_at REAL)"
+        )
+        self._conn.commit()
+
+    def get(self, key: str):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM llm_cache WHERE key = ? AND expires_at > ?", (key, time.time())
+            ).fetchone()
+        return row[0] if row else None
+
+    def put(self, key: str, value: str):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, value, time.time() + self.ttl_seconds),
+            )
+            self._writes += 1
+            if self._writes % self.evict_every == 0:
+                self._conn.execute("DELETE FROM llm_cache WHERE expires_at <= ?", (time.time(),))
+            self._conn.commit()
+
+    def evict_expired(self) -> int:
+        """
+        Deletes expired entries and returns how many were removed.
+        """
+        with self._lock:
+            deleted = self._conn.execute("DELETE FROM llm_cache WHERE expires_at <= ?", (time.time(),)).rowcount
+            self._conn.commit()
+        return deleted
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class LLMResponseCache:
+    """
+    A two-tier, content-addressed cache of LLM responses: an in-memory LRU in
+    front of an optional on-disk tier. Disk hits are promoted to memory.
+    """
+
+    def __init__(self, memory: MemoryLRUCache, disk: DiskCache = None):
+        """
+        Initializes the LLMResponseCache.
+
+        Args:
+            memory (MemoryLRUCache): The in-memory tier.
+            disk (DiskCache, optional): The on-disk tier. Defaults to None (memory only).
+        """
+        self.memory = memory
+        self.disk = disk
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, key: str) -> tuple:
+        """
+        Looks up a response.
+
+        Returns:
+            tuple: (text, tier) where tier is "memory" or "disk", or (None, None) on a miss.
+        """
+        text = self.memory.get(key)
+        if text is not None:
+            self.hits += 1
+            return text, "memory"
+        if self.disk is not None:
+            text = await asyncio.to_thread(self.disk.get, key)
+            if text is not None:
+                self.memory.put(key, text)
+                self.hits += 1
+                return text, "disk"
+        self.misses += 1
+        return None, None
+
+    async def put(self, key: str, text: str):
+        self.memory.put(key, text)
+        if self.disk is not None:
+            await asyncio.to_thread(self.disk.put, key, text)
+
+    def counters(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "memory_entries": len(self.memory)}
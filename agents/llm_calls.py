@@ -0,0 +1,541 @@
+# agents/llm_calls.py
+
+import asyncio
+
+from .llm_cache import DiskCache, LLMResponseCache, MemoryLRUCache, cache_key
+from .llm_governor import LLMGovernor
+from .llm_hedging import HedgePolicy, LatencyTracker, first_valid, hedged_call
+from .single_flight import SingleFlight
+from .token_budget import Compaction, estimate_tokens, stage_budget, trim_to_budget
+from .utils import LazyLLMModel, get_env, get_llm_model, log_agent_event
+
+_llm_cache = None  # Created on first use; False when caching is disabled
+_llm_governor = None  # Created on first use
+_hedge_policy = None  # Created on first use; False when hedging is disabled
+_latency_trackers = {}  # agent_id -> LatencyTracker of recent model latencies
+_in_flight = SingleFlight()  # Identical prompts in flight share one model call
+
+SUMMARIZE_INSTRUCTION = (
+    "Condense the following text to at most {max_tokens} tokens. Keep every concrete requirement, "
+    "name, number and constraint; drop repetition, rationale and examples. Respond with only the condensed text."
+)
+
+
+class LLMResult:
+    """
+    The outcome of an LLM call made through `generate_text`.
+    """
+
+    __slots__ = ("text", "source", "prompt_tokens", "output_tokens", "queue_wait_ms", "ttft_ms", "tokens_per_sec")
+
+    def __init__(
+        self,
+        text: str,
+        source: str,
+        prompt_tokens: int = None,
+        output_tokens: int = None,
+        queue_wait_ms: float = None,
+        ttft_ms: float = None,
+        tokens_per_sec: float = None,
+    ):
+        """
+        Initializes the LLMResult.
+
+        Args:
+            text (str): The generated text.
+            source (str): Where the text came from: "model", the cache tier ("memory"/"disk"),
+                          or "coalesced" when it was shared from an identical call in flight.
+            prompt_tokens (int, optional): Prompt tokens reported by the model. Defaults to None.
+            output_tokens (int, optional): Output tokens reported by the model. Defaults to None.
+            queue_wait_ms (float, optional): Time spent waiting for the LLMGovernor. Defaults to None.
+            ttft_ms (float, optional): Time to first token of a streamed call. Defaults to None.
+            tokens_per_sec (float, optional): Output rate of a streamed call. Defaults to None.
+        """
+        self.text = text
+        self.source = source
+        self.prompt_tokens = prompt_tokens
+        self.output_tokens = output_tokens
+        self.queue_wait_ms = queue_wait_ms
+        self.ttft_ms = ttft_ms
+        self.tokens_per_sec = tokens_per_sec
+
+    @property
+    def cached(self) -> bool:
+        return self.source != "model"
+
+
+def model_name_of(llm) -> str:
+    """
+    Returns the name of the model that serves calls to `llm`, looking through the
+    lazy shared handle to whatever model it currently resolves to (so responses
+    of a model swapped in with `set_llm_model` are cached under its own name).
+    """
+    if isinstance(llm, LazyLLMModel):
+        llm = get_llm_model()
+    return getattr(llm, "model_name", None) or getattr(llm, "name", None) or type(llm).__name__
+
+
+def get_llm_cache():
+    """
+    Returns the shared LLM response cache, or None when ADK_LLM_CACHE=0. It is
+    memory-only unless ADK_LLM_CACHE_PATH names an SQLite file for a persistent
+    tier (e.g. ./.adk_cache/llm_responses.sqlite3), whose entries expire after
+    ADK_LLM_CACHE_TTL seconds (7 days by default).
+    """
+    global _llm_cache
+    if _llm_cache is None:
+        if get_env("ADK_LLM_CACHE", "1") == "0":
+            _llm_cache = False
+        else:
+            memory = MemoryLRUCache(max_entries=int(get_env("ADK_LLM_CACHE_MAX_ENTRIES", "1024")))
+            disk_path = get_env("ADK_LLM_CACHE_PATH", "")
+            disk = (
+                DiskCache(disk_path, ttl_seconds=float(get_env("ADK_LLM_CACHE_TTL", str(7 * 24 * 3600))))
+                if disk_path
+                else None
+            )
+            _llm_cache = LLMResponseCache(memory, disk)
+    return _llm_cache or None
+
+
+def set_llm_cache(cache: LLMResponseCache):
+    """
+    Replaces the shared LLM response cache. Pass None to disable caching.
+    """
+    global _llm_cache
+    _llm_cache = cache if cache is not None else False
+
+
+def create_llm_governor(share: float = None) -> LLMGovernor:
+    """
+    Creates a governor configured from the environment, whose rate limits are
+    `share` of ADK_LLM_RPM and ADK_LLM_TPM.
+
+    Args:
+        share (float, optional): This process's fraction of the quota. Defaults to ADK_LLM_QUOTA_SHARE, or 1.
+    """
+    if share is None:
+        share = float(get_env("ADK_LLM_QUOTA_SHARE", "1"))
+    return LLMGovernor(
+        requests_per_minute=float(get_env("ADK_LLM_RPM", "0")) * share,  # 0 = unlimited
+        tokens_per_minute=float(get_env("ADK_LLM_TPM", "0")) * share,
+        max_concurrency=int(get_env("ADK_LLM_MAX_CONCURRENCY", "8")),
+        max_retries=int(get_env("ADK_LLM_MAX_RETRIES", "4")),
+    )
+
+
+def get_llm_governor() -> LLMGovernor:
+    """
+    Returns the governor shared by every agent's model calls, creating it on first use.
+    Its rate limits are this process's ADK_LLM_QUOTA_SHARE (default 1) of
+    ADK_LLM_RPM and ADK_LLM_TPM, which worker processes split between them.
+    """
+    global _llm_governor
+    if _llm_governor is None:
+        _llm_governor = create_llm_governor()
+    return _llm_governor
+
+
+def set_llm_governor(governor: LLMGovernor):
+    """
+    Replaces the shared governor, e.g. with one sized for a benchmark.
+    """
+    global _llm_governor
+    _llm_governor = governor
+
+
+def get_hedge_policy() -> HedgePolicy:
+    """
+    Returns the hedging policy, or None unless ADK_LLM_HEDGE=1.
+    """
+    global _hedge_policy
+    if _hedge_policy is None:
+        if get_env("ADK_LLM_HEDGE", "0") == "1":
+            _hedge_policy = HedgePolicy(
+                percentile=float(get_env("ADK_LLM_HEDGE_PERCENTILE", "95")),
+                min_samples=int(get_env("ADK_LLM_HEDGE_MIN_SAMPLES", "20")),
+                max_hedges=int(get_env("ADK_LLM_HEDGE_MAX", "1")),
+            )
+        else:
+            _hedge_policy = False
+    return _hedge_policy or None
+
+
+def set_hedge_policy(policy: HedgePolicy):
+    """
+    Replaces the hedging policy. Pass None to disable hedging.
+    """
+    global _hedge_policy
+    _hedge_policy = policy if policy is not None else False
+
+
+def latency_tracker(agent_id: str) -> LatencyTracker:
+    tracker = _latency_trackers.get(agent_id)
+    if tracker is None:
+        tracker = _latency_trackers[agent_id] = LatencyTracker()
+    return tracker
+
+
+async def _call_model(llm, prompt: str, agent_id: str, on_admitted=None) -> LLMResult:
+    governor = get_llm_governor()
+    estimated_tokens = estimate_tokens(prompt)
+    loop = asyncio.get_running_loop()
+
+    async def timed_call():
+        if on_admitted is not None:
+            on_admitted()
+        started = loop.time()
+        # For google-generativeai, it's model.generate_content
+        response = await llm.generate_content(prompt)
+        latency_tracker(agent_id).record(loop.time() - started)
+        return response
+
+    response, queue_wait_ms = await governor.run(agent_id, estimated_tokens, timed_call)
+    usage = getattr(response, "usage_metadata", None)
+    prompt_tokens = getattr(usage, "prompt_token_count", None)
+    output_tokens = getattr(usage, "candidates_token_count", None)
+    if prompt_tokens is not None:
+        governor.record_usage(estimated_tokens, prompt_tokens + (output_tokens or 0))
+    return LLMResult(
+        response.text,
+        "model",
+        prompt_tokens=prompt_tokens,
+        output_tokens=output_tokens,
+        queue_wait_ms=queue_wait_ms,
+    )
+
+
+async def _call_with_policies(llm, prompt: str, agent_id: str, trace_id: str, validator=None) -> LLMResult:
+    """
+    Makes one logical model call, applying the opt-in tail-latency policies:
+    speculative candidates (ADK_LLM_SPECULATIVE_CANDIDATES > 1 with a validator)
+    or hedging (ADK_LLM_HEDGE=1). Every extra attempt is logged as a child event
+    of the call so its cost is visible.
+    """
+
+    def call():
+        return _call_model(llm, prompt, agent_id)
+
+    candidates = int(get_env("ADK_LLM_SPECULATIVE_CANDIDATES", "1"))
+    if validator is not None and candidates > 1:
+
+        async def on_candidate(index: int, valid: bool):
+            await log_agent_event(
+                event_type="LLM_CANDIDATE",
+                agent_id=agent_id,
+                trace_id=trace_id,
+                message_summary=f"Speculative candidate {index} for {agent_id} was {'valid' if valid else 'invalid'}.",
+                status="SUCCESS" if valid else "FAILURE",
+                details={"parent": "LLM_CALL", "candidate_index": index, "candidates": candidates},
+            )
+
+        result, _, _ = await first_valid(call, candidates, lambda result: validator(result.text), on_candidate)
+        return result
+
+    policy = get_hedge_policy()
+    delay = policy.delay(latency_tracker(agent_id)) if policy is not None else None
+    if delay is None:
+        return await call()
+
+    # The hedge delay counts from the governor admitting the call, not from queueing for it
+    admitted = asyncio.Event()
+
+    def hedgeable_call():
+        return _call_model(llm, prompt, agent_id, on_admitted=admitted.set)
+
+    async def on_hedge(attempt: int):
+        await log_agent_event(
+            event_type="LLM_HEDGE",
+            agent_id=agent_id,
+            trace_id=trace_id,
+            message_summary=f"LLM call for {agent_id} exceeded p{policy.percentile:g} ({int(delay * 1000)}ms); hedging.",
+            details={"parent": "LLM_CALL", "attempt": attempt, "hedge_delay_ms": int(delay * 1000)},
+        )
+
+    result, winner, attempts = await hedged_call(hedgeable_call, delay, policy.max_hedges, on_hedge, admitted)
+    if attempts > 1:
+        await log_agent_event(
+            event_type="LLM_HEDGE_COMPLETE",
+            agent_id=agent_id,
+            trace_id=trace_id,
+            message_summary=f"Hedged LLM call for {agent_id} won by attempt {winner} of {attempts}.",
+            details={"parent": "LLM_CALL", "winner": winner, "attempts": attempts, "cancelled": attempts - 1},
+        )
+    return result
+
+
+async def _join_in_flight(key: str, call, agent_id: str, trace_id: str) -> LLMResult:
+    """
+    Waits on an identical call already in flight. Each coalesced waiter is still
+    logged under its own trace, with the shared outcome.
+    """
+    error = None
+    try:
+        result, _ = await _in_flight.do(key, call)
+        return LLMResult(result.text, "coalesced", result.prompt_tokens, result.output_tokens)
+    except Exception as e:
+        error = e
+        raise
+    finally:
+        await log_agent_event(
+            event_type="LLM_CALL_COALESCED",
+            agent_id=agent_id,
+            trace_id=trace_id,
+            message_summary=f"Joined an identical LLM call already in flight for {agent_id}.",
+            status="FAILURE" if error else "SUCCESS",
+            details={"cache_key": key, "error": str(error) if error else None},
+        )
+
+
+async def _cache_lookup(cache, key: str, agent_id: str, trace_id: str) -> tuple:
+    """
+    Looks `key` up in the response cache and logs the hit or miss.
+
+    Returns:
+        tuple: (cached text or None, tier it came from).
+    """
+    text, tier = await cache.get(key)
+    await log_agent_event(
+        event_type="LLM_CACHE_HIT" if text is not None else "LLM_CACHE_MISS",
+        agent_id=agent_id,
+        trace_id=trace_id,
+        message_summary=f"LLM cache {'hit (' + tier + ')' if text is not None else 'miss'} for {agent_id}.",
+        details={"cache_key": key, "tier": tier, **cache.counters()},
+    )
+    return text, tier
+
+
+async def generate_text(
+    llm, prompt: str, agent_id: str, trace_id: str, instruction: str = "", validator=None
+) -> LLMResult:
+    """
+    Generates text for `prompt`, serving repeated prompts from the response cache
+    and coalescing identical prompts that are already in flight into one call.
+
+    Args:
+        llm: The model to call (anything with an async `generate_content(prompt)`).
+        prompt (str): The full prompt.
+        agent_id (str): The calling agent, for event logging.
+        trace_id (str): The calling workflow, for event logging.
+        instruction (str, optional): The agent instruction, part of the cache key. Defaults to "".
+        validator (callable, optional): Cheap check `validator(text) -> bool` used to pick among
+                                        speculative candidates. Defaults to None.
+
+    Returns:
+        LLMResult: The generated text and where it came from.
+    """
+    key = cache_key(model_name_of(llm), instruction, prompt)
+    cache = get_llm_cache()
+    if cache is not None:
+        text, tier = await _cache_lookup(cache, key, agent_id, trace_id)
+        if text is not None:
+            return LLMResult(text, tier)  # Skip the model round trip entirely
+
+    def call():
+        return _call_with_policies(llm, prompt, agent_id, trace_id, validator)
+
+    if get_env("ADK_LLM_SINGLE_FLIGHT", "1") == "0":
+        result = await call()
+    elif key in _in_flight:
+        return await _join_in_flight(key, call, agent_id, trace_id)
+    else:
+        result, _ = await _in_flight.do(key, call)
+
+    if cache is not None and result.text and result.text.strip():
+        await cache.put(key, result.text)
+    return result
+
+
+async def _open_stream(llm, prompt: str):
+    """
+    Starts a streaming generation, using `generate_content_stream` when the model
+    has it and `generate_content(..., stream=True)` otherwise.
+    """
+    if hasattr(llm, "generate_content_stream"):
+        stream = llm.generate_content_stream(prompt)
+    else:
+        stream = llm.generate_content(prompt, stream=True)
+    if hasattr(stream, "__await__"):
+        stream = await stream
+    return stream
+
+
+class StreamInterruptedError(Exception):
+    """
+    Raised when a stream fails after some of its chunks were already passed on.
+    The call is not retried, as a retry would pass those chunks on again.
+    """
+
+
+async def _consume_stream(llm, prompt: str, on_chunk, chunks: list, timing: dict):
+    """
+    Reads one streaming attempt into `chunks`, passing each chunk to `on_chunk`
+    and recording its start, first-chunk and end times in `timing`.
+
+    Returns:
+        The usage metadata of the stream, or None.
+
+    Raises:
+        StreamInterruptedError: If the stream fails after a chunk was passed on, so
+                                that the governor does not retry it even when throttled.
+    """
+    loop = asyncio.get_running_loop()
+    timing.clear()
+    timing["start"] = loop.time()
+    usage = None
+    try:
+        async for chunk in await _open_stream(llm, prompt):
+            text = getattr(chunk, "text", None) or ""
+            usage = getattr(chunk, "usage_metadata", None) or usage
+            if not text:
+                continue
+            if "first" not in timing:
+                timing["first"] = loop.time()
+            chunks.append(text)
+            await on_chunk(text)
+    except Exception as e:
+        if chunks:
+            # The message stays free of the error's text, which may look like throttling
+            raise StreamInterruptedError(f"Stream failed after {len(chunks)} chunk(s) were delivered.") from e
+        raise
+    timing["end"] = loop.time()
+    return usage
+
+
+def _stream_rates(timing: dict, output_tokens: int) -> dict:
+    """
+    Returns the time to first token and the generation rate of a stream from its `timing`.
+    """
+    if "first" not in timing:
+        return {"ttft_ms": None, "tokens_per_sec": None}
+    generation_seconds = timing["end"] - timing["start"]
+    return {
+        "ttft_ms": (timing["first"] - timing["start"]) * 1000,
+        "tokens_per_sec": output_tokens / generation_seconds if generation_seconds > 0 else None,
+    }
+
+
+async def stream_text(
+    llm, prompt: str, agent_id: str, trace_id: str, on_chunk, instruction: str = ""
+) -> LLMResult:
+    """
+    Generates text for `prompt` with the model's streaming API, passing each chunk
+    to `on_chunk` as it arrives. A cached response is delivered as a single chunk.
+    A throttled stream is retried only if none of its chunks were passed on yet.
+
+    Args:
+        llm: The model to call.
+        prompt (str): The full prompt.
+        agent_id (str): The calling agent, for event logging and fair queueing.
+        trace_id (str): The calling workflow, for event logging.
+        on_chunk (callable): Coroutine function called with each text chunk.
+        instruction (str, optional): The agent instruction, part of the cache key. Defaults to "".
+
+    Returns:
+        LLMResult: The full text, with time-to-first-token and tokens/sec for model calls.
+    """
+    key = cache_key(model_name_of(llm), instruction, prompt)
+    cache = get_llm_cache()
+    if cache is not None:
+        text, tier = await _cache_lookup(cache, key, agent_id, trace_id)
+        if text is not None:
+            await on_chunk(text)
+            return LLMResult(text, tier)
+
+    governor = get_llm_governor()
+    estimated_tokens = estimate_tokens(prompt)
+    chunks = []
+    timing = {}
+
+    def consume():
+        return _consume_stream(llm, prompt, on_chunk, chunks, timing)
+
+    usage, queue_wait_ms = await governor.run(agent_id, estimated_tokens, consume)
+    text = "".join(chunks)
+    prompt_tokens = getattr(usage, "prompt_token_count", None)
+    output_tokens = getattr(usage, "candidates_token_count", None)
+    if prompt_tokens is not None:
+        governor.record_usage(estimated_tokens, prompt_tokens + (output_tokens or 0))
+    if cache is not None and text.strip():
+        await cache.put(key, text)
+    return LLMResult(
+        text,
+        "model",
+        prompt_tokens=prompt_tokens,
+        output_tokens=output_tokens,
+        queue_wait_ms=queue_wait_ms,
+        **_stream_rates(timing, output_tokens or estimate_tokens(text)),
+    )
+
+
+async def compact_payload(
+    llm, stage: str, payload: str, overhead_tokens: int, agent_id: str, trace_id: str
+) -> Compaction:
+    """
+    Fits `payload` into what is left of the stage's prompt budget
+    (ADK_TOKEN_BUDGET_<STAGE>) once the `overhead_tokens` of the instruction and
+    template are taken out. Over budget, the payload is trimmed deterministically,
+    or with ADK_TOKEN_COMPACTION=summarize first condensed by a model call (which
+    is logged as its own LLM_CALL_COMPLETE) and trimmed only if still too long.
+
+    Args:
+        llm: The model used for the summarization pass.
+        stage (str): The pipeline stage, e.g. "coding".
+        payload (str): The variable part of the prompt, e.g. the requirements.
+        overhead_tokens (int): Estimated tokens of the rest of the prompt.
+        agent_id (str): The calling agent, for event logging.
+        trace_id (str): The calling workflow, for event logging.
+
+    Returns:
+        Compaction: The payload to use and how it was compacted.
+    """
+    budget = stage_budget(stage)
+    original_tokens = estimate_tokens(payload)
+    if budget <= 0 or original_tokens + overhead_tokens <= budget:
+        return Compaction(payload, stage, budget, "none", original_tokens, original_tokens)
+
+    # A tiny remainder would gut the payload; let the prompt run over instead
+    available = max(budget - overhead_tokens, budget // 4)
+    text, method = payload, "trim"
+    if get_env("ADK_TOKEN_COMPACTION", "trim") == "summarize":
+        text, method = await _summarize(llm, payload, available, agent_id, trace_id), "summarize"
+        if text is None:
+            text, method = payload, "trim"  # The summarization failed; trimming always works
+    if estimate_tokens(text) > available:
+        text = trim_to_budget(text, available)
+        method = "summarize+trim" if method == "summarize" else "trim"
+    return Compaction(text, stage, budget, method, original_tokens, estimate_tokens(text))
+
+
+async def _summarize(llm, text: str, max_tokens: int, agent_id: str, trace_id: str) -> str:
+    """
+    Condenses `text` with a model call, or returns None if the call fails.
+    """
+    instruction = SUMMARIZE_INSTRUCTION.format(max_tokens=max_tokens)
+    prompt = f"{instruction}\n\n{text}"
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    result = error = None
+    try:
+        result = await generate_text(llm, prompt, agent_id=agent_id, trace_id=trace_id, instruction=instruction)
+    except Exception as e:
+        error = e
+        print(f"Prompt summarization failed for {agent_id}, trimming instead: {e}")
+    await log_agent_event(
+        event_type="LLM_CALL_COMPLETE",
+        agent_id=agent_id,
+        trace_id=trace_id,
+        message_summary=f"LLM call for prompt compaction {'failed' if error else 'completed'}.",
+        status="FAILURE" if error else "SUCCESS",
+        duration_ms=int((loop.time() - started) * 1000),
+        details={
+            "purpose": "compaction",
+            "llm_prompt": prompt,
+            "llm_response": result.text if result else None,
+            "llm_error": str(error) if error else None,
+            "llm_source": result.source if result else None,
+            "prompt_tokens_estimated": estimate_tokens(prompt),
+            "prompt_tokens": result.prompt_tokens if result else None,
+        },
+    )
+    return result.text if result and result.text.strip() else None
@@ -0,0 +1,267 @@
+# agents/llm_governor.py
+
+import random
+from collections import OrderedDict, deque
+
+import asyncio
+
+from .metrics import LLM_QUEUE_WAIT
+
+THROTTLE_MARKERS = ("429", "resource_exhausted", "resource exhausted", "quota", "rate limit", "too many requests")
+
+
+def is_throttling_error(exc: Exception) -> bool:
+    """
+    Returns True if `exc` looks like a quota / rate-limit rejection from the model API.
+    """
+    for attr in ("code", "status_code"):
+        if getattr(exc, attr, None) == 429:
+            return True
+    message = f"{type(exc).__name__} {exc}".lower()
+    return any(marker in message for marker in THROTTLE_MARKERS)
+
+
+class TokenBucket:
+    """
+    A token bucket refilled continuously at `rate_per_minute`. The level may go
+    negative when actual usage turns out higher than estimated; the debt is
+    paid back by the refill before new work is admitted.
+    """
+
+    def __init__(self, rate_per_minute: float, clock, capacity: float = None):
+        """
+        Initializes the TokenBucket.
+
+        Args:
+            rate_per_minute (float): Refill rate. 0 or less means unlimited.
+            clock (callable): Returns the current time in seconds.
+            capacity (float, optional): Maximum burst size. Defaults to one minute of refill.
+        """
+        self.rate_per_minute = rate_per_minute
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self._clock = clock
+        self._level = self.capacity
+        self._updated = None
+
+    @property
+    def unlimited(self) -> bool:
+        return self.rate_per_minute <= 0
+
+    def _refill(self):
+        now = self._clock()
+        if self._updated is not None:
+            self._level = min(self.capacity, self._level + (now - self._updated) * self.rate_per_minute / 60.0)
+        self._updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """
+        Returns how many seconds until `amount` can be taken (0 if it can be taken now).
+        """
+        if self.unlimited:
+            return 0.0
+        self._refill()
+        amount = min(amount, self.capacity)  # A single oversized request must still be admissible
+        if self._level >= amount:
+            return 0.0
+        return (amount - self._level) * 60.0 / self.rate_per_minute
+
+    def take(self, amount: float):
+        if not self.unlimited:
+            self._refill()
+            self._level -= amount
+
+
+class _Waiter:
+    __slots__ = ("agent_id", "tokens", "future", "enqueued_at")
+
+    def __init__(self, agent_id: str, tokens: int, future: asyncio.Future, enqueued_at: float):
+        self.agent_id = agent_id
+        self.tokens = tokens
+        self.future = future
+        self.enqueued_at = enqueued_at
+
+
+class LLMGovernor:
+    """
+    Admission control for the shared model client.
+
+    Calls are admitted only while they fit a requests-per-minute and a
+    tokens-per-minute bucket and the current concurrency limit. Waiting calls are
+    queued per agent and admitted round-robin across agents, so one busy agent
+    cannot starve the others. The concurrency limit adapts AIMD-style: it grows
+    additively on success and is cut multiplicatively when the model reports
+    throttling, after which the throttled call is retried with backoff. Calls
+    that were already in flight when the limit was cut report the same
+    congestion, so their throttling does not cut it again. Failed and cancelled
+    calls (e.g. the losers of a hedge) leave the limit unchanged.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: float = 60,
+        tokens_per_minute: float = 0,
+        max_concurrency: int = 8,
+        min_concurrency: int = 1,
+        max_retries: int = 4,
+        backoff_base: float = 1.0,
+        decrease_factor: float = 0.5,
+        clock=None,
+    ):
+        """
+        Initializes the LLMGovernor.
+
+        Args:
+            requests_per_minute (float, optional): Request quota; 0 for unlimited. Defaults to 60.
+            tokens_per_minute (float, optional): Token quota; 0 for unlimited. Defaults to 0.
+            max_concurrency (int, optional): Upper bound on concurrent calls. Defaults to 8.
+            min_concurrency (int, optional): Lower bound the adaptive limit never drops below. Defaults to 1.
+            max_retries (int, optional): Retries of a throttled call before giving up. Defaults to 4.
+            backoff_base (float, optional): Base retry delay in seconds, doubled per attempt. Defaults to 1.0.
+            decrease_factor (float, optional): Multiplier applied to the limit on throttling. Defaults to 0.5.
+            clock (callable, optional): Returns the current time in seconds. Defaults to the event loop clock.
+        """
+        self._clock = clock or (lambda: asyncio.get_running_loop().time())
+        self.requests = TokenBucket(requests_per_minute, self._clock)
+        self.tokens = TokenBucket(tokens_per_minute, self._clock)
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.decrease_factor = decrease_factor
+        self.concurrency_limit = float(max_concurrency)
+        self.in_flight = 0
+        self._queues = OrderedDict()  # agent_id -> deque of _Waiter, in round-robin order
+        self._timer = None
+        # Queue-wait statistics, for sizing quotas against observed throughput
+        self.admitted = 0  # Also numbers admissions, to tell which calls predate the last decrease
+        self._decreased_at = 0  # Value of `admitted` at the last multiplicative decrease
+        self.throttled = 0
+        self.total_wait_ms = 0.0
+        self.max_wait_ms = 0.0
+
+    def queued(self) -> int:
+        return sum(len(queue) for queue in self._queues.values())
+
+    def stats(self) -> dict:
+        return {
+            "admitted": self.admitted,
+            "throttled": self.throttled,
+            "queued": self.queued(),
+            "in_flight": self.in_flight,
+            "concurrency_limit": int(self.concurrency_limit),
+            "avg_queue_wait_ms": round(self.total_wait_ms / self.admitted, 2) if self.admitted else 0.0,
+            "max_queue_wait_ms": round(self.max_wait_ms, 2),
+        }
+
+    def _next_waiter(self):
+        """
+        Returns the head waiter of the next agent in round-robin order, rotating
+        that agent to the back, or None if nothing is queued.
+        """
+        for agent_id in list(self._queues):
+            queue = self._queues[agent_id]
+            while queue and queue[0].future.done():
+                queue.popleft()  # Cancelled while waiting
+            if not queue:
+                del self._queues[agent_id]
+                continue
+            self._queues.move_to_end(agent_id)
+            return queue[0]
+        return None
+
+    def _dispatch(self):
+        self._timer = None
+        while self.in_flight < max(self.min_concurrency, int(self.concurrency_limit)):
+            waiter = self._next_waiter()
+            if waiter is None:
+                return
+            delay = max(self.requests.wait_time(1), self.tokens.wait_time(waiter.tokens))
+            if delay > 0:
+                # Quota exhausted: try again once the buckets have refilled enough
+                self._timer = asyncio.get_running_loop().call_later(delay, self._dispatch)
+                return
+            self._queues[waiter.agent_id].popleft()
+            self.requests.take(1)
+            self.tokens.take(waiter.tokens)
+            self.in_flight += 1
+            wait_ms = (self._clock() - waiter.enqueued_at) * 1000
+            self.admitted += 1
+            self.total_wait_ms += wait_ms
+            self.max_wait_ms = max(self.max_wait_ms, wait_ms)
+            LLM_QUEUE_WAIT.labels(waiter.agent_id).observe(wait_ms / 1000)
+            waiter.future.set_result((wait_ms, self.admitted))
+
+    async def _acquire(self, agent_id: str, tokens: int) -> tuple:
+        """
+        Waits for admission.
+
+        Returns:
+            tuple: (queue wait in milliseconds, admission number to pass to `_release`).
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._queues.setdefault(agent_id, deque()).append(_Waiter(agent_id, tokens, future, self._clock()))
+        if self._timer is None:
+            self._dispatch()
+        try:
+            return await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self._release(future.result()[1], "cancelled")  # Admitted just as we were cancelled
+            raise
+
+    def _release(self, admission: int, outcome: str):
+        """
+        Frees the slot of a finished call, adapting the limit to its `outcome`:
+        "success", "throttled", or anything else (failed, cancelled) to leave it.
+        """
+        self.in_flight -= 1
+        if outcome == "throttled":
+            self.throttled += 1
+            if admission > self._decreased_at:  # At most one decrease per window of calls in flight
+                self.concurrency_limit = max(self.min_concurrency, self.concurrency_limit * self.decrease_factor)
+                self._decreased_at = self.admitted
+        elif outcome == "success":
+            # Additive increase: roughly +1 per window of `limit` successful calls
+            self.concurrency_limit = min(self.max_concurrency, self.concurrency_limit + 1.0 / self.concurrency_limit)
+        if self._timer is None:
+            self._dispatch()
+
+    def record_usage(self, estimated_tokens: int, actual_tokens: int):
+        """
+        Charges the token bucket for the difference between estimated and actual usage.
+        """
+        if actual_tokens is not None and actual_tokens > estimated_tokens:
+            self.tokens.take(actual_tokens - estimated_tokens)
+
+    async def run(self, agent_id: str, estimated_tokens: int, call) -> tuple:
+        """
+        Runs `call()` once admitted, retrying throttled calls with exponential backoff.
+
+        Args:
+            agent_id (str): The calling agent, for fair queueing.
+            estimated_tokens (int): Tokens the call is expected to use.
+            call (callable): A zero-argument coroutine function performing the model call.
+
+        Returns:
+            tuple: (result, total queue wait in milliseconds across attempts).
+        """
+        total_wait_ms = 0.0
+        for attempt in range(self.max_retries + 1):
+            wait_ms, admission = await self._acquire(agent_id, estimated_tokens)
+            total_wait_ms += wait_ms
+            try:
+                result = await call()
+            except Exception as e:
+                throttled = is_throttling_error(e)
+                self._release(admission, "throttled" if throttled else "failed")
+                if not throttled or attempt == self.max_retries:
+                    raise
+                delay = self.backoff_base * (2**attempt) * (0.5 + random.random())
+                print(f"LLM throttled for {agent_id} (attempt {attempt + 1}), backing off {delay:.1f}s: {e}")
+                await asyncio.sleep(delay)
+                continue
+            except BaseException:
+                self._release(admission, "cancelled")
+                raise
+            self._release(admission, "success")
+            return result, total_wait_ms
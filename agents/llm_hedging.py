@@ -0,0 +1,168 @@
+# agents/llm_hedging.py
+
+from collections import deque
+
+import asyncio
+
+
+class LatencyTracker:
+    """
+    Keeps a rolling window of recent call latencies (in seconds).
+    """
+
+    def __init__(self, window: int = 200):
+        self._samples = deque(maxlen=window)
+
+    def record(self, seconds: float):
+        self._samples.append(seconds)
+
+    def __len__(self):
+        return len(self._samples)
+
+    def percentile(self, pct: float) -> float:
+        """
+        Returns the `pct` percentile (0-100) of the window, or None if it is empty.
+        """
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * (len(ordered) - 1)))))
+        return ordered[index]
+
+
+class HedgePolicy:
+    """
+    Decides when a slow call gets a duplicate ("hedge"): once it has been running
+    longer than the `percentile` of recent latency. No hedging happens until the
+    tracker has `min_samples` observations.
+    """
+
+    def __init__(self, percentile: float = 95, min_samples: int = 20, max_hedges: int = 1, min_delay: float = 0.05):
+        """
+        Initializes the HedgePolicy.
+
+        Args:
+            percentile (float, optional): Latency percentile after which to hedge. Defaults to 95.
+            min_samples (int, optional): Observations needed before hedging. Defaults to 20.
+            max_hedges (int, optional): Maximum duplicates per call. Defaults to 1.
+            min_delay (float, optional): Lower bound on the hedge delay in seconds. Defaults to 0.05.
+        """
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.max_hedges = max_hedges
+        self.min_delay = min_delay
+
+    def delay(self, tracker: LatencyTracker) -> float:
+        """
+        Returns the hedge delay in seconds, or None if hedging should not happen.
+        """
+        if self.max_hedges <= 0 or len(tracker) < self.min_samples:
+            return None
+        return max(self.min_delay, tracker.percentile(self.percentile))
+
+
+async def _cancel_all(tasks: list):
+    pending = [task for task in tasks if not task.done()]
+    for task in pending:
+        task.cancel()
+    await asyncio.gather(*pending, return_exceptions=True)
+
+
+async def hedged_call(call, delay: float, max_hedges: int = 1, on_hedge=None, started: asyncio.Event = None) -> tuple:
+    """
+    Runs `call()`; if it has not returned after `delay` seconds, fires a duplicate
+    (up to `max_hedges` times, spaced `delay` apart) and takes whichever finishes
+    first. The losers are cancelled.
+
+    With `started`, the delay only counts from when that event is set, i.e. once
+    the first attempt has left any admission queue and is actually running. The
+    delay comes from latencies that exclude queueing, and a duplicate would only
+    queue behind the original.
+
+    Args:
+        call (callable): Zero-argument coroutine function performing the call.
+        delay (float): Seconds before each hedge, or None to never hedge.
+        max_hedges (int, optional): Maximum number of duplicates. Defaults to 1.
+        on_hedge (callable, optional): Coroutine function called with the attempt index
+                                       just before each hedge fires. Defaults to None.
+        started (asyncio.Event, optional): Set by the first attempt once it is admitted. Defaults to
+                                           None, which counts the delay from the call.
+
+    Returns:
+        tuple: (result, index of the winning attempt, number of attempts started).
+
+    Raises:
+        Exception: The last error, if every attempt failed.
+    """
+    tasks = [asyncio.ensure_future(call())]
+    last_error = None
+    try:
+        if started is not None and delay is not None:
+            admitted = asyncio.ensure_future(started.wait())
+            try:
+                await asyncio.wait({tasks[0], admitted}, return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                await _cancel_all([admitted])
+        while True:
+            active = {task for task in tasks if not task.done()}
+            if not active:
+                raise last_error  # Every attempt failed; errors are not hedged
+            can_hedge = delay is not None and len(tasks) <= max_hedges
+            done, _ = await asyncio.wait(
+                active, timeout=delay if can_hedge else None, return_when=asyncio.FIRST_COMPLETED
+            )
+            if not done:
+                if on_hedge is not None:
+                    await on_hedge(len(tasks))
+                tasks.append(asyncio.ensure_future(call()))
+                continue
+            for task in done:
+                if task.exception() is None:
+                    return task.result(), tasks.index(task), len(tasks)
+                last_error = task.exception()
+    finally:
+        await _cancel_all(tasks)
+
+
+async def first_valid(call, candidates: int, validator, on_candidate=None) -> tuple:
+    """
+    Fires `candidates` calls in parallel and returns the first result that passes
+    `validator`. The remaining calls are cancelled. If no result is valid, the
+    first successful one is returned.
+
+    Args:
+        call (callable): Zero-argument coroutine function performing the call.
+        candidates (int): Number of parallel calls.
+        validator (callable): Cheap check `validator(result) -> bool`.
+        on_candidate (callable, optional): Coroutine function called with each candidate's index
+                                           and whether it was valid, as it completes. Defaults to None.
+
+    Returns:
+        tuple: (result, index of the chosen candidate, number of candidates started).
+    """
+
+    async def candidate(index: int) -> tuple:
+        return index, await call()
+
+    tasks = [asyncio.ensure_future(candidate(index)) for index in range(candidates)]
+    fallback = None
+    last_error = None
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            try:
+                index, result = await next_done
+            except Exception as e:
+                last_error = e
+                continue
+            valid = validator(result)
+            if on_candidate is not None:
+                await on_candidate(index, valid)
+            if valid:
+                return result, index, len(tasks)
+            if fallback is None:
+                fallback = (result, index, len(tasks))
+        if fallback is not None:
+            return fallback
+        raise last_error
+    finally:
+        await _cancel_all(tasks)
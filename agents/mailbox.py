@@ -0,0 +1,158 @@
+# agents/mailbox.py
+
+import re
+import time
+
+import asyncio
+
+from .metrics import MAILBOX_DEPTH, MAILBOX_SHED, MAILBOX_WAIT
+from .utils import get_env
+
+OVERFLOW_POLICIES = ("block", "reject", "drop_oldest")
+
+# Prefix of the reply sent in place of a real one when a request is shed
+SHED_REPLY_PREFIX = "ERROR: Overloaded: "
+
+
+class MailboxFullError(Exception):
+    """
+    Raised by a workflow whose request was shed by a full mailbox.
+    """
+
+
+def is_shed_reply(text: str) -> bool:
+    return isinstance(text, str) and text.startswith(SHED_REPLY_PREFIX)
+
+
+def mailbox_details(context: dict) -> dict:
+    """
+    Returns the mailbox depth and wait time a transport recorded in a message's
+    context, for the details of the handling agent's events ({} without a mailbox).
+    """
+    if "mailbox_wait_ms" not in context:
+        return {}
+    return {"mailbox_wait_ms": context["mailbox_wait_ms"], "mailbox_depth": context.get("mailbox_depth")}
+
+
+def _env_suffix(agent_id: str) -> str:
+    # "CodingAgent" -> "CODING_AGENT"
+    return re.sub(r"(?<=[a-z0-9])(?=[A-Z])", "_", agent_id).upper()
+
+
+class Mailbox:
+    """
+    A FIFO of messages waiting for an agent, with an optional capacity. When it
+    is full, a new message is handled by the overflow policy:
+
+        block        the sender waits for space (back-pressure)
+        reject       the new message is shed
+        drop_oldest  the oldest waiting message is shed to make room
+
+    Shed messages are returned to the caller of `put`, which tells their
+    senders. Depth and wait times are exported as metrics per agent.
+    """
+
+    def __init__(self, agent_id: str, capacity: int = 0, policy: str = "block", clock=time.monotonic):
+        """
+        Initializes the Mailbox.
+
+        Args:
+            agent_id (str): The agent the mailbox belongs to, for metrics.
+            capacity (int, optional): Maximum number of waiting messages; 0 for unbounded. Defaults to 0.
+            policy (str, optional): "block", "reject" or "drop_oldest". Defaults to "block".
+            clock (callable, optional): Returns the current time in seconds. Defaults to time.monotonic.
+        """
+        if policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown mailbox overflow policy '{policy}', expected one of {OVERFLOW_POLICIES}.")
+        self.agent_id = agent_id
+        self.capacity = max(0, capacity)
+        self.policy = policy
+        self._clock = clock
+        self._queue = asyncio.Queue(self.capacity)  # Items are (message, enqueued_at)
+        self._depth = MAILBOX_DEPTH.labels(agent_id)
+        self._wait = MAILBOX_WAIT.labels(agent_id)
+        self.accepted = 0
+        self.shed = 0
+        self.max_depth = 0
+
+    @classmethod
+    def from_env(cls, agent_id: str, capacity: int = None, policy: str = None) -> "Mailbox":
+        """
+        Creates an agent's mailbox from ADK_MAILBOX_CAPACITY_<AGENT> and
+        ADK_MAILBOX_POLICY_<AGENT> (e.g. ADK_MAILBOX_CAPACITY_CODING_AGENT), falling
+        back to ADK_MAILBOX_CAPACITY and ADK_MAILBOX_POLICY. Explicit arguments
+        take precedence over the environment.
+        """
+        suffix = _env_suffix(agent_id)
+        if capacity is None:
+            capacity = int(get_env(f"ADK_MAILBOX_CAPACITY_{suffix}", get_env("ADK_MAILBOX_CAPACITY", "0")))
+        if policy is None:
+            policy = get_env(f"ADK_MAILBOX_POLICY_{suffix}", get_env("ADK_MAILBOX_POLICY", "block"))
+        return cls(agent_id, capacity, policy)
+
+    @property
+    def bounded(self) -> bool:
+        return self.capacity > 0
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize()
+
+    def full(self) -> bool:
+        return self._queue.full()
+
+    def _accept(self, message):
+        self._queue.put_nowait((message, self._clock()))
+        self.accepted += 1
+        depth = self._queue.qsize()
+        self.max_depth = max(self.max_depth, depth)
+        self._depth.set(depth)
+
+    async def put(self, message):
+        """
+        Adds a message, applying the overflow policy if the mailbox is full.
+
+        Returns:
+            The shed message (the new one for "reject", the oldest for "drop_oldest"),
+            or None if nothing was shed.
+        """
+        shed = None
+        if self._queue.full():
+            if self.policy == "block":
+                await self._queue.put((message, self._clock()))
+                self.accepted += 1
+                self.max_depth = max(self.max_depth, self._queue.qsize())
+                self._depth.set(self._queue.qsize())
+                return None
+            if self.policy == "reject":
+                shed = message
+            else:
+                shed, _ = self._queue.get_nowait()
+            self.shed += 1
+            MAILBOX_SHED.labels(self.agent_id, self.policy).inc()
+        if shed is not message:
+            self._accept(message)
+        return shed
+
+    async def get(self) -> tuple:
+        """
+        Waits for the next message.
+
+        Returns:
+            tuple: (message, seconds it waited in the mailbox).
+        """
+        message, enqueued_at = await self._queue.get()
+        waited = self._clock() - enqueued_at
+        self._depth.set(self._queue.qsize())
+        self._wait.observe(waited)
+        return message, waited
+
+    def stats(self) -> dict:
+        return {
+            "depth": self.depth,
+            "capacity": self.capacity,
+            "policy": self.policy,
+            "accepted": self.accepted,
+            "shed": self.shed,
+            "max_depth": self.max_depth,
+        }
@@ -0,0 +1,280 @@
+# agents/metrics.py
+"""
+In-process metrics: counters, gauges and fixed-bucket histograms, rendered in
+the Prometheus text exposition format and served on a local HTTP endpoint.
+
+Recording is meant for the hot path. A labelled child is looked up in a dict
+and updated in place; the only lock is taken the first time a label
+combination is seen. Updates come from the event loop thread, and a scrape
+reads a snapshot of the values.
+
+    LLM_LATENCY.labels("CodingAgent").observe(1.42)
+    start_metrics_server(9464)  # curl localhost:9464/metrics
+"""
+
+import bisect
+import threading
+
+DEFAULT_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _CounterChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0):
+        self.value += amount
+
+
+class _GaugeChild(_CounterChild):
+    __slots__ = ()
+
+    def set(self, value: float):
+        self.value = value
+
+    def dec(self, amount: float = 1.0):
+        self.value -= amount
+
+
+class _HistogramChild:
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds: tuple):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # The last slot is the +Inf bucket
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Metric:
+    """
+    Base class for metrics. A metric with label names has one child per
+    combination of label values; one without is used directly.
+    """
+
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values):
+        """
+        Returns the child for these label values (in `labelnames` order).
+        """
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}, got {values}")
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _samples(self) -> list:
+        """
+        Returns (suffix, label text, value) tuples for the exposition format.
+        """
+        return [
+            ("", _format_labels(self.labelnames, values), child.value) for values, child in list(self._children.items())
+        ]
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(f"{self.name}{suffix}{labels} {_format_value(value)}" for suffix, labels, value in self._samples())
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0):
+        self.labels().inc(amount)
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value: float):
+        self.labels().set(value)
+
+    def inc(self, amount: float = 1.0):
+        self.labels().inc(amount)
+
+    def dec(self, amount: float = 1.0):
+        self.labels().dec(amount)
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = DEFAULT_LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float):
+        self.labels().observe(value)
+
+    def _samples(self) -> list:
+        samples = []
+        for values, child in list(self._children.items()):
+            counts = list(child.counts)
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                samples.append(("_bucket", _format_labels(self.labelnames, values, le), cumulative))
+            labels = _format_labels(self.labelnames, values)
+            samples.append(("_sum", labels, child.sum))
+            samples.append(("_count", labels, cumulative))
+        return samples
+
+
+class MetricsRegistry:
+    """
+    A named collection of metrics, rendered together for a scrape.
+    """
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric_cls, name: str, *args, **kwargs) -> Metric:
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = metric_cls(name, *args, **kwargs)
+            elif not isinstance(metric, metric_cls):
+                raise ValueError(f"Metric {name} is already registered as a {metric.kind}.")
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: tuple = ()) -> Counter:
+        return self._register(Counter, name, documentation, labelnames)
+
+    def gauge(self, name: str, documentation: str, labelnames: tuple = ()) -> Gauge:
+        return self._register(Gauge, name, documentation, labelnames)
+
+    def histogram(
+        self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = DEFAULT_LATENCY_BUCKETS
+    ) -> Histogram:
+        return self._register(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def get(self, name: str) -> Metric:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        """
+        Returns every metric in the Prometheus text exposition format (0.0.4).
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(metric.render() for metric in metrics) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+EVENTS_EMITTED = REGISTRY.counter("adk_events_total", "Agent events logged.", ("event_type",))
+EVENT_ERRORS = REGISTRY.counter(
+    "adk_event_errors_total", "Agent events logged with a FAILURE status or an ERROR type.", ("event_type",)
+)
+LLM_LATENCY = REGISTRY.histogram("adk_llm_latency_seconds", "LLM call latency per agent.", ("agent_id",))
+LLM_QUEUE_WAIT = REGISTRY.histogram(
+    "adk_llm_queue_wait_seconds", "Time an LLM call waited for admission by the governor.", ("agent_id",)
+)
+STAGE_LATENCY = REGISTRY.histogram(
+    "adk_stage_latency_seconds", "ProjectManagerAgent workflow stage latency.", ("stage",)
+)
+SINK_QUEUE_DEPTH = REGISTRY.gauge("adk_event_sink_queue_depth", "Events waiting in the event sink queue.")
+SINK_FLUSH_LAG = REGISTRY.histogram(
+    "adk_event_sink_flush_lag_seconds", "Time from queueing the oldest event of a batch to its delivery."
+)
+SINK_ROWS_DELIVERED = REGISTRY.counter("adk_event_sink_rows_total", "Event rows handed to the event backend.")
+SINK_DELIVERY_FAILURES = REGISTRY.counter(
+    "adk_event_sink_failures_total", "Event batches that could not be delivered after all retries."
+)
+SPOOL_PENDING_BYTES = REGISTRY.gauge("adk_event_spool_pending_bytes", "Spooled event bytes not yet replayed.")
+SPOOL_DEAD_LETTERED = REGISTRY.counter(
+    "adk_event_spool_dead_lettered_total", "Spooled event rows the warehouse rejected permanently."
+)
+MAILBOX_DEPTH = REGISTRY.gauge("adk_mailbox_depth", "Messages waiting in an agent's mailbox.", ("agent_id",))
+MAILBOX_WAIT = REGISTRY.histogram(
+    "adk_mailbox_wait_seconds", "Time a message waited in an agent's mailbox before handling.", ("agent_id",)
+)
+MAILBOX_SHED = REGISTRY.counter(
+    "adk_mailbox_shed_total", "Messages rejected or dropped by a full mailbox.", ("agent_id", "policy")
+)
+SCHEDULER_QUEUED = REGISTRY.gauge(
+    "adk_scheduler_queued", "Workflows waiting for a scheduler slot.", ("tenant", "priority")
+)
+SCHEDULER_RUNNING = REGISTRY.gauge("adk_scheduler_running", "Workflows holding a scheduler slot.", ("tenant",))
+SCHEDULER_WAIT = REGISTRY.histogram(
+    "adk_scheduler_wait_seconds", "Time a workflow waited for a scheduler slot.", ("tenant", "priority")
+)
+
+
+def start_metrics_server(port: int, host: str = "127.0.0.1", registry: MetricsRegistry = REGISTRY):
+    """
+    Serves `registry` at http://host:port/metrics from a daemon thread.
+
+    Returns:
+        ThreadingHTTPServer: The server; call `shutdown()` to stop it.
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer  # Only needed when serving
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?", 1)[0] not in ("/metrics", "/"):
+                self.send_error(404)
+                return
+            body = registry.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="adk-metrics", daemon=True).start()
+    return server
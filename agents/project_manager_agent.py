@@ -211,17 +211,34 @@ import asyncio
 import uuid
 from google.adk.agents import Agent  # type: ignore
 
-from .utils import llm_model, log_agent_event  # Use llm_model instead of llm
-
-
-class ProjectManagerAgent(Agent):
+from .mailbox import MailboxFullError, is_shed_reply
+from .scheduler import FairScheduler, request_class
+from .tracing import span
+from .transport import TransportMixin
+from .utils import get_env, llm_model, log_agent_event  # Use llm_model instead of llm
+from .workflow import (
+    STREAM_END_MARKER,
+    ReadinessMixin,
+    ReplyDemultiplexer,
+    WorkflowHandle,
+    WorkflowRegistry,
+    WorkflowState,
+)
+
+
+class ProjectManagerAgent(ReadinessMixin, TransportMixin, Agent):
     """
     The ProjectManagerAgent orchestrates the entire software development lifecycle (SDLC)
     by coordinating tasks among other specialized agents. It receives initial requests,
     dispatches sub-tasks, and tracks the overall progress and status of the workflow.
+
+    Every request runs as its own workflow with its own WorkflowState, so a single
+    Project Manager can drive many workflows concurrently.
     """
 
-    def __init__(self, name: str, other_agents: dict):
+    receives_replies = True  # Over a transport, inbound messages are replies for receive_message
+
+    def __init__(self, name: str, other_agents: dict, stream_code: bool = None, scheduler: FairScheduler = None):
         """
         Initializes the ProjectManagerAgent.
 
@@ -229,6 +246,10 @@ class ProjectManagerAgent(Agent):
             name (str): The unique name of the agent.
             other_agents (dict): A dictionary mapping agent names (str) to their
                                  Agent instances, allowing the PM to send messages.
+            stream_code (bool, optional): Ask the CodingAgent to stream code as it is generated.
+                                          Defaults to the ADK_STREAM_CODE environment variable.
+            scheduler (FairScheduler, optional): Admits workflows by the tenant and priority in their
+                                                 context. Defaults to None, which runs every workflow at once.
         """
         super().__init__(
             name=name,
@@ -237,130 +258,265 @@ class ProjectManagerAgent(Agent):
             instruction="Manage the SDLC from initial request to final delivery by coordinating other agents.",
         )
         self.other_agents = other_agents  # Store references to other agents
-        self.current_trace_id = None  # To hold the ID for the current workflow run
+        self.stream_code = stream_code if stream_code is not None else get_env("ADK_STREAM_CODE", "0") == "1"
+        self.workflows = WorkflowRegistry()  # Trace ID -> state of each workflow in flight
+        self.scheduler = scheduler
+        self._replies = ReplyDemultiplexer(self._receive_reply, is_active=lambda trace_id: trace_id in self.workflows)
 
-    async def handle_message(self, content: str, sender_id: str, context: dict):
+    async def _receive_reply(self, sender_id: str, trace_id: str):
+        # The ADK receive_message takes sender_id and optional context
+        return await self.receive_message(
+            sender_id=sender_id,
+            context={"trace_id": trace_id},  # Use context for filtering
+        )
+
+    async def _wait_reply(self, sender_id: str, trace_id: str) -> str:
         """
-        Handles incoming messages for the Project Manager, initiating and
-        managing the SDLC workflow.
+        Waits for an agent's reply to this workflow.
+
+        Raises:
+            MailboxFullError: If the agent's full mailbox shed the request.
+        """
+        reply = await self._replies.wait_for(sender_id, trace_id)
+        if is_shed_reply(reply):
+            raise MailboxFullError(reply)
+        return reply
+
+    def submit(self, content: str, sender_id: str, context: dict) -> WorkflowHandle:
+        """
+        Starts a new SDLC workflow in the background and returns a handle to it.
 
         Args:
-            content (str): The text content of the message.
-            sender_id (str): The ID of the agent or entity that sent the message.
+            content (str): The text content of the initial request.
+            sender_id (str): The ID of the agent or entity that sent the request.
             context (dict): A dictionary containing contextual information for the message,
-                            including the trace_id for session tracking.
+                            including the trace_id for session tracking and optionally the
+                            "tenant" and "priority" ("interactive" or "batch") for scheduling.
+
+        Returns:
+            WorkflowHandle: An awaitable handle with per-stage futures.
         """
         # Determine/Propagate trace_id for the session
-        self.current_trace_id = context.get("trace_id", str(uuid.uuid4()))
-
-        start_time = time.time()
-        await log_agent_event(
-            event_type="AGENT_START",
-            agent_id=self.name,
-            trace_id=self.current_trace_id,
-            message_summary=f"Received initial request: {content}",
-            source_agent_id=sender_id,
-            details={"original_request": content},
-        )
-        print(f"{self.name}: Received initial request from {sender_id}: {content}")
-
-        initial_request_text = content
-
-        # 1. Request Requirements
-        # The ADK send_message takes recipient_id, content, and then context as kwargs
-        req_start_time = time.time()
-        await self.send_message(
-            recipient_id="RequirementsAgent",
-            content=f"Generate detailed requirements for: {initial_request_text}",
-            context={"trace_id": self.current_trace_id},  # Propagate trace_id
-        )
-        await log_agent_event(
-            event_type="MESSAGE_SEND",
-            agent_id=self.name,
-            trace_id=self.current_trace_id,
-            message_summary=f"Requesting requirements for: {initial_request_text[:50]}...",
-            source_agent_id=self.name,
-            target_agent_id="RequirementsAgent",
-            details={"task_description": initial_request_text},
-        )
-        print(f"{self.name}: Sent task to RequirementsAgent.")
+        trace_id = context.get("trace_id") or str(uuid.uuid4())
+        state = self.workflows.start(trace_id, content, sender_id)
+        handle = WorkflowHandle(state)
+        handle.task = asyncio.get_running_loop().create_task(self._execute(handle, context))
+        return handle
 
-        # The ADK receive_message takes sender_id and optional context
-        requirements_text = await self.receive_message(
-            sender_id="RequirementsAgent",
-            context={"trace_id": self.current_trace_id},  # Use context for filtering
-        )
-        req_end_time = time.time()
-        await log_agent_event(
-            event_type="MESSAGE_RECEIVE",
-            agent_id=self.name,
-            trace_id=self.current_trace_id,
-            message_summary=f"Received requirements: {requirements_text[:100]}...",
-            source_agent_id="RequirementsAgent",
-            target_agent_id=self.name,
-            duration_ms=int(
-                (req_end_time - req_start_time) * 1000
-            ),  # Duration of request-response cycle
-            details={"full_response_text": requirements_text},
-        )
-        print(f"{self.name}: Received Requirements: {requirements_text[:50]}...")
+    async def _receive_code(self, trace_id: str, handle: WorkflowHandle) -> tuple:
+        """
+        Waits for the CodingAgent's reply. When streaming, forwards each chunk to
+        the workflow handle until the end-of-stream message arrives.
 
-        # Simulate a delay for human-like processing
-        await asyncio.sleep(1)
+        Returns:
+            tuple: (generated code, `perf_counter_ns` time of the first chunk or None).
+        """
+        first_chunk_at = None
+        while True:
+            reply = await self._wait_reply("CodingAgent", trace_id)
+            if not self.stream_code:
+                return reply, None
+            if reply.startswith(STREAM_END_MARKER):
+                return reply[len(STREAM_END_MARKER) :], first_chunk_at
+            if first_chunk_at is None:
+                first_chunk_at = time.perf_counter_ns()
+            handle.add_code_chunk(reply)
 
-        # 2. Request Code based on Requirements
-        code_start_time = time.time()
-        await self.send_message(
-            recipient_id="CodingAgent",
-            content=f"Write Python code based on these requirements: {requirements_text}",
-            context={"trace_id": self.current_trace_id},
-        )
-        await log_agent_event(
-            event_type="MESSAGE_SEND",
-            agent_id=self.name,
-            trace_id=self.current_trace_id,
-            message_summary=f"Requesting code based on requirements: {requirements_text[:50]}...",
-            source_agent_id=self.name,
-            target_agent_id="CodingAgent",
-            details={"requirements_provided": requirements_text},
-        )
-        print(f"{self.name}: Sent task to CodingAgent.")
+    async def handle_message(self, content: str, sender_id: str, context: dict):
+        """
+        Handles incoming messages for the Project Manager, initiating and
+        managing the SDLC workflow, and returns once it has finished.
 
-        generated_code = await self.receive_message(
-            sender_id="CodingAgent", context={"trace_id": self.current_trace_id}
-        )
-        code_end_time = time.time()
-        await log_agent_event(
-            event_type="MESSAGE_RECEIVE",
-            agent_id=self.name,
-            trace_id=self.current_trace_id,
-            message_summary=f"Received code: {generated_code[:100]}...",
-            source_agent_id="CodingAgent",
-            target_agent_id=self.name,
-            duration_ms=int((code_end_time - code_start_time) * 1000),
-            details={"full_generated_code": generated_code},
-        )
-        print(f"{self.name}: Received Code: \n{generated_code[:100]}...")
+        Args:
+            content (str): The text content of the message.
+            sender_id (str): The ID of the agent or entity that sent the message.
+            context (dict): A dictionary containing contextual information for the message,
+                            including the trace_id for session tracking.
 
-        # Simulate Testing Phase
-        test_status = "SUCCESS"
-        if "simulated_test_fail" in initial_request_text.lower():
-            test_status = "FAILURE"
-            print(f"{self.name}: Simulating a test failure as requested.")
+        Returns:
+            WorkflowState: The final state of the workflow.
+        """
+        return await self.submit(content, sender_id, context)
+
+    async def _execute(self, handle: WorkflowHandle, context: dict):
+        state = handle.state
+        admitted = False
+        try:
+            state.tenant, state.priority = request_class(context)
+            if self.scheduler is not None:
+                state.status = "QUEUED"
+                state.queue_wait_ms = int(await self.scheduler.acquire(state.tenant, state.priority))
+                admitted = True
+                state.status = "RUNNING"
+            await self._run_workflow(state, handle, context)
+            handle.set_finished()
+        except BaseException as e:
+            state.status = "FAILURE"
+            handle.set_failed(e)
+            if not isinstance(e, Exception):
+                raise
+            await self._log_failure(state, e)
+        finally:
+            if admitted:
+                self.scheduler.release(state.tenant)
+            # Finished workflows are evicted so state doesn't pile up
+            self.workflows.evict(state.trace_id)
+            self._replies.discard(state.trace_id)
+
+    async def _log_failure(self, state: WorkflowState, error: Exception):
+        """
+        Logs the terminal TASK_COMPLETE event of a workflow that raised, so that
+        the trace records how and where it ended.
+        """
+        if state.requirements_text is None:
+            failed_stage = "requirements"
+        elif state.generated_code is None:
+            failed_stage = "coding"
         else:
-            print(f"{self.name}: Simulating successful testing.")
-
-        end_time = time.time()
-        await log_agent_event(
-            event_type="TASK_COMPLETE",
-            agent_id=self.name,
-            trace_id=self.current_trace_id,
-            message_summary=f"Finished SDLC workflow. Final status: {test_status}",
-            status=test_status,
-            duration_ms=int((end_time - start_time) * 1000),  # Total duration
-            details={
-                "final_code_snippet": generated_code[:500],
-                "test_status": test_status,
-            },
-        )
-        print(f"{self.name}: SDLC workflow completed with status: {test_status}")
+            failed_stage = "testing"
+        try:
+            await log_agent_event(
+                event_type="TASK_COMPLETE",
+                agent_id=self.name,
+                trace_id=state.trace_id,
+                message_summary=f"SDLC workflow failed during {failed_stage}: {error}",
+                status="FAILURE",
+                duration_ms=(time.perf_counter_ns() - state.started_ns) // 1_000_000,
+                details={
+                    "error": f"{type(error).__name__}: {error}",
+                    "failed_stage": failed_stage,
+                    "stage_timings_ms": dict(state.stage_timings),
+                    "tenant": state.tenant,
+                },
+            )
+        except Exception as e:
+            print(f"{self.name}: Error logging the failure of trace {state.trace_id}: {e}")
+        print(f"{self.name}: SDLC workflow failed during {failed_stage}: {error}")
+
+    async def _run_workflow(self, state: WorkflowState, handle: WorkflowHandle, context: dict):
+        trace_id = state.trace_id
+        sender_id = state.sender_id
+        initial_request_text = state.request_text
+
+        # The workflow span is a child of the submitter's span, if the context carries one
+        async with span(
+            f"{self.name}.workflow", kind="task", agent_id=self.name, trace_id=trace_id, context=context
+        ) as workflow_span:
+            await log_agent_event(
+                event_type="AGENT_START",
+                agent_id=self.name,
+                trace_id=trace_id,
+                message_summary=f"Received initial request: {initial_request_text}",
+                source_agent_id=sender_id,
+                details={
+                    "original_request": initial_request_text,
+                    "tenant": state.tenant,
+                    "priority": state.priority,
+                    "queue_wait_ms": state.queue_wait_ms,
+                },
+            )
+            print(f"{self.name}: Received initial request from {sender_id}: {initial_request_text}")
+
+            # 1. Request Requirements
+            # The ADK send_message takes recipient_id, content, and then context as kwargs
+            async with span("stage:requirements", kind="stage") as stage_span:
+                await self.send_message(
+                    recipient_id="RequirementsAgent",
+                    content=f"Generate detailed requirements for: {initial_request_text}",
+                    context=stage_span.inject({"trace_id": trace_id}),  # Propagate trace_id and parent span
+                )
+                await log_agent_event(
+                    event_type="MESSAGE_SEND",
+                    agent_id=self.name,
+                    trace_id=trace_id,
+                    message_summary=f"Requesting requirements for: {initial_request_text[:50]}...",
+                    source_agent_id=self.name,
+                    target_agent_id="RequirementsAgent",
+                    details={"task_description": initial_request_text},
+                )
+                print(f"{self.name}: Sent task to RequirementsAgent.")
+
+                # Replies are demultiplexed by trace, so concurrent workflows never see each other's responses
+                requirements_text = await self._wait_reply("RequirementsAgent", trace_id)
+            state.requirements_text = requirements_text
+            handle.set_requirements(requirements_text)
+            req_duration_ms = state.record_stage("requirements", stage_span.elapsed_ms())
+            await log_agent_event(
+                event_type="MESSAGE_RECEIVE",
+                agent_id=self.name,
+                trace_id=trace_id,
+                message_summary=f"Received requirements: {requirements_text[:100]}...",
+                source_agent_id="RequirementsAgent",
+                target_agent_id=self.name,
+                duration_ms=req_duration_ms,  # Duration of request-response cycle
+                details={"full_response_text": requirements_text},
+            )
+            print(f"{self.name}: Received Requirements: {requirements_text[:50]}...")
+
+            # 2. Request Code based on Requirements
+            async with span("stage:coding", kind="stage") as stage_span:
+                code_context = {"trace_id": trace_id}
+                if self.stream_code:
+                    code_context["stream"] = True  # Ask for chunks as they are generated
+                await self.send_message(
+                    recipient_id="CodingAgent",
+                    content=f"Write Python code based on these requirements: {requirements_text}",
+                    context=stage_span.inject(code_context),
+                )
+                await log_agent_event(
+                    event_type="MESSAGE_SEND",
+                    agent_id=self.name,
+                    trace_id=trace_id,
+                    message_summary=f"Requesting code based on requirements: {requirements_text[:50]}...",
+                    source_agent_id=self.name,
+                    target_agent_id="CodingAgent",
+                    details={"requirements_provided": requirements_text},
+                )
+                print(f"{self.name}: Sent task to CodingAgent.")
+
+                generated_code, first_chunk_ns = await self._receive_code(trace_id, handle)
+            state.generated_code = generated_code
+            handle.set_code(generated_code)
+            code_duration_ms = state.record_stage("coding", stage_span.elapsed_ms())
+            await log_agent_event(
+                event_type="MESSAGE_RECEIVE",
+                agent_id=self.name,
+                trace_id=trace_id,
+                message_summary=f"Received code: {generated_code[:100]}...",
+                source_agent_id="CodingAgent",
+                target_agent_id=self.name,
+                duration_ms=code_duration_ms,
+                details={
+                    "full_generated_code": generated_code,
+                    "streamed": self.stream_code,
+                    "first_chunk_ms": (first_chunk_ns - stage_span.start_ns) // 1_000_000 if first_chunk_ns else None,
+                },
+            )
+            print(f"{self.name}: Received Code: \n{generated_code[:100]}...")
+
+            # Simulate Testing Phase
+            test_status = "SUCCESS"
+            if "simulated_test_fail" in initial_request_text.lower():
+                test_status = "FAILURE"
+                print(f"{self.name}: Simulating a test failure as requested.")
+            else:
+                print(f"{self.name}: Simulating successful testing.")
+            state.status = test_status
+            workflow_span.status = test_status
+
+            total_duration_ms = state.record_stage("total", workflow_span.elapsed_ms())
+            await log_agent_event(
+                event_type="TASK_COMPLETE",
+                agent_id=self.name,
+                trace_id=trace_id,
+                message_summary=f"Finished SDLC workflow. Final status: {test_status}",
+                status=test_status,
+                duration_ms=total_duration_ms,  # Total duration
+                details={
+                    "final_code_snippet": generated_code[:500],
+                    "test_status": test_status,
+                    "stage_timings_ms": dict(state.stage_timings),
+                    "tenant": state.tenant,
+                },
+            )
+            print(f"{self.name}: SDLC workflow completed with status: {test_status}")
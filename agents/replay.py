@@ -0,0 +1,403 @@
+# agents/replay.py
+"""
+Deterministic replay of recorded traces.
+
+A trace is read back from the trace store and the ProjectManagerAgent
+workflow is run again with every LLM call answered from the trace's own
+LLM_CALL_COMPLETE events instead of the model. The response cache, hedging,
+single-flight sharing and the governor's limits are bypassed, so a replay
+runs at full speed and makes no network calls. The replayed event stream is
+then diffed against the original after removing everything that legitimately
+changes between runs (IDs, timestamps, durations).
+
+Responses are matched on the exact prompt. Traces recorded since
+LLM_CALL_COMPLETE carries `llm_response`/`llm_error` replay exactly; for older
+traces the agent's final output (TASK_COMPLETE) stands in for the raw response.
+
+Usage:
+    python -m agents.replay 3f2a...                 # replay and diff one trace
+    python -m agents.replay 3f2a... --repeat 200    # 200 concurrent replays, for orchestration perf tests
+    python -m agents.replay 3f2a... --input events.jsonl
+"""
+
+import argparse
+import difflib
+import json
+import os
+import sys
+import time
+from collections import defaultdict
+from types import SimpleNamespace
+
+import asyncio
+import uuid
+
+from .coding_agent import CodingAgent
+from .event_backends import SQLiteBackend
+from .events import dumps_json
+from .llm_calls import set_hedge_policy, set_llm_cache, set_llm_governor
+from .llm_governor import LLMGovernor
+from .project_manager_agent import ProjectManagerAgent
+from .requirements_agent import RequirementsAgent
+from .trace_store import DEFAULT_TRACE_DB, TraceStore
+from .tracing import span
+from .utils import (
+    close_agent_events,
+    flush_agent_events,
+    resolve_event_details,
+    set_event_backend,
+    set_llm_model,
+)
+
+# Recorded final outputs used as the response of traces logged without `llm_response`
+FINAL_OUTPUT_KEYS = {"RequirementsAgent": "generated_requirements", "CodingAgent": "generated_code"}
+# Event fields that differ on every run
+VOLATILE_FIELDS = ("timestamp", "event_id", "trace_id", "span_id", "parent_span_id", "duration_ms", "schema_version")
+# Detail keys that hold timings, rates or where a response was served from, rather than behaviour
+VOLATILE_DETAIL_SUFFIXES = ("_ms", "_ns", "_per_sec")
+# Token counts come from the model and mailbox depths from the load, not the recording
+VOLATILE_DETAIL_KEYS = ("llm_source", "prompt_tokens", "mailbox_depth")
+# Events logged by the driver (main.py or this module) rather than the agents
+DRIVER_AGENT_IDS = ("MainRunner", "Replay")
+# Events of the LLM call policies, which a replay bypasses
+POLICY_EVENT_TYPES = (
+    "LLM_CACHE_HIT",
+    "LLM_CACHE_MISS",
+    "LLM_CALL_COALESCED",
+    "LLM_CANDIDATE",
+    "LLM_HEDGE",
+    "LLM_HEDGE_COMPLETE",
+)
+
+
+class ReplayDivergenceError(RuntimeError):
+    """
+    Raised by RecordedLLM for a prompt the recorded trace never sent.
+    """
+
+
+class RecordedCall:
+    """
+    One LLM call of a recorded trace.
+    """
+
+    __slots__ = ("agent_id", "prompt", "response", "error")
+
+    def __init__(self, agent_id: str, prompt: str, response: str = None, error: str = None):
+        self.agent_id = agent_id
+        self.prompt = prompt
+        self.response = response
+        self.error = error
+
+
+def recorded_calls(events: list) -> list:
+    """
+    Extracts the LLM calls from a trace's events (with blob references resolved).
+
+    Returns:
+        list: RecordedCall objects in the order they were logged.
+    """
+    final_outputs = defaultdict(list)
+    for event in events:
+        key = FINAL_OUTPUT_KEYS.get(event["agent_id"])
+        if event["event_type"] == "TASK_COMPLETE" and key and key in event["details"]:
+            final_outputs[event["agent_id"]].append(event["details"][key])
+
+    calls = []
+    seen = defaultdict(int)
+    for event in events:
+        details = event["details"]
+        if event["event_type"] != "LLM_CALL_COMPLETE" or "llm_prompt" not in details:
+            continue
+        agent_id = event["agent_id"]
+        index = seen[agent_id]
+        seen[agent_id] += 1
+        if "llm_response" in details or "llm_error" in details:
+            response, error = details.get("llm_response"), details.get("llm_error")
+        else:
+            outputs = final_outputs[agent_id]
+            response = outputs[index] if index < len(outputs) else details.get("llm_response_snippet")
+            error = None
+        calls.append(RecordedCall(agent_id, details["llm_prompt"], response, error))
+    return calls
+
+
+class RecordedLLM:
+    """
+    A GenerativeModel stand-in that answers each prompt with its recorded
+    response, or raises its recorded error, without waiting. A prompt recorded
+    several times gets its responses in order, then from the start again, so
+    concurrent replays of the same trace all get answers.
+    """
+
+    def __init__(self, calls: list, model_name: str = "recorded"):
+        self.model_name = model_name
+        self.name = model_name
+        self._by_prompt = defaultdict(list)
+        for call in calls:
+            self._by_prompt[call.prompt].append(call)
+        self._next = defaultdict(int)
+        self.calls = 0
+        self.unmatched_prompts = []
+
+    def _lookup(self, prompt: str) -> RecordedCall:
+        self.calls += 1
+        recorded = self._by_prompt.get(prompt)
+        if not recorded:
+            self.unmatched_prompts.append(prompt)
+            raise ReplayDivergenceError(f"No recorded response for prompt: {prompt[:80]!r}...")
+        index = self._next[prompt]
+        self._next[prompt] = (index + 1) % len(recorded)
+        call = recorded[index]
+        if call.error is not None or call.response is None:
+            raise RuntimeError(call.error or "Recorded LLM call returned no response.")
+        return call
+
+    async def generate_content(self, prompt: str, stream: bool = False):
+        if stream:
+            return self.generate_content_stream(prompt)
+        return SimpleNamespace(text=self._lookup(prompt).response, usage_metadata=None)
+
+    async def generate_content_stream(self, prompt: str):
+        yield SimpleNamespace(text=self._lookup(prompt).response, usage_metadata=None)
+
+
+def load_trace_events(store: TraceStore, trace_id: str) -> list:
+    """
+    Returns a trace's events in time order with blob references resolved.
+    """
+    events = store.get_trace_events(trace_id)
+    for event in events:
+        event["details"] = resolve_event_details(event["details"] or {})
+    return events
+
+
+def _stable_details(details: dict) -> dict:
+    return {
+        key: value
+        for key, value in sorted(details.items())
+        if not key.endswith(VOLATILE_DETAIL_SUFFIXES) and key not in VOLATILE_DETAIL_KEYS
+    }
+
+
+def normalize_events(events: list, trace_id: str) -> dict:
+    """
+    Returns the agents' events as {agent_id: [line, ...]}, one comparable text
+    line per event, with run-specific values removed and the trace ID masked.
+    Driver and LLM call policy events are left out.
+    """
+    streams = defaultdict(list)
+    for event in events:
+        if event["agent_id"] in DRIVER_AGENT_IDS or event["event_type"] in POLICY_EVENT_TYPES:
+            continue
+        stable = {key: value for key, value in event.items() if key not in VOLATILE_FIELDS and key != "details"}
+        stable["details"] = _stable_details(event["details"] or {})
+        streams[event["agent_id"]].append(dumps_json(stable).replace(trace_id, "<trace_id>"))
+    return streams
+
+
+def diff_event_streams(original: list, original_trace_id: str, replayed: list, replay_trace_id: str) -> list:
+    """
+    Compares two event streams agent by agent (events of different agents may
+    interleave differently between runs).
+
+    Returns:
+        list: Unified diff lines; empty when the streams match.
+    """
+    before = normalize_events(original, original_trace_id)
+    after = normalize_events(replayed, replay_trace_id)
+    lines = []
+    for agent_id in sorted(set(before) | set(after)):
+        lines.extend(
+            difflib.unified_diff(
+                before.get(agent_id, []),
+                after.get(agent_id, []),
+                fromfile=f"{agent_id} (recorded)",
+                tofile=f"{agent_id} (replayed)",
+                lineterm="",
+            )
+        )
+    return lines
+
+
+class ReplayResult:
+    """
+    The outcome of replaying one recorded trace once.
+    """
+
+    __slots__ = ("trace_id", "replay_trace_id", "wall_time", "events", "diff", "error")
+
+    def __init__(self, trace_id: str, replay_trace_id: str, wall_time: float, events: list, diff: list, error=None):
+        self.trace_id = trace_id
+        self.replay_trace_id = replay_trace_id
+        self.wall_time = wall_time
+        self.events = events
+        self.diff = diff
+        self.error = error
+
+    @property
+    def identical(self) -> bool:
+        return self.error is None and not self.diff
+
+    def to_dict(self) -> dict:
+        return {
+            "trace_id": self.trace_id,
+            "replay_trace_id": self.replay_trace_id,
+            "wall_time_ms": self.wall_time * 1000,
+            "event_count": len(self.events),
+            "identical": self.identical,
+            "error": self.error,
+            "diff": self.diff,
+        }
+
+
+def _original_request(events: list) -> tuple:
+    """
+    Returns (request text, sender, streamed, scheduling context) of the workflow a
+    trace recorded. The scheduling context holds the recorded tenant and priority.
+    """
+    request, sender, streamed, scheduling = None, "User", False, {}
+    for event in events:
+        if event["agent_id"] != "ProjectManagerAgent":
+            continue
+        if event["event_type"] == "AGENT_START" and request is None:
+            request = event["details"].get("original_request")
+            sender = event["source_agent_id"] or sender
+            scheduling = {key: event["details"][key] for key in ("tenant", "priority") if event["details"].get(key)}
+        if event["details"].get("streamed"):
+            streamed = True
+    return request, sender, streamed, scheduling
+
+
+async def _run_replay(
+    project_manager_agent, request: str, sender: str, scheduling: dict, replay_trace_id: str
+) -> tuple:
+    async with span("replay", kind="workflow", agent_id="Replay", trace_id=replay_trace_id) as replay_span:
+        error = None
+        try:
+            await project_manager_agent.submit(
+                content=request,
+                sender_id=sender,
+                context=replay_span.inject({**scheduling, "trace_id": replay_trace_id}),
+            )
+        except Exception as e:
+            error = str(e)
+            replay_span.record_error(e)
+    return replay_span.elapsed_ms() / 1000, error
+
+
+async def replay_trace(store: TraceStore, trace_id: str, repeat: int = 1) -> list:
+    """
+    Replays a recorded trace `repeat` times concurrently and diffs each replay
+    against the recording.
+
+    This reconfigures the process-wide model, LLM call policies and event
+    backend (replayed events are kept in memory), so it is meant to be the only
+    workload of the process, as in the CLI. Concurrent replays send identical
+    prompts, so single-flight sharing is switched off to keep them independent.
+
+    Returns:
+        list: One ReplayResult per replay.
+
+    Raises:
+        ValueError: If the trace is unknown or has no ProjectManagerAgent request.
+    """
+    original = load_trace_events(store, trace_id)
+    if not original:
+        raise ValueError(f"Trace {trace_id} not found.")
+    request, sender, streamed, scheduling = _original_request(original)
+    if request is None:
+        raise ValueError(f"Trace {trace_id} has no ProjectManagerAgent request to replay.")
+
+    llm = RecordedLLM(recorded_calls(original))
+    os.environ["ADK_LLM_SINGLE_FLIGHT"] = "0"
+    os.environ["ADK_LLM_SPECULATIVE_CANDIDATES"] = "1"
+    set_llm_model(llm)
+    set_llm_cache(None)
+    set_hedge_policy(None)
+    set_llm_governor(LLMGovernor(requests_per_minute=0, max_concurrency=max(8, 2 * repeat), max_retries=0))
+    capture = SQLiteBackend(":memory:")
+    set_event_backend(capture)
+
+    requirements_agent = RequirementsAgent(name="RequirementsAgent")
+    coding_agent = CodingAgent(name="CodingAgent")
+    project_manager_agent = ProjectManagerAgent(
+        name="ProjectManagerAgent",
+        other_agents={"RequirementsAgent": requirements_agent, "CodingAgent": coding_agent},
+        stream_code=streamed,
+    )
+    agents = [project_manager_agent, requirements_agent, coding_agent]
+    agent_tasks = [asyncio.create_task(agent.start()) for agent in agents]
+    try:
+        await asyncio.gather(*(agent.wait_ready() for agent in agents))
+        replay_ids = [f"replay-{uuid.uuid4()}" for _ in range(repeat)]
+        outcomes = await asyncio.gather(
+            *(_run_replay(project_manager_agent, request, sender, scheduling, replay_id) for replay_id in replay_ids)
+        )
+        await flush_agent_events()
+
+        results = []
+        for replay_id, (wall_time, error) in zip(replay_ids, outcomes):
+            replayed = load_trace_events(capture.store, replay_id)
+            diff = diff_event_streams(original, trace_id, replayed, replay_id)
+            results.append(ReplayResult(trace_id, replay_id, wall_time, replayed, diff, error))
+        if llm.unmatched_prompts:
+            print(f"Replay of {trace_id} sent {len(llm.unmatched_prompts)} prompt(s) the recording never sent.")
+        return results
+    finally:
+        await close_agent_events()
+        for task in agent_tasks:
+            task.cancel()
+        await asyncio.gather(*agent_tasks, return_exceptions=True)
+
+
+def main(argv: list = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("trace_id", help="The recorded trace to replay.")
+    parser.add_argument(
+        "--db",
+        default=os.getenv("ADK_EVENT_SQLITE_PATH", DEFAULT_TRACE_DB),
+        help="Trace database (defaults to ADK_EVENT_SQLITE_PATH).",
+    )
+    parser.add_argument("--input", nargs="+", help="Read the trace from these NDJSON event files instead of --db.")
+    parser.add_argument("--repeat", type=int, default=1, help="Concurrent replays to run. Defaults to 1.")
+    parser.add_argument("--json", action="store_true", help="Print one JSON object per replay.")
+    args = parser.parse_args(argv)
+
+    if args.input:
+        store = TraceStore(":memory:")
+        for path in args.input:
+            store.ingest_jsonl(path)
+    else:
+        store = TraceStore(args.db)
+    start = time.perf_counter()
+    try:
+        results = asyncio.run(replay_trace(store, args.trace_id, max(1, args.repeat)))
+    except ValueError as e:
+        print(e)
+        return 1
+    finally:
+        store.close()
+    elapsed = time.perf_counter() - start
+
+    if args.json:
+        for result in results:
+            print(json.dumps(result.to_dict(), default=str))
+    else:
+        first = results[0]
+        print(f"Replayed {args.trace_id} {len(results)}x in {elapsed * 1000:.0f}ms.")
+        for line in first.diff:
+            print(line)
+        if first.error:
+            print(f"Replay failed: {first.error}")
+        identical = sum(1 for result in results if result.identical)
+        mean_ms = sum(result.wall_time for result in results) / len(results) * 1000
+        print(
+            f"{identical}/{len(results)} replay(s) match the recording "
+            f"({len(first.events)} events, {mean_ms:.1f}ms per replay)."
+        )
+    return 0 if all(result.identical for result in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
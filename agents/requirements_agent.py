@@ -70,16 +70,20 @@
 
 
 # agents/requirements_agent.py
-import time  # For measuring duration
-
-import asyncio
 from google.adk.agents import Agent  # type: ignore
 
 # Note: No AgentMessage or MessageContent classes needed here from ADK
+from .llm_calls import compact_payload, generate_text
+from .mailbox import mailbox_details
+from .metrics import LLM_LATENCY
+from .token_budget import estimate_tokens
+from .tracing import span
+from .transport import TransportMixin
 from .utils import llm_model, log_agent_event  # Use llm_model instead of llm
+from .workflow import ReadinessMixin
 
 
-class RequirementsAgent(Agent):
+class RequirementsAgent(ReadinessMixin, TransportMixin, Agent):
     """
     The RequirementsAgent is responsible for converting high-level requests
     into detailed functional and non-functional software requirements
@@ -113,79 +117,106 @@ class RequirementsAgent(Agent):
         trace_id = context.get(
             "trace_id", "UNKNOWN_TRACE"
         )  # Get trace_id from message context
-        start_time = time.time()
-
-        await log_agent_event(
-            event_type="AGENT_START",
-            agent_id=self.name,
-            trace_id=trace_id,
-            message_summary=f"Received request for requirements from {sender_id}: {content[:100]}...",
-            source_agent_id=sender_id,
-            details={"input_request": content},
-        )
-        print(f"{self.name}: Processing request from {sender_id}: {content}")
-
-        # Simulate processing time
-        await asyncio.sleep(1)  # Shorter delay for LLM calls
-
-        # Use LLM to generate requirements
-        llm_prompt = f"{self.instruction}\n\nHigh-level request: {content}"
-        llm_call_start = time.time()
-        try:
-            # For google-generativeai, it's model.generate_content
-            llm_response = await self.llm.generate_content(llm_prompt)
-            requirements_text = llm_response.text
-        except Exception as e:
-            requirements_text = f"ERROR: LLM failed to generate requirements: {e}"
-            print(f"LLM Error in {self.name}: {e}")
-        llm_call_end = time.time()
-
-        if not requirements_text.strip():
-            requirements_text = "No specific requirements generated. Need more context or LLM issue."  # Fallback
-
-        # Simulate a potential failure based on keyword
-        status = "SUCCESS"
-        if "force_req_fail" in content.lower():
-            requirements_text = (
-                "ERROR: Could not generate requirements due to forced failure."
+        # The task span is a child of the sender's span, whose ID arrives in the context
+        async with span(
+            f"{self.name}.handle_message", kind="task", agent_id=self.name, trace_id=trace_id, context=context
+        ) as task_span:
+            await log_agent_event(
+                event_type="AGENT_START",
+                agent_id=self.name,
+                trace_id=trace_id,
+                message_summary=f"Received request for requirements from {sender_id}: {content[:100]}...",
+                source_agent_id=sender_id,
+                details={"input_request": content, **mailbox_details(context)},
+            )
+            print(f"{self.name}: Processing request from {sender_id}: {content}")
+
+            # Use LLM to generate requirements. A request over the stage's token budget is compacted first.
+            compaction = await compact_payload(
+                self.llm,
+                "requirements",
+                content,
+                estimate_tokens(f"{self.instruction}\n\nHigh-level request: "),
+                agent_id=self.name,
+                trace_id=trace_id,
+            )
+            llm_prompt = f"{self.instruction}\n\nHigh-level request: {compaction.text}"
+            llm_result = None
+            llm_error = None
+            async with span(f"{self.name}.llm_call", kind="llm") as llm_span:
+                try:
+                    # Repeated prompts are served from the response cache
+                    llm_result = await generate_text(
+                        self.llm,
+                        llm_prompt,
+                        agent_id=self.name,
+                        trace_id=trace_id,
+                        instruction=self.instruction,
+                        validator=lambda text: bool(text.strip()),  # Picks among speculative candidates, if enabled
+                    )
+                    requirements_text = llm_result.text
+                    llm_span.set_attribute("llm_source", llm_result.source)
+                    llm_span.set_attribute("llm_queue_wait_ms", llm_result.queue_wait_ms)
+                except Exception as e:
+                    llm_span.record_error(e)
+                    llm_error = str(e)
+                    requirements_text = f"ERROR: LLM failed to generate requirements: {e}"
+                    print(f"LLM Error in {self.name}: {e}")
+            LLM_LATENCY.labels(self.name).observe(llm_span.elapsed_ms() / 1000)
+
+            if not requirements_text.strip():
+                requirements_text = "No specific requirements generated. Need more context or LLM issue."  # Fallback
+
+            # Simulate a potential failure based on keyword
+            status = "SUCCESS"
+            if "force_req_fail" in content.lower():
+                requirements_text = (
+                    "ERROR: Could not generate requirements due to forced failure."
+                )
+                status = "FAILURE"
+                task_span.status = status
+                await log_agent_event(
+                    event_type="ERROR",
+                    agent_id=self.name,
+                    trace_id=trace_id,
+                    message_summary="Forced requirements generation failure.",
+                    status="FAILURE",
+                    details={"input_text": content},
+                )
+
+            # Send response back to sender
+            await self.send_message(
+                recipient_id=sender_id,
+                content=requirements_text,  # Content is directly the string
+                context=task_span.inject({"trace_id": trace_id}),  # Propagate trace_id and span back
             )
-            status = "FAILURE"
             await log_agent_event(
-                event_type="ERROR",
+                event_type="LLM_CALL_COMPLETE",  # New event type for LLM interactions
                 agent_id=self.name,
                 trace_id=trace_id,
-                message_summary="Forced requirements generation failure.",
-                status="FAILURE",
-                details={"input_text": content},
+                message_summary="LLM call for requirements generation completed.",
+                status=status,
+                duration_ms=int(llm_span.elapsed_ms()),
+                details={
+                    "llm_prompt": llm_prompt,
+                    "llm_response_snippet": requirements_text[:500],  # Log a snippet
+                    "llm_response": llm_result.text if llm_result else None,  # Raw model output, for replay
+                    "llm_error": llm_error,
+                    "llm_source": llm_result.source if llm_result else None,
+                    "llm_queue_wait_ms": llm_result.queue_wait_ms if llm_result else None,
+                    "prompt_tokens_estimated": estimate_tokens(llm_prompt),
+                    "prompt_tokens": llm_result.prompt_tokens if llm_result else None,  # As counted by the model
+                    "token_budget": compaction.to_dict() if compaction.compacted else None,
+                },
             )
 
-        # Send response back to sender
-        await self.send_message(
-            recipient_id=sender_id,
-            content=requirements_text,  # Content is directly the string
-            context={"trace_id": trace_id},  # Propagate trace_id back
-        )
-        await log_agent_event(
-            event_type="LLM_CALL_COMPLETE",  # New event type for LLM interactions
-            agent_id=self.name,
-            trace_id=trace_id,
-            message_summary="LLM call for requirements generation completed.",
-            status=status,
-            duration_ms=int((llm_call_end - llm_call_start) * 1000),
-            details={
-                "llm_prompt": llm_prompt,
-                "llm_response_snippet": requirements_text[:500],  # Log a snippet
-            },
-        )
-
-        end_time = time.time()
-        await log_agent_event(
-            event_type="TASK_COMPLETE",
-            agent_id=self.name,
-            trace_id=trace_id,
-            message_summary=f"Generated requirements and sent to {sender_id}: {requirements_text[:100]}...",
-            status=status,
-            duration_ms=int((end_time - start_time) * 1000),
-            details={"generated_requirements": requirements_text},
-        )
-        print(f"{self.name}: Finished and sent requirements.")
+            await log_agent_event(
+                event_type="TASK_COMPLETE",
+                agent_id=self.name,
+                trace_id=trace_id,
+                message_summary=f"Generated requirements and sent to {sender_id}: {requirements_text[:100]}...",
+                status=status,
+                duration_ms=int(task_span.elapsed_ms()),
+                details={"generated_requirements": requirements_text},
+            )
+            print(f"{self.name}: Finished and sent requirements.")
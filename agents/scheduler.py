@@ -0,0 +1,259 @@
+# agents/scheduler.py
+
+import heapq
+import itertools
+
+import asyncio
+
+from .metrics import SCHEDULER_QUEUED, SCHEDULER_RUNNING, SCHEDULER_WAIT
+from .utils import get_env
+
+# Priority classes, highest first. Queued interactive work is always admitted before batch work.
+PRIORITIES = ("interactive", "batch")
+DEFAULT_PRIORITY = "batch"
+DEFAULT_TENANT = "default"
+
+
+def parse_tenant_settings(text: str) -> dict:
+    """
+    Parses "acme=3,globex=0.5" into {"acme": 3.0, "globex": 0.5}.
+
+    Raises:
+        ValueError: On a malformed entry or a negative value.
+    """
+    settings = {}
+    for entry in filter(None, (part.strip() for part in (text or "").split(","))):
+        tenant, _, value = entry.partition("=")
+        try:
+            number = float(value)
+        except ValueError:
+            number = -1.0
+        if not tenant.strip() or number < 0:
+            raise ValueError(f"Invalid tenant setting '{entry}', expected TENANT=NUMBER.")
+        settings[tenant.strip()] = number
+    return settings
+
+
+def request_class(context: dict) -> tuple:
+    """
+    Returns the (tenant, priority) of a request from its message context.
+
+    Raises:
+        ValueError: If the context names an unknown priority.
+    """
+    tenant = (context or {}).get("tenant") or DEFAULT_TENANT
+    priority = (context or {}).get("priority") or DEFAULT_PRIORITY
+    if priority not in PRIORITIES:
+        raise ValueError(f"Unknown priority '{priority}', expected one of {PRIORITIES}.")
+    return str(tenant), priority
+
+
+class _Ticket:
+    __slots__ = ("tenant", "priority", "finish_tag", "sequence", "future", "enqueued_at")
+
+    def __init__(self, tenant: str, priority: str, finish_tag: float, sequence: int, future, enqueued_at: float):
+        self.tenant = tenant
+        self.priority = priority
+        self.finish_tag = finish_tag
+        self.sequence = sequence
+        self.future = future
+        self.enqueued_at = enqueued_at
+
+    def __lt__(self, other: "_Ticket") -> bool:
+        return (self.finish_tag, self.sequence) < (other.finish_tag, other.sequence)
+
+
+class FairScheduler:
+    """
+    Admission control for workflows, shared across tenants.
+
+    At most `concurrency` workflows run at once. Priority classes are strict:
+    a queued interactive workflow is always admitted before any batch one.
+    Within a class, tenants share the slots by weighted fair queueing. Each
+    request gets a virtual finish tag of max(virtual time, the tenant's last
+    tag) + 1 / weight, and the smallest tag is admitted first (ties go to the
+    earlier arrival). While several tenants have work queued, each is admitted
+    in proportion to its weight however much it submitted, and a tenant that
+    was idle gets no credit to burst with later. A tenant at its concurrency
+    cap is skipped until one of its workflows finishes.
+
+    Every decision is made synchronously in `acquire` and `release`, so the
+    admission order depends only on the order of those calls and on the
+    clock, which can be faked in tests.
+    """
+
+    def __init__(
+        self,
+        concurrency: int,
+        weights: dict = None,
+        caps: dict = None,
+        default_cap: int = 0,
+        clock=None,
+    ):
+        """
+        Initializes the FairScheduler.
+
+        Args:
+            concurrency (int): Workflows admitted at once across all tenants.
+            weights (dict, optional): Tenant -> positive share weight; unlisted tenants weigh 1. Defaults to None.
+            caps (dict, optional): Tenant -> maximum concurrent workflows. Defaults to None.
+            default_cap (int, optional): Cap of unlisted tenants; 0 for none. Defaults to 0.
+            clock (callable, optional): Returns the current time in seconds. Defaults to the event loop clock.
+
+        Raises:
+            ValueError: If a weight is zero or negative.
+        """
+        for tenant, weight in (weights or {}).items():
+            if weight <= 0:
+                raise ValueError(f"Invalid weight {weight:g} for tenant '{tenant}', expected a positive number.")
+        self._clock = clock or (lambda: asyncio.get_running_loop().time())
+        self.concurrency = max(1, concurrency)
+        self.weights = dict(weights or {})
+        self.caps = {tenant: int(cap) for tenant, cap in (caps or {}).items()}
+        self.default_cap = default_cap
+        self.in_flight = 0
+        self._queues = {priority: [] for priority in PRIORITIES}  # Heaps of _Ticket
+        self._virtual_time = dict.fromkeys(PRIORITIES, 0.0)
+        self._last_tags = {}  # (priority, tenant) -> finish tag of the tenant's latest request
+        self._sequence = itertools.count()
+        self._running = {}  # Tenant -> workflows admitted and not yet released
+        self._queued = {}  # (tenant, priority) -> workflows waiting
+        # Per-tenant queue-wait statistics
+        self._tenant_stats = {}
+
+    @classmethod
+    def from_env(cls, concurrency: int) -> "FairScheduler":
+        """
+        Creates a scheduler configured by ADK_TENANT_WEIGHTS and ADK_TENANT_CAPS
+        (both "tenant=N,..."), and ADK_TENANT_MAX_CONCURRENCY for unlisted tenants.
+        """
+        return cls(
+            concurrency,
+            weights=parse_tenant_settings(get_env("ADK_TENANT_WEIGHTS", "")),
+            caps=parse_tenant_settings(get_env("ADK_TENANT_CAPS", "")),
+            default_cap=int(get_env("ADK_TENANT_MAX_CONCURRENCY", "0")),
+        )
+
+    def weight(self, tenant: str) -> float:
+        return self.weights.get(tenant, 1.0)
+
+    def cap(self, tenant: str) -> int:
+        return self.caps.get(tenant, self.default_cap)
+
+    def queued(self) -> int:
+        return sum(self._queued.values())
+
+    def stats(self) -> dict:
+        """
+        Returns the admitted count and queue waits of every tenant seen so far.
+        """
+        tenants = {}
+        for tenant, stats in sorted(self._tenant_stats.items()):
+            admitted = stats["admitted"]
+            tenants[tenant] = {
+                "admitted": admitted,
+                "running": self._running.get(tenant, 0),
+                "queued": sum(count for (name, _), count in self._queued.items() if name == tenant),
+                "avg_queue_wait_ms": round(stats["total_wait_ms"] / admitted, 2) if admitted else 0.0,
+                "max_queue_wait_ms": round(stats["max_wait_ms"], 2),
+            }
+        return {"in_flight": self.in_flight, "queued": self.queued(), "tenants": tenants}
+
+    def _set_queued(self, tenant: str, priority: str, delta: int):
+        count = self._queued.get((tenant, priority), 0) + delta
+        if count:
+            self._queued[(tenant, priority)] = count
+        else:
+            self._queued.pop((tenant, priority), None)
+        SCHEDULER_QUEUED.labels(tenant, priority).set(count)
+
+    def _at_cap(self, tenant: str) -> bool:
+        cap = self.cap(tenant)
+        return cap > 0 and self._running.get(tenant, 0) >= cap
+
+    def _next_ticket(self):
+        """
+        Pops the queued ticket to admit next: the smallest finish tag of the
+        highest priority class, skipping tenants at their cap. Returns None if
+        nothing can be admitted.
+        """
+        for priority in PRIORITIES:
+            queue = self._queues[priority]
+            skipped = []
+            ticket = None
+            while queue:
+                candidate = heapq.heappop(queue)
+                if candidate.future.done():
+                    continue  # Cancelled while waiting
+                if self._at_cap(candidate.tenant):
+                    skipped.append(candidate)
+                    continue
+                ticket = candidate
+                break
+            for candidate in skipped:
+                heapq.heappush(queue, candidate)
+            if ticket is not None:
+                return ticket
+        return None
+
+    def _dispatch(self):
+        while self.in_flight < self.concurrency:
+            ticket = self._next_ticket()
+            if ticket is None:
+                return
+            priority, tenant = ticket.priority, ticket.tenant
+            self._virtual_time[priority] = max(self._virtual_time[priority], ticket.finish_tag)
+            if self._last_tags.get((priority, tenant), 0.0) <= self._virtual_time[priority]:
+                self._last_tags.pop((priority, tenant), None)  # No credit left to carry; keeps the map small
+            self._set_queued(tenant, priority, -1)
+            self.in_flight += 1
+            self._running[tenant] = self._running.get(tenant, 0) + 1
+            SCHEDULER_RUNNING.labels(tenant).set(self._running[tenant])
+
+            wait_s = self._clock() - ticket.enqueued_at
+            SCHEDULER_WAIT.labels(tenant, priority).observe(wait_s)
+            stats = self._tenant_stats.setdefault(tenant, {"admitted": 0, "total_wait_ms": 0.0, "max_wait_ms": 0.0})
+            stats["admitted"] += 1
+            stats["total_wait_ms"] += wait_s * 1000
+            stats["max_wait_ms"] = max(stats["max_wait_ms"], wait_s * 1000)
+            ticket.future.set_result(wait_s * 1000)
+
+    async def acquire(self, tenant: str = DEFAULT_TENANT, priority: str = DEFAULT_PRIORITY) -> float:
+        """
+        Waits until a workflow of `tenant` may run. Every successful call must be
+        paired with `release(tenant)`.
+
+        Returns:
+            float: The time spent queued, in milliseconds.
+        """
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority '{priority}', expected one of {PRIORITIES}.")
+        key = (priority, tenant)
+        finish_tag = max(self._virtual_time[priority], self._last_tags.get(key, 0.0)) + 1.0 / self.weight(tenant)
+        self._last_tags[key] = finish_tag
+        future = asyncio.get_running_loop().create_future()
+        ticket = _Ticket(tenant, priority, finish_tag, next(self._sequence), future, self._clock())
+        heapq.heappush(self._queues[priority], ticket)
+        self._set_queued(tenant, priority, 1)
+        self._dispatch()
+        try:
+            return await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.release(tenant)  # Admitted just as we were cancelled
+            else:
+                self._set_queued(tenant, priority, -1)
+            raise
+
+    def release(self, tenant: str = DEFAULT_TENANT):
+        """
+        Frees the slot of a finished workflow of `tenant` and admits the next ones.
+        """
+        self.in_flight -= 1
+        running = self._running.get(tenant, 0) - 1
+        if running > 0:
+            self._running[tenant] = running
+        else:
+            self._running.pop(tenant, None)
+        SCHEDULER_RUNNING.labels(tenant).set(max(0, running))
+        self._dispatch()
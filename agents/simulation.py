@@ -0,0 +1,475 @@
+# agents/simulation.py
+"""
+Discrete-event simulation of the agent workflow, for capacity planning.
+
+The real ProjectManagerAgent, RequirementsAgent and CodingAgent code runs on an
+event loop with a virtual clock: whenever every task is waiting on a timer, the
+clock jumps straight to the next timer instead of sleeping. `asyncio.sleep`,
+the simulated model latency, the simulated warehouse latency, the governor's
+quota refills and the event sink's flush interval therefore all pass in
+simulated time, and hours of traffic take as long as the CPU work they cause.
+
+Requests arrive as a Poisson process at a given rate. "PM workers" caps how
+many workflows run at once (like main.py's --concurrency); the rest wait for
+a slot. The LLM quota is enforced by the real LLMGovernor. Model latencies and
+failure rates are log-normal by default, or fitted per agent from the recorded
+LLM_CALL_COMPLETE durations in a trace store (--fit-db).
+
+Usage:
+    python -m agents.simulation --rpm 300 --minutes 60 --workers 4,8,16 --llm-rpm 600,1200
+    python -m agents.simulation --rpm 300 --minutes 60 --workers 8 --fit-db ./.adk_events/agent_events.sqlite3
+    python -m agents.simulation --rpm 600 --minutes 30 --workers 8,16,32 --slo-s 60
+"""
+
+import argparse
+import contextlib
+import itertools
+import json
+import os
+import random
+import selectors
+import sys
+import time
+from collections import defaultdict
+
+import asyncio
+import uuid
+
+from .blob_store import InMemoryBlobStore
+from .coding_agent import CodingAgent
+from .event_sink import BatchingEventSink
+from .fakes import FakeLLM, LatencyDistribution
+from .llm_calls import set_hedge_policy, set_llm_cache, set_llm_governor
+from .llm_governor import LLMGovernor
+from .project_manager_agent import ProjectManagerAgent
+from .requirements_agent import RequirementsAgent
+from .trace_analysis import percentile
+from .trace_store import TraceStore
+from .utils import close_agent_events, set_blob_store, set_event_sink, set_llm_model
+
+SIMULATED_REQUEST = "Develop a Python script to calculate the nth Fibonacci number, including basic tests."
+
+
+class VirtualTimeSelector(selectors.BaseSelector):
+    """
+    A selector that polls the real selector without blocking and, when nothing
+    is ready, advances the virtual clock by the loop's timeout instead of
+    waiting. It only blocks for real when no timer is pending (e.g. while a
+    worker thread finishes), so blocking work handed to threads takes no
+    simulated time.
+    """
+
+    def __init__(self, advance):
+        self._selector = selectors.DefaultSelector()
+        self._advance = advance
+
+    def register(self, fileobj, events, data=None):
+        return self._selector.register(fileobj, events, data)
+
+    def unregister(self, fileobj):
+        return self._selector.unregister(fileobj)
+
+    def modify(self, fileobj, events, data=None):
+        return self._selector.modify(fileobj, events, data)
+
+    def get_map(self):
+        return self._selector.get_map()
+
+    def close(self):
+        self._selector.close()
+
+    def select(self, timeout=None):
+        ready = self._selector.select(0)
+        if ready or timeout == 0:
+            return ready
+        if timeout is None:
+            return self._selector.select(None)
+        self._advance(timeout)
+        return []
+
+
+class VirtualClockEventLoop(asyncio.SelectorEventLoop):
+    """
+    An event loop whose `time()` is a virtual clock that starts at zero and
+    only moves when the loop would otherwise sleep.
+
+    Positive timer delays are at least `min_step` seconds. A real clock always
+    moves on, but a virtual one does not: code that reschedules itself after a
+    rounding-error delay (e.g. a token bucket short by 1e-14 of a token) would
+    otherwise spin forever at the same instant.
+    """
+
+    min_step = 1e-6
+
+    def __init__(self):
+        self._virtual_time = 0.0
+        super().__init__(VirtualTimeSelector(self._advance))
+
+    def _advance(self, seconds: float):
+        self._virtual_time += seconds
+
+    def time(self) -> float:
+        return self._virtual_time
+
+    def call_later(self, delay, callback, *args, context=None):
+        if delay > 0:
+            delay = max(delay, self.min_step)
+        return super().call_later(delay, callback, *args, context=context)
+
+
+def run_simulated(coro):
+    """
+    Runs `coro` to completion on a fresh VirtualClockEventLoop, like `asyncio.run`.
+    """
+    loop = VirtualClockEventLoop()
+    try:
+        asyncio.set_event_loop(loop)
+        return loop.run_until_complete(coro)
+    finally:
+        try:
+            loop.run_until_complete(loop.shutdown_asyncgens())
+            loop.run_until_complete(loop.shutdown_default_executor())
+        finally:
+            asyncio.set_event_loop(None)
+            loop.close()
+
+
+class EmpiricalDistribution:
+    """
+    A latency distribution that resamples recorded latencies.
+    """
+
+    def __init__(self, samples_ms: list, rng: random.Random = None):
+        if not samples_ms:
+            raise ValueError("An empirical distribution needs at least one sample.")
+        self.samples_ms = list(samples_ms)
+        self._rng = rng or random.Random()
+
+    @property
+    def median_ms(self) -> float:
+        return percentile(self.samples_ms, 50)
+
+    def sample_ms(self) -> float:
+        return self._rng.choice(self.samples_ms)
+
+
+def fit_llm_profiles(store: TraceStore, limit: int = 10000, rng: random.Random = None) -> dict:
+    """
+    Fits per-agent model latency and failure rate from the most recent
+    LLM_CALL_COMPLETE events in a trace store. Calls served from the cache or
+    shared with another call in flight are left out, since they never reached
+    the model.
+
+    Returns:
+        dict: agent_id -> (EmpiricalDistribution, failure rate).
+    """
+    durations, failures = defaultdict(list), defaultdict(int)
+    for event in store.find_events(event_type="LLM_CALL_COMPLETE", limit=limit):
+        details = event["details"] or {}
+        if event["duration_ms"] is None or details.get("llm_source") not in (None, "model"):
+            continue
+        durations[event["agent_id"]].append(float(event["duration_ms"]))
+        if details.get("llm_error"):
+            failures[event["agent_id"]] += 1
+    return {
+        agent_id: (EmpiricalDistribution(samples, rng), failures[agent_id] / len(samples))
+        for agent_id, samples in durations.items()
+    }
+
+
+class SimulatedLLM(FakeLLM):
+    """
+    A FakeLLM with a latency profile per calling agent. Agents are recognized
+    by their instruction, which starts every prompt they send.
+    """
+
+    def __init__(self, profiles: dict = None, **kwargs):
+        """
+        Initializes the SimulatedLLM.
+
+        Args:
+            profiles (dict, optional): agent_id -> (distribution, failure rate), e.g. from
+                                       `fit_llm_profiles`. Other callers use the FakeLLM
+                                       settings. Defaults to None.
+            **kwargs: FakeLLM settings.
+        """
+        super().__init__(**kwargs)
+        self.profiles = profiles or {}
+        self._by_instruction = {}
+
+    def bind_agents(self, agents: list):
+        """
+        Associates each profiled agent's instruction with its profile.
+        """
+        self._by_instruction = {
+            agent.instruction: self.profiles[agent.name] for agent in agents if agent.name in self.profiles
+        }
+
+    def _profile(self, prompt: str) -> tuple:
+        for instruction, profile in self._by_instruction.items():
+            if prompt.startswith(instruction):
+                return profile
+        return super()._profile(prompt)
+
+
+class SimulatedWarehouse:
+    """
+    An event warehouse whose async `insert_rows` takes a sampled latency in
+    simulated time and fails a fraction of batches, for a BatchingEventSink.
+    """
+
+    def __init__(self, latency_ms: float = 50.0, sigma: float = 0.3, failure_rate: float = 0.0, seed: int = None):
+        self._rng = random.Random(seed)
+        self.latency = LatencyDistribution(latency_ms, sigma, self._rng)
+        self.failure_rate = failure_rate
+        self.rows = 0
+        self.inserts = 0
+        self.failures = 0
+
+    async def insert_rows(self, rows: list, row_ids: list) -> list:
+        self.inserts += 1
+        await asyncio.sleep(self.latency.sample_ms() / 1000)
+        if self.failure_rate and self._rng.random() < self.failure_rate:
+            self.failures += 1
+            raise ConnectionError("Injected simulated warehouse failure.")
+        self.rows += len(rows)
+        return []
+
+
+async def simulate(
+    requests_per_minute: float,
+    duration_s: float,
+    pm_workers: int,
+    llm: FakeLLM,
+    governor: LLMGovernor,
+    warehouse: SimulatedWarehouse,
+    stream: bool = False,
+    seed: int = None,
+) -> dict:
+    """
+    Simulates `duration_s` seconds of Poisson traffic through the real agents
+    and waits for every admitted workflow to finish. Must run on a
+    VirtualClockEventLoop (see `run_simulated`).
+
+    This reconfigures the process-wide model, LLM call policies, event sink and
+    blob store, so it is meant to be the only workload of the process.
+
+    Args:
+        requests_per_minute (float): Mean arrival rate.
+        duration_s (float): Simulated seconds during which requests arrive.
+        pm_workers (int): Workflows allowed to run at once; later arrivals wait.
+        llm (FakeLLM): The simulated model.
+        governor (LLMGovernor): The governor carrying the LLM quota.
+        warehouse (SimulatedWarehouse): Where the event sink writes.
+        stream (bool, optional): Stream the CodingAgent's output. Defaults to False.
+        seed (int, optional): Seed for the arrival process. Defaults to None.
+
+    Returns:
+        dict: Throughput, latency percentiles (seconds), backlog and quota statistics.
+    """
+    loop = asyncio.get_running_loop()
+    rng = random.Random(seed)
+    set_llm_model(llm)
+    set_llm_cache(None)
+    set_hedge_policy(None)
+    set_llm_governor(governor)
+    set_blob_store(InMemoryBlobStore())
+    set_event_sink(BatchingEventSink(warehouse.insert_rows))
+
+    requirements_agent = RequirementsAgent(name="RequirementsAgent")
+    coding_agent = CodingAgent(name="CodingAgent")
+    project_manager_agent = ProjectManagerAgent(
+        name="ProjectManagerAgent",
+        other_agents={"RequirementsAgent": requirements_agent, "CodingAgent": coding_agent},
+        stream_code=stream,
+    )
+    agents = [project_manager_agent, requirements_agent, coding_agent]
+    if isinstance(llm, SimulatedLLM):
+        llm.bind_agents(agents)
+    agent_tasks = [asyncio.create_task(agent.start()) for agent in agents]
+    await asyncio.gather(*(agent.wait_ready() for agent in agents))
+
+    run_id = uuid.uuid4().hex[:8]  # Trace IDs stay unique across simulations in one process
+    workers = asyncio.Semaphore(pm_workers)
+    waits, latencies = [], []
+    backlog = {"waiting": 0, "max_waiting": 0, "failed": 0}
+
+    async def run_one(index: int):
+        arrived = loop.time()
+        backlog["waiting"] += 1
+        backlog["max_waiting"] = max(backlog["max_waiting"], backlog["waiting"])
+        async with workers:
+            backlog["waiting"] -= 1
+            waits.append(loop.time() - arrived)
+            try:
+                # Unique requests, so no two workflows share a model call
+                await project_manager_agent.submit(
+                    content=f"{SIMULATED_REQUEST} (simulated request {index})",
+                    sender_id="User",
+                    context={"trace_id": f"sim-{run_id}-{index}"},
+                )
+            except Exception:
+                backlog["failed"] += 1
+        latencies.append(loop.time() - arrived)
+
+    started = loop.time()
+    tasks = []
+    rate_per_s = requests_per_minute / 60.0
+    next_arrival = rng.expovariate(rate_per_s) if rate_per_s > 0 else duration_s
+    while next_arrival < duration_s:
+        await asyncio.sleep(max(0.0, started + next_arrival - loop.time()))
+        tasks.append(asyncio.create_task(run_one(len(tasks))))
+        next_arrival += rng.expovariate(rate_per_s)
+    await asyncio.gather(*tasks)
+    finished = loop.time() - started
+
+    # Let the agents finish logging their last events before the sink closes. The
+    # sink's own worker never finishes, so this waits out a (simulated) grace period.
+    current = asyncio.current_task()
+    stragglers = [task for task in asyncio.all_tasks() if task is not current and task not in agent_tasks]
+    if stragglers:
+        await asyncio.wait(stragglers, timeout=60.0)
+    await close_agent_events()
+    for task in agent_tasks:
+        task.cancel()
+    await asyncio.gather(*agent_tasks, return_exceptions=True)
+
+    completed = len(latencies)
+    governor_stats = governor.stats()
+    return {
+        "offered_per_min": requests_per_minute,
+        "pm_workers": pm_workers,
+        "llm_rpm": governor.requests.rate_per_minute,
+        "llm_tpm": governor.tokens.rate_per_minute,
+        "llm_concurrency": governor.max_concurrency,
+        "arrivals": len(tasks),
+        "completed": completed,
+        "failed": backlog["failed"],
+        "simulated_s": finished,
+        "throughput_per_min": completed / finished * 60 if finished else 0.0,
+        "pm_wait_s": {"p50": percentile(waits, 50), "p99": percentile(waits, 99)},
+        "latency_s": {"p50": percentile(latencies, 50), "p99": percentile(latencies, 99)},
+        "max_backlog": backlog["max_waiting"],
+        "llm_calls": llm.calls,
+        "llm_failures": llm.failures,
+        "llm_throttled": governor_stats["throttled"],
+        "llm_avg_queue_wait_ms": governor_stats["avg_queue_wait_ms"],
+        "llm_max_queue_wait_ms": governor_stats["max_queue_wait_ms"],
+        "warehouse_inserts": warehouse.inserts,
+        "warehouse_rows": warehouse.rows,
+    }
+
+
+def _grid(text: str, cast) -> list:
+    return [cast(value) for value in text.split(",") if value.strip()]
+
+
+def print_report(reports: list, slo_s: float = None):
+    print(
+        f"{'workers':>7} {'llm rpm':>8} {'llm conc':>8} {'done/min':>9} {'pm wait p99':>11} "
+        f"{'p50 s':>7} {'p99 s':>8} {'backlog':>7} {'llm wait':>9} {'failed':>6} {'sim s':>7}"
+    )
+    for report in reports:
+        print(
+            f"{report['pm_workers']:>7} {report['llm_rpm'] or 'inf':>8} {report['llm_concurrency']:>8} "
+            f"{report['throughput_per_min']:>9.1f} {report['pm_wait_s']['p99'] or 0:>11.1f} "
+            f"{report['latency_s']['p50'] or 0:>7.1f} {report['latency_s']['p99'] or 0:>8.1f} "
+            f"{report['max_backlog']:>7} {report['llm_avg_queue_wait_ms'] / 1000:>8.1f}s {report['failed']:>6} "
+            f"{report['simulated_s']:>7.0f}"
+        )
+    if slo_s is not None:
+        meeting = [report for report in reports if (report["latency_s"]["p99"] or 0) <= slo_s]
+        if meeting:
+            best = min(meeting, key=lambda report: (report["pm_workers"], report["llm_rpm"] or float("inf")))
+            print(
+                f"Smallest configuration with p99 <= {slo_s:g}s: {best['pm_workers']} PM workers, "
+                f"LLM {best['llm_rpm'] or 'unlimited'} rpm, concurrency {best['llm_concurrency']}."
+            )
+        else:
+            print(f"No simulated configuration keeps p99 latency within {slo_s:g}s.")
+
+
+def main(argv: list = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rpm", type=float, required=True, help="Offered load in requests per minute.")
+    parser.add_argument("--minutes", type=float, default=60.0, help="Simulated minutes of arrivals. Defaults to 60.")
+    parser.add_argument("--workers", default="8", help="PM workers to try, comma-separated. Defaults to 8.")
+    parser.add_argument("--llm-rpm", default="0", help="LLM request quotas to try (0 = unlimited). Defaults to 0.")
+    parser.add_argument("--llm-tpm", type=float, default=0.0, help="LLM token quota (0 = unlimited).")
+    parser.add_argument("--llm-concurrency", default="8", help="LLM concurrency limits to try. Defaults to 8.")
+    parser.add_argument("--llm-latency-ms", type=float, default=2000.0, help="Median model latency. Defaults to 2000.")
+    parser.add_argument("--llm-sigma", type=float, default=0.5, help="Log-normal spread of model latency.")
+    parser.add_argument("--llm-failure-rate", type=float, default=0.0, help="Fraction of failing model calls.")
+    parser.add_argument("--llm-throttle-rate", type=float, default=0.0, help="Fraction of 429-rejected model calls.")
+    parser.add_argument("--output-chars", type=int, default=2000, help="Length of each response. Defaults to 2000.")
+    parser.add_argument("--fit-db", help="Fit per-agent model latency and failures from this trace store.")
+    parser.add_argument("--warehouse-latency-ms", type=float, default=100.0, help="Median insert latency.")
+    parser.add_argument("--warehouse-failure-rate", type=float, default=0.0, help="Fraction of failing inserts.")
+    parser.add_argument("--stream", action="store_true", help="Stream the CodingAgent's output.")
+    parser.add_argument("--slo-s", type=float, help="Report the smallest configuration with p99 latency within this.")
+    parser.add_argument("--seed", type=int, default=1, help="Random seed. Defaults to 1.")
+    parser.add_argument("--json", action="store_true", help="Print one JSON report per configuration.")
+    args = parser.parse_args(argv)
+
+    profiles = {}
+    if args.fit_db:
+        store = TraceStore(args.fit_db)
+        try:
+            fitted = fit_llm_profiles(store, rng=random.Random(args.seed))
+        finally:
+            store.close()
+        if not fitted:
+            print(f"No model calls recorded in {args.fit_db}; using the log-normal settings.")
+        for agent_id, (distribution, failure_rate) in sorted(fitted.items()):
+            print(
+                f"Fitted {agent_id}: {len(distribution.samples_ms)} calls, median {distribution.median_ms:.0f}ms, "
+                f"failure rate {failure_rate:.1%}"
+            )
+        profiles = fitted
+
+    reports = []
+    configurations = itertools.product(
+        _grid(args.workers, int), _grid(args.llm_rpm, float), _grid(args.llm_concurrency, int)
+    )
+    for pm_workers, llm_rpm, llm_concurrency in configurations:
+
+        async def scenario(pm_workers=pm_workers, llm_rpm=llm_rpm, llm_concurrency=llm_concurrency):
+            llm = SimulatedLLM(
+                profiles,
+                latency_ms=args.llm_latency_ms,
+                sigma=args.llm_sigma,
+                failure_rate=args.llm_failure_rate,
+                throttle_rate=args.llm_throttle_rate,
+                output_chars=args.output_chars,
+                seed=args.seed,
+            )
+            governor = LLMGovernor(
+                requests_per_minute=llm_rpm, tokens_per_minute=args.llm_tpm, max_concurrency=llm_concurrency
+            )
+            warehouse = SimulatedWarehouse(
+                args.warehouse_latency_ms, failure_rate=args.warehouse_failure_rate, seed=args.seed
+            )
+            return await simulate(
+                args.rpm, args.minutes * 60, pm_workers, llm, governor, warehouse, args.stream, args.seed
+            )
+
+        wall_start = time.perf_counter()
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            report = run_simulated(scenario())
+        report["wall_s"] = time.perf_counter() - wall_start
+        reports.append(report)
+        if args.json:
+            print(json.dumps(report))
+        else:
+            print(
+                f"Simulated {report['simulated_s'] / 60:.1f} min ({report['arrivals']} requests) with "
+                f"{pm_workers} workers in {report['wall_s']:.1f}s.",
+                flush=True,
+            )
+    if not args.json:
+        print_report(reports, args.slo_s)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,49 @@
+# agents/single_flight.py
+
+import asyncio
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls that share a key into one outstanding call.
+
+    The first caller for a key starts the call; every caller that arrives while
+    it is in flight waits on the same result and receives the same value or
+    exception. The shared call runs in its own task, so cancelling one waiter
+    (including the first) does not cancel it for the others.
+    """
+
+    def __init__(self):
+        self._calls = {}  # key -> Task of the call in flight
+
+    def in_flight(self) -> int:
+        return len(self._calls)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._calls
+
+    async def do(self, key: str, call) -> tuple:
+        """
+        Runs `call()` unless a call with the same key is already in flight.
+
+        Args:
+            key (str): The coalescing key.
+            call (callable): A zero-argument coroutine function performing the call.
+
+        Returns:
+            tuple: (result, shared) where `shared` is True if this caller joined a call
+                   started by someone else.
+        """
+        task = self._calls.get(key)
+        shared = task is not None
+        if not shared:
+            task = asyncio.ensure_future(call())
+            self._calls[key] = task
+            task.add_done_callback(lambda _, key=key: self._forget(key, task))
+        return await asyncio.shield(task), shared
+
+    def _forget(self, key: str, task: asyncio.Task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            task.exception()  # Retrieved by the waiters; avoid "never retrieved" warnings
@@ -0,0 +1,152 @@
+# agents/token_budget.py
+
+import re
+
+from .utils import get_env
+
+# Words, runs of digits and single symbols; roughly how a BPE tokenizer splits text and code
+_TOKEN_PATTERN = re.compile(r"[A-Za-z]+|\d+|[^\sA-Za-z\d]")
+_HEADING_PATTERN = re.compile(r"^(#{1,6}\s|\*\*[^*]+\*\*:?$|[A-Z][^.!?]{0,80}:$)")
+_ITEM_PATTERN = re.compile(r"^([-*+]|\d+[.)]|[A-Za-z][.)])\s")
+
+OMISSION_NOTE = "[... {lines} line(s) omitted to fit a {budget}-token budget]"
+
+# Line priorities for trimming; higher numbers are dropped first
+HEADING, ITEM, DETAIL, EXAMPLE = 0, 1, 2, 3
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimates the number of model tokens in `text` without a tokenizer. Short
+    words and symbols count as one token each and long words as one per eight
+    characters. LLM_CALL_COMPLETE events log the estimate next to the model's
+    own count, to check how far off it is.
+    """
+    if not text:
+        return 1
+    return 1 + sum(1 + len(piece) // 8 for piece in _TOKEN_PATTERN.findall(text))
+
+
+def stage_budget(stage: str) -> int:
+    """
+    Returns the prompt token budget of a pipeline stage from
+    ADK_TOKEN_BUDGET_<STAGE> (e.g. ADK_TOKEN_BUDGET_CODING), or 0 for unlimited.
+    """
+    return int(get_env(f"ADK_TOKEN_BUDGET_{stage.upper()}", "0"))
+
+
+def _line_priorities(lines: list) -> list:
+    """
+    Classifies each line of a Markdown-ish document: headings, top-level list
+    items and paragraph openers carry the structure; nested items and
+    continuation lines are detail; fenced code and blank lines are examples
+    and spacing.
+    """
+    priorities = []
+    in_fence = False
+    previous_blank = True
+    for line in lines:
+        stripped = line.strip()
+        if stripped.startswith("```"):
+            in_fence = not in_fence
+            priorities.append(EXAMPLE)
+        elif in_fence or not stripped:
+            priorities.append(EXAMPLE)
+        elif _HEADING_PATTERN.match(stripped):
+            priorities.append(HEADING)
+        elif line[:1].isspace():
+            priorities.append(DETAIL)  # Nested item or indented continuation
+        elif _ITEM_PATTERN.match(stripped) or previous_blank:
+            priorities.append(ITEM)
+        else:
+            priorities.append(DETAIL)
+        previous_blank = not stripped
+    return priorities
+
+
+def trim_to_budget(text: str, max_tokens: int) -> str:
+    """
+    Deterministically trims `text` to about `max_tokens` tokens while keeping its
+    outline. Redundant whitespace goes first; then examples and blank lines,
+    then detail lines, then list items, each from the end of the document
+    backwards, so the headings and the leading requirements survive longest.
+    A final note says how many lines were dropped.
+
+    Args:
+        text (str): The text to trim, typically Markdown requirements.
+        max_tokens (int): The budget; 0 or less means unlimited.
+
+    Returns:
+        str: `text` itself if it fits, else the trimmed text.
+    """
+    if max_tokens <= 0 or estimate_tokens(text) <= max_tokens:
+        return text
+
+    lines = []
+    for line in text.splitlines():
+        line = line.rstrip()
+        if line or (lines and lines[-1]):  # Collapse runs of blank lines
+            lines.append(line)
+    compact = "\n".join(lines).strip("\n")
+    if estimate_tokens(compact) <= max_tokens:
+        return compact
+
+    note_tokens = estimate_tokens(OMISSION_NOTE.format(lines=len(lines), budget=max_tokens))
+    costs = [estimate_tokens(line) for line in lines]  # Each includes one token for the newline
+    priorities = _line_priorities(lines)
+    kept = [True] * len(lines)
+    total = sum(costs)
+    for priority in (EXAMPLE, DETAIL, ITEM, HEADING):
+        for index in range(len(lines) - 1, -1, -1):
+            if total + note_tokens <= max_tokens:
+                break
+            if kept[index] and priorities[index] == priority:
+                kept[index] = False
+                total -= costs[index]
+
+    result = [line for line, keep in zip(lines, kept) if keep]
+    if not result:
+        # Not even one heading fits next to the note; keep the start of the text
+        return compact[: max_tokens * 4]
+    result.append(OMISSION_NOTE.format(lines=kept.count(False), budget=max_tokens))
+    return "\n".join(result)
+
+
+class Compaction:
+    """
+    The outcome of fitting a prompt payload into a stage's token budget.
+    """
+
+    __slots__ = ("text", "stage", "budget", "method", "original_tokens", "tokens")
+
+    def __init__(self, text: str, stage: str, budget: int, method: str, original_tokens: int, tokens: int):
+        """
+        Initializes the Compaction.
+
+        Args:
+            text (str): The payload to put in the prompt.
+            stage (str): The pipeline stage whose budget applied.
+            budget (int): The stage's prompt budget (0 for unlimited).
+            method (str): "none", "trim", "summarize" or "summarize+trim".
+            original_tokens (int): Estimated tokens of the payload as received.
+            tokens (int): Estimated tokens of `text`.
+        """
+        self.text = text
+        self.stage = stage
+        self.budget = budget
+        self.method = method
+        self.original_tokens = original_tokens
+        self.tokens = tokens
+
+    @property
+    def compacted(self) -> bool:
+        return self.method != "none"
+
+    def to_dict(self) -> dict:
+        return {
+            "stage": self.stage,
+            "budget": self.budget,
+            "method": self.method,
+            "payload_tokens_estimated": self.original_tokens,
+            "compacted_tokens_estimated": self.tokens,
+        }
@@ -0,0 +1,506 @@
+# agents/trace_analysis.py
+"""
+Critical-path and latency-breakdown analysis of agent traces.
+
+Traces recorded with span events (ADK_SPAN_EVENTS=1) are rebuilt from their
+SPAN_END events, which carry exact durations and parent span IDs. Otherwise,
+every event with a `duration_ms` (LLM_CALL_COMPLETE, MESSAGE_RECEIVE,
+TASK_COMPLETE, WORKFLOW_FINALIZED, ...) ends at its timestamp, which gives a
+timed span, and spans are nested by time containment. The critical path of
+the resulting tree (the chain of work that determined the end-to-end time)
+is then split into categories:
+
+    llm        time inside model calls (excluding governor queueing)
+    queueing   governor queue wait, and time a stage spent waiting on another
+               agent beyond that agent's own work (message delivery, mailboxes)
+    logging    short gaps between consecutive events of an agent; each ends in
+               a `log_agent_event` call
+    sleep      gaps of at least `sleep_threshold_ms` with no recorded work,
+               i.e. artificial delays
+    other      self time of other spans
+
+Usage:
+    python -m agents.trace_analysis report --limit 10
+    python -m agents.trace_analysis stats --status SUCCESS --limit 1000
+    python -m agents.trace_analysis export --trace <trace_id> --format speedscope -o trace.speedscope.json
+"""
+
+import argparse
+import datetime
+import json
+import os
+import sys
+from collections import defaultdict
+
+from .events import loads_details
+from .trace_store import DEFAULT_TRACE_DB, TraceStore
+
+CATEGORIES = ("llm", "queueing", "logging", "sleep", "other")
+
+DEFAULT_SLEEP_THRESHOLD_MS = 750.0
+
+# Durations are logged as whole milliseconds, so containment is checked with some slack
+CONTAINMENT_TOLERANCE = 0.002
+
+# Usual nesting order of span kinds, used to nest spans of (nearly) equal length
+KIND_RANK = {"workflow": 0, "stage": 1, "task": 2, "other": 2, "llm": 3}
+
+
+def parse_timestamp(value: str) -> float:
+    """
+    Returns an ISO 8601 timestamp as seconds since the epoch.
+    """
+    value = value.replace("Z", "+00:00").replace(" UTC", "+00:00").replace(" ", "T", 1)
+    if "." in value:
+        # Python < 3.11 only accepts 3 or 6 fractional digits
+        head, _, rest = value.partition(".")
+        digits = len(rest) - len(rest.lstrip("0123456789"))
+        value = f"{head}.{rest[:digits][:6].ljust(6, '0')}{rest[digits:]}"
+    parsed = datetime.datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=datetime.timezone.utc)
+    return parsed.timestamp()
+
+
+def percentile(values: list, pct: float) -> float:
+    """
+    Returns the `pct` percentile (0-100) of `values` (nearest rank), or None if empty.
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+class Span:
+    """
+    A timed interval of a trace. `kind` decides how its self time is categorized.
+    """
+
+    __slots__ = ("name", "kind", "agent_id", "start", "end", "children", "event")
+
+    def __init__(self, name: str, kind: str, agent_id: str, start: float, end: float, event: dict = None):
+        self.name = name
+        self.kind = kind
+        self.agent_id = agent_id
+        self.start = start
+        self.end = end
+        self.children = []
+        self.event = event
+
+    @property
+    def duration_ms(self) -> float:
+        return (self.end - self.start) * 1000
+
+    def walk(self):
+        yield self
+        for child in self.children:
+            yield from child.walk()
+
+
+def _span_from_span_end(event: dict, end: float) -> Span:
+    details = event.get("details") or {}
+    duration_ns = details.get("duration_ns")
+    duration = duration_ns / 1e9 if duration_ns is not None else float(event.get("duration_ms") or 0) / 1000
+    kind = details.get("kind")
+    kind = kind if kind in KIND_RANK else "other"
+    span = Span(details.get("name") or "span", kind, event.get("agent_id"), end - duration, end, event)
+    queue_wait_ms = details.get("llm_queue_wait_ms")
+    if kind == "llm" and queue_wait_ms:
+        queue_end = min(end, span.start + float(queue_wait_ms) / 1000)
+        span.children.append(Span(f"{span.agent_id}.llm_queue", "queue", span.agent_id, span.start, queue_end, event))
+    return span
+
+
+def _spans_from_event(event: dict, end: float) -> list:
+    duration_ms = event.get("duration_ms")
+    if not duration_ms or float(duration_ms) <= 0:
+        return []
+    start = end - float(duration_ms) / 1000
+    agent_id = event.get("agent_id")
+    event_type = event.get("event_type")
+    details = event.get("details") or {}
+    if event_type == "LLM_CALL_COMPLETE":
+        span = Span(f"{agent_id}.llm", "llm", agent_id, start, end, event)
+        queue_wait_ms = details.get("llm_queue_wait_ms") if isinstance(details, dict) else None
+        if queue_wait_ms:
+            queue_end = min(end, start + float(queue_wait_ms) / 1000)
+            span.children.append(Span(f"{agent_id}.llm_queue", "queue", agent_id, start, queue_end, event))
+        return [span]
+    if event_type == "MESSAGE_RECEIVE":
+        return [Span(f"{agent_id}.wait:{event.get('source_agent_id')}", "stage", agent_id, start, end, event)]
+    if event_type == "TASK_COMPLETE":
+        return [Span(agent_id, "task", agent_id, start, end, event)]
+    if event_type == "WORKFLOW_FINALIZED":
+        return [Span("workflow", "workflow", agent_id, start, end, event)]
+    return [Span(f"{agent_id}.{event_type}", "other", agent_id, start, end, event)]
+
+
+class TraceTree:
+    """
+    The span tree of one trace, built from its events.
+    """
+
+    def __init__(self, trace_id: str, events: list, sleep_threshold_ms: float = DEFAULT_SLEEP_THRESHOLD_MS):
+        """
+        Initializes the TraceTree.
+
+        Args:
+            trace_id (str): The trace.
+            events (list): Event rows of the trace, as returned by `TraceStore.get_trace_events`.
+            sleep_threshold_ms (float, optional): Shortest unexplained gap counted as sleep.
+                                                  Defaults to DEFAULT_SLEEP_THRESHOLD_MS.
+        """
+        self.trace_id = trace_id
+        self.sleep_threshold = sleep_threshold_ms / 1000
+        self.events = []
+        for event in events:
+            event = dict(event, details=loads_details(event.get("details")))
+            event["at"] = parse_timestamp(event["timestamp"])
+            self.events.append(event)
+        self.events.sort(key=lambda event: event["at"])
+        # Traces instrumented with spans (SPAN_END events) carry exact durations and
+        # parent IDs; older traces are reconstructed from the durations of other events
+        span_ends = [event for event in self.events if event["event_type"] == "SPAN_END"]
+        if span_ends:
+            spans = [_span_from_span_end(event, event["at"]) for event in span_ends]
+        else:
+            spans = [span for event in self.events for span in _spans_from_event(event, event["at"])]
+        start = min([span.start for span in spans] + [event["at"] for event in self.events])
+        end = max([span.end for span in spans] + [event["at"] for event in self.events])
+        self.root = Span("trace", "workflow", None, start, end)
+        if span_ends:
+            self._link(spans)
+        else:
+            self._nest(spans)
+        self._event_times = defaultdict(list)
+        for event in self.events:
+            self._event_times[event.get("agent_id")].append(event["at"])
+            self._event_times[None].append(event["at"])
+
+    def _link(self, spans: list):
+        by_id = {span.event.get("span_id"): span for span in spans if span.event.get("span_id")}
+        for span in spans:
+            parent = by_id.get(span.event.get("parent_span_id"), self.root)
+            parent.children.append(span)
+        self._clamp(self.root)
+
+    def _nest(self, spans: list):
+        # Longest first, so that every span's parent is already placed: the
+        # shortest (and, among equals, latest) placed span that contains it
+        ordered = sorted(spans, key=lambda span: span.start - span.end)
+        for i in range(1, len(ordered)):
+            j = i
+            while (
+                j > 0
+                and abs(ordered[j - 1].duration_ms - ordered[j].duration_ms) <= 2000 * CONTAINMENT_TOLERANCE
+                and KIND_RANK[ordered[j].kind] < KIND_RANK[ordered[j - 1].kind]
+            ):
+                ordered[j - 1], ordered[j] = ordered[j], ordered[j - 1]
+                j -= 1
+        placed = [self.root]
+        for span in ordered:
+            parent = min(
+                (
+                    (candidate.end - candidate.start, -index, candidate)
+                    for index, candidate in enumerate(placed)
+                    if span.start >= candidate.start - CONTAINMENT_TOLERANCE
+                    and span.end <= candidate.end + CONTAINMENT_TOLERANCE
+                ),
+                key=lambda item: item[:2],
+            )[2]
+            parent.children.append(span)
+            placed.append(span)
+        self._clamp(self.root)
+
+    def _clamp(self, span: Span):
+        span.children.sort(key=lambda child: child.start)
+        for child in span.children:
+            child.start = min(max(child.start, span.start), span.end)
+            child.end = max(min(child.end, span.end), child.start)
+            self._clamp(child)
+
+    def spans(self) -> list:
+        return list(self.root.walk())
+
+    def _classify(self, span: Span, start: float, end: float) -> list:
+        """
+        Splits the self time `start..end` of `span` into categorized segments.
+        """
+        if span.kind == "llm":
+            return [(start, end, "llm", span.name)]
+        if span.kind in ("queue", "stage"):
+            return [(start, end, "queueing", span.name)]
+        if span.kind == "other":
+            return [(start, end, "other", span.name)]
+        # Agent and workflow self time: split at the agent's own events
+        cuts = [at for at in self._event_times[span.agent_id] if start < at < end]
+        segments = []
+        for seg_start, seg_end in zip([start] + cuts, cuts + [end]):
+            category = "sleep" if seg_end - seg_start >= self.sleep_threshold else "logging"
+            segments.append((seg_start, seg_end, category, span.name))
+        return segments
+
+    def critical_path(self) -> list:
+        """
+        Returns the critical path as time-ordered segments
+        `(start, end, category, span name)`. Walking back from the end of each
+        span, the child that finished last before the current point is on the
+        path; the time between such children is the span's own.
+        """
+        segments = []
+        self._critical(self.root, self.root.end, segments)
+        segments.reverse()
+        merged = []
+        for segment in segments:
+            if segment[1] <= segment[0]:
+                continue
+            if merged and merged[-1][2:] == segment[2:] and merged[-1][1] >= segment[0]:
+                merged[-1] = (merged[-1][0], segment[1]) + segment[2:]  # Same category, same span
+            else:
+                merged.append(segment)
+        return merged
+
+    def _critical(self, span: Span, end: float, out: list):
+        cursor = min(end, span.end)
+        for child in sorted(span.children, key=lambda child: child.end, reverse=True):
+            if cursor <= span.start:
+                break
+            if child.start >= cursor:
+                continue  # Runs entirely after the point we have reached
+            child_end = min(child.end, cursor)
+            out.extend(reversed(self._classify(span, child_end, cursor)))
+            self._critical(child, child_end, out)
+            cursor = child.start
+        if cursor > span.start:
+            out.extend(reversed(self._classify(span, span.start, cursor)))
+
+    def breakdown(self) -> dict:
+        """
+        Returns the milliseconds of critical-path time per category, plus "total".
+        """
+        totals = dict.fromkeys(CATEGORIES, 0.0)
+        for start, end, category, _ in self.critical_path():
+            totals[category] += (end - start) * 1000
+        totals["total"] = self.root.duration_ms
+        return totals
+
+
+def load_trees(store: TraceStore, trace_ids: list, sleep_threshold_ms: float = DEFAULT_SLEEP_THRESHOLD_MS) -> list:
+    trees = []
+    for trace_id in trace_ids:
+        events = store.get_trace_events(trace_id)
+        if events:
+            trees.append(TraceTree(trace_id, events, sleep_threshold_ms))
+    return trees
+
+
+def aggregate(trees: list) -> dict:
+    """
+    Aggregates span durations per stage and critical-path time per category
+    across traces.
+
+    Returns:
+        dict: {"stages": {name: stats}, "categories": {category: stats}}, where
+              stats holds count, mean_ms, p50_ms, p95_ms and p99_ms.
+    """
+    stage_durations = defaultdict(list)
+    category_times = defaultdict(list)
+    for tree in trees:
+        for span in tree.spans():
+            stage_durations[span.name].append(span.duration_ms)
+        for category, value in tree.breakdown().items():
+            category_times[category].append(value)
+
+    def stats(values: list) -> dict:
+        return {
+            "count": len(values),
+            "mean_ms": round(sum(values) / len(values), 2),
+            "p50_ms": round(percentile(values, 50), 2),
+            "p95_ms": round(percentile(values, 95), 2),
+            "p99_ms": round(percentile(values, 99), 2),
+        }
+
+    return {
+        "stages": {name: stats(values) for name, values in sorted(stage_durations.items())},
+        "categories": {category: stats(values) for category, values in category_times.items()},
+    }
+
+
+def to_chrome_trace(trees: list) -> dict:
+    """
+    Returns the traces in Chrome trace-event format (chrome://tracing, Perfetto):
+    one process per trace, one thread per agent, spans as complete events and
+    agent events as instant events. Critical-path spans are flagged in `args`.
+    """
+    trace_events = []
+    for pid, tree in enumerate(trees, start=1):
+        trace_events.append({"name": "process_name", "ph": "M", "pid": pid, "args": {"name": tree.trace_id}})
+        threads = {}
+
+        def tid_of(agent_id, threads=threads, pid=pid):
+            if agent_id not in threads:
+                threads[agent_id] = len(threads) + 1
+                trace_events.append(
+                    {
+                        "name": "thread_name",
+                        "ph": "M",
+                        "pid": pid,
+                        "tid": threads[agent_id],
+                        "args": {"name": agent_id or "trace"},
+                    }
+                )
+            return threads[agent_id]
+
+        critical = {name for _, _, _, name in tree.critical_path()}
+        for span in tree.spans():
+            trace_events.append(
+                {
+                    "name": span.name,
+                    "cat": span.kind,
+                    "ph": "X",
+                    "ts": span.start * 1e6,
+                    "dur": (span.end - span.start) * 1e6,
+                    "pid": pid,
+                    "tid": tid_of(span.agent_id),
+                    "args": {"critical_path": span.name in critical},
+                }
+            )
+        for event in tree.events:
+            trace_events.append(
+                {
+                    "name": event["event_type"],
+                    "cat": "event",
+                    "ph": "i",
+                    "s": "t",
+                    "ts": event["at"] * 1e6,
+                    "pid": pid,
+                    "tid": tid_of(event.get("agent_id")),
+                    "args": {"summary": event.get("message_summary"), "status": event.get("status")},
+                }
+            )
+    return {"traceEvents": trace_events, "displayTimeUnit": "ms"}
+
+
+def to_speedscope(trees: list) -> dict:
+    """
+    Returns the traces in speedscope's file format, one evented profile per
+    trace. Overlapping sibling spans are clipped so that frames nest strictly.
+    """
+    frames = []
+    frame_index = {}
+    profiles = []
+
+    def frame_of(name: str) -> int:
+        if name not in frame_index:
+            frame_index[name] = len(frames)
+            frames.append({"name": name})
+        return frame_index[name]
+
+    def emit(span: Span, start: float, end: float, origin: float, events: list):
+        events.append({"type": "O", "frame": frame_of(span.name), "at": (start - origin) * 1000})
+        cursor = start
+        for child in sorted(span.children, key=lambda child: child.start):
+            child_start, child_end = max(child.start, cursor), min(child.end, end)
+            if child_end > child_start:
+                emit(child, child_start, child_end, origin, events)
+                cursor = child_end
+        events.append({"type": "C", "frame": frame_of(span.name), "at": (end - origin) * 1000})
+
+    for tree in trees:
+        events = []
+        emit(tree.root, tree.root.start, tree.root.end, tree.root.start, events)
+        profiles.append(
+            {
+                "type": "evented",
+                "name": tree.trace_id,
+                "unit": "milliseconds",
+                "startValue": 0,
+                "endValue": tree.root.duration_ms,
+                "events": events,
+            }
+        )
+    return {
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "shared": {"frames": frames},
+        "profiles": profiles,
+        "name": "agent traces",
+        "exporter": "agents.trace_analysis",
+    }
+
+
+def _print_report(tree: TraceTree):
+    breakdown = tree.breakdown()
+    total = breakdown["total"] or 1.0
+    print(f"Trace {tree.trace_id}: {breakdown['total']:.1f}ms")
+    print("  " + ", ".join(f"{c} {breakdown[c]:.1f}ms ({breakdown[c] / total:.0%})" for c in CATEGORIES))
+    print("  Critical path:")
+    for start, end, category, name in tree.critical_path():
+        offset = (start - tree.root.start) * 1000
+        print(f"    +{offset:9.1f}ms  {(end - start) * 1000:9.1f}ms  {category:<9} {name}")
+
+
+def main(argv: list = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument(
+        "--db",
+        default=os.getenv("ADK_EVENT_SQLITE_PATH", DEFAULT_TRACE_DB),
+        help="Trace database (defaults to ADK_EVENT_SQLITE_PATH).",
+    )
+    parser.add_argument("--input", nargs="+", help="Analyze these NDJSON event files instead of --db.")
+    parser.add_argument("--sleep-threshold-ms", type=float, default=DEFAULT_SLEEP_THRESHOLD_MS)
+    selection = argparse.ArgumentParser(add_help=False)
+    selection.add_argument("--trace", action="append", dest="trace_ids", help="Trace to analyze (repeatable).")
+    selection.add_argument("--status", choices=["SUCCESS", "FAILURE", "INCOMPLETE"])
+    selection.add_argument("--min-duration-ms", type=float)
+    selection.add_argument("--limit", type=int, default=20, help="Most recent traces to analyze.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("report", parents=[selection], help="Critical path and breakdown per trace.")
+    commands.add_parser("stats", parents=[selection], help="Per-stage and per-category percentiles.")
+    export = commands.add_parser("export", parents=[selection], help="Write a flamegraph file.")
+    export.add_argument("--format", choices=["chrome", "speedscope"], default="chrome")
+    export.add_argument("--output", "-o", required=True)
+    args = parser.parse_args(argv)
+
+    if args.input:
+        store = TraceStore(":memory:")
+        for path in args.input:
+            store.ingest_jsonl(path)
+    else:
+        store = TraceStore(args.db)
+    try:
+        trace_ids = args.trace_ids or [
+            trace["trace_id"]
+            for trace in store.list_traces(status=args.status, min_duration_ms=args.min_duration_ms, limit=args.limit)
+        ]
+        trees = load_trees(store, trace_ids, args.sleep_threshold_ms)
+    finally:
+        store.close()
+    if not trees:
+        print("No matching traces.")
+        return 1
+
+    if args.command == "report":
+        for tree in trees:
+            _print_report(tree)
+    elif args.command == "stats":
+        summary = aggregate(trees)
+        print(f"{len(trees)} traces")
+        for section in ("categories", "stages"):
+            print(f"{section.capitalize()} (critical-path ms):" if section == "categories" else "Stages (span ms):")
+            for name, stats in summary[section].items():
+                print(
+                    f"  {name:<40} n={stats['count']:<6} p50 {stats['p50_ms']:>9.1f}  "
+                    f"p95 {stats['p95_ms']:>9.1f}  p99 {stats['p99_ms']:>9.1f}"
+                )
+    else:
+        document = to_chrome_trace(trees) if args.format == "chrome" else to_speedscope(trees)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(document, f)
+        print(f"Wrote {len(trees)} trace(s) to {args.output} ({args.format}).")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,400 @@
+# agents/trace_store.py
+"""
+Local, indexed store of agent events for debugging.
+
+Events land here either directly (the "sqlite" event backend writes through a
+TraceStore) or from newline-delimited JSON files: BigQuery exports of
+`adk_traces.agent_events`, the "jsonl" backend's output or spool segments.
+Besides the raw events, the store keeps a `traces` table with one summary row
+per trace, so listing and filtering traces never scans the events.
+
+Usage:
+    python -m agents.trace_store ingest export-*.json
+    python -m agents.trace_store traces --status FAILURE --min-duration-ms 5000
+    python -m agents.trace_store events <trace_id>
+    python -m agents.trace_store find --type LLM_CALL_COMPLETE --min-duration-ms 2000
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import threading
+
+from .events import EVENT_COLUMNS, dumps_json, loads_details
+
+DEFAULT_TRACE_DB = "./.adk_events/agent_events.sqlite3"
+
+# Events marking the end of a workflow, as (event_type, agent_id or None for any agent). Workflows
+# run through main.py end with WORKFLOW_FINALIZED; ones driven via ProjectManagerAgent.submit end
+# with the ProjectManagerAgent's TASK_COMPLETE.
+FINAL_EVENTS = (("WORKFLOW_FINALIZED", None), ("TASK_COMPLETE", "ProjectManagerAgent"))
+
+SCHEMA = """
+CREATE INDEX IF NOT EXISTS idx_events_trace ON agent_events (trace_id, timestamp);
+CREATE INDEX IF NOT EXISTS idx_events_agent ON agent_events (agent_id, timestamp);
+CREATE INDEX IF NOT EXISTS idx_events_type ON agent_events (event_type, timestamp);
+CREATE INDEX IF NOT EXISTS idx_events_timestamp ON agent_events (timestamp);
+CREATE TABLE IF NOT EXISTS traces (
+    trace_id TEXT PRIMARY KEY,
+    started_at TEXT,
+    ended_at TEXT,
+    duration_ms REAL,
+    event_count INTEGER,
+    failure_count INTEGER,
+    finished INTEGER,
+    status TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_traces_started ON traces (started_at);
+CREATE INDEX IF NOT EXISTS idx_traces_status ON traces (status, started_at);
+CREATE INDEX IF NOT EXISTS idx_traces_duration ON traces (duration_ms);
+"""
+
+SUMMARIZE_SQL = """
+INSERT OR REPLACE INTO traces
+SELECT
+    trace_id,
+    started_at,
+    ended_at,
+    (julianday(ended_at) - julianday(started_at)) * 86400000.0,
+    event_count,
+    failure_count,
+    finished,
+    CASE WHEN failure_count > 0 THEN 'FAILURE' WHEN finished THEN 'SUCCESS' ELSE 'INCOMPLETE' END
+FROM (
+    SELECT
+        trace_id,
+        MIN(timestamp) AS started_at,
+        MAX(timestamp) AS ended_at,
+        COUNT(*) AS event_count,
+        SUM(status = 'FAILURE') AS failure_count,
+        MAX({final_condition}) AS finished
+    FROM agent_events
+    WHERE trace_id IN ({placeholders})
+    GROUP BY trace_id
+)
+"""
+
+TRACE_COLUMNS = ("trace_id", "started_at", "ended_at", "duration_ms", "event_count", "failure_count", "status")
+
+
+def normalize_timestamp(value) -> str:
+    """
+    Returns `value` as an ISO 8601 string comparable with the timestamps written
+    by `log_agent_event` (BigQuery exports use "2024-05-01 12:00:00.123 UTC").
+    """
+    if value is None:
+        return None
+    value = str(value).strip()
+    if value.endswith(" UTC"):
+        value = value[: -len(" UTC")] + "+00:00"
+    elif value.endswith("Z"):
+        value = value[:-1] + "+00:00"
+    return value.replace(" ", "T", 1)
+
+
+def normalize_row(row: dict) -> tuple:
+    """
+    Returns the agent_events column values of an event row from any source.
+    """
+    details = row.get("details")
+    if isinstance(details, (dict, list)):
+        details = dumps_json(details)
+    duration_ms = row.get("duration_ms")
+    # BigQuery exports INT64 columns as strings
+    duration_ms = float(duration_ms) if duration_ms is not None and duration_ms != "" else None
+    values = dict(row, timestamp=normalize_timestamp(row.get("timestamp")), details=details, duration_ms=duration_ms)
+    return tuple(values.get(column) for column in EVENT_COLUMNS)
+
+
+class TraceStore:
+    """
+    SQLite store of agent events, indexed on trace, agent, event type and time,
+    with a per-trace summary table. Safe to share between threads.
+    """
+
+    def __init__(self, path: str = DEFAULT_TRACE_DB):
+        """
+        Initializes the TraceStore, creating the database, tables and indexes if needed.
+
+        Args:
+            path (str, optional): Path of the SQLite database file. Defaults to DEFAULT_TRACE_DB.
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        columns = ", ".join(
+            f"{column} TEXT PRIMARY KEY" if column == "event_id" else column for column in EVENT_COLUMNS
+        )
+        self._conn.execute(f"CREATE TABLE IF NOT EXISTS agent_events ({columns})")
+        # Add columns introduced by newer event schema versions to existing databases
+        existing = {row[1] for row in self._conn.execute("PRAGMA table_info(agent_events)")}
+        for column in EVENT_COLUMNS:
+            if column not in existing:
+                self._conn.execute(f"ALTER TABLE agent_events ADD COLUMN {column}")
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+        placeholders = ", ".join("?" for _ in EVENT_COLUMNS)
+        self._insert_sql = f"INSERT OR IGNORE INTO agent_events ({', '.join(EVENT_COLUMNS)}) VALUES ({placeholders})"
+
+    def ingest(self, rows: list) -> int:
+        """
+        Stores event rows, skipping any whose `event_id` is already present, and
+        refreshes the summaries of the traces they belong to.
+
+        Returns:
+            int: The number of new events.
+        """
+        values = [normalize_row(row) for row in rows]
+        trace_ids = sorted({value[EVENT_COLUMNS.index("trace_id")] for value in values} - {None})
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.executemany(self._insert_sql, values)
+            inserted = self._conn.total_changes - before
+            if inserted:
+                self._summarize(trace_ids)
+            self._conn.commit()
+        return inserted
+
+    def _summarize(self, trace_ids: list):
+        final_condition = " OR ".join(
+            f"(event_type = '{event_type}'" + (f" AND agent_id = '{agent_id}')" if agent_id else ")")
+            for event_type, agent_id in FINAL_EVENTS
+        )
+        for start in range(0, len(trace_ids), 500):  # Stay below SQLite's bound-parameter limit
+            chunk = trace_ids[start : start + 500]
+            sql = SUMMARIZE_SQL.format(final_condition=final_condition, placeholders=", ".join("?" for _ in chunk))
+            self._conn.execute(sql, chunk)
+
+    def ingest_jsonl(self, path: str, batch_size: int = 5000) -> int:
+        """
+        Ingests a newline-delimited JSON file of event rows, such as a BigQuery export.
+
+        Returns:
+            int: The number of new events.
+        """
+        inserted = 0
+        batch = []
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    batch.append(json.loads(line))
+                if len(batch) >= batch_size:
+                    inserted += self.ingest(batch)
+                    batch = []
+        if batch:
+            inserted += self.ingest(batch)
+        return inserted
+
+    def _query(self, sql: str, params: list) -> list:
+        with self._lock:
+            return [dict(row) for row in self._conn.execute(sql, params)]
+
+    def list_traces(
+        self,
+        status: str = None,
+        min_duration_ms: float = None,
+        max_duration_ms: float = None,
+        since: str = None,
+        until: str = None,
+        limit: int = 100,
+    ) -> list:
+        """
+        Lists trace summaries, most recent first.
+
+        Args:
+            status (str, optional): "SUCCESS", "FAILURE" or "INCOMPLETE". Defaults to None.
+            min_duration_ms (float, optional): Only traces at least this long. Defaults to None.
+            max_duration_ms (float, optional): Only traces at most this long. Defaults to None.
+            since (str, optional): Only traces started at or after this ISO timestamp. Defaults to None.
+            until (str, optional): Only traces started before this ISO timestamp. Defaults to None.
+            limit (int, optional): Maximum number of traces. Defaults to 100.
+
+        Returns:
+            list: One dict per trace, with the TRACE_COLUMNS keys.
+        """
+        clauses, params = [], []
+        if status:
+            clauses.append("status = ?")
+            params.append(status.upper())
+        if min_duration_ms is not None:
+            clauses.append("duration_ms >= ?")
+            params.append(min_duration_ms)
+        if max_duration_ms is not None:
+            clauses.append("duration_ms <= ?")
+            params.append(max_duration_ms)
+        if since:
+            clauses.append("started_at >= ?")
+            params.append(normalize_timestamp(since))
+        if until:
+            clauses.append("started_at < ?")
+            params.append(normalize_timestamp(until))
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        sql = f"SELECT {', '.join(TRACE_COLUMNS)} FROM traces {where} ORDER BY started_at DESC LIMIT ?"
+        return self._query(sql, params + [limit])
+
+    def get_trace(self, trace_id: str) -> dict:
+        """
+        Returns the summary of one trace, or None if it is unknown.
+        """
+        rows = self._query(f"SELECT {', '.join(TRACE_COLUMNS)} FROM traces WHERE trace_id = ?", [trace_id])
+        return rows[0] if rows else None
+
+    def get_trace_events(self, trace_id: str, event_type: str = None, agent_id: str = None) -> list:
+        """
+        Returns all events of a trace in time order, with `details` parsed into a dict.
+        """
+        sql = "SELECT * FROM agent_events WHERE trace_id = ?"
+        params = [trace_id]
+        if event_type:
+            sql += " AND event_type = ?"
+            params.append(event_type)
+        if agent_id:
+            sql += " AND agent_id = ?"
+            params.append(agent_id)
+        return self._with_details(self._query(sql + " ORDER BY timestamp, rowid", params))
+
+    def find_events(
+        self,
+        event_type: str = None,
+        agent_id: str = None,
+        status: str = None,
+        min_duration_ms: float = None,
+        since: str = None,
+        until: str = None,
+        limit: int = 100,
+    ) -> list:
+        """
+        Finds events across traces, most recent first, with `details` parsed into a dict.
+        """
+        clauses, params = [], []
+        for column, value in (("event_type", event_type), ("agent_id", agent_id), ("status", status)):
+            if value:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        if min_duration_ms is not None:
+            clauses.append("duration_ms >= ?")
+            params.append(min_duration_ms)
+        if since:
+            clauses.append("timestamp >= ?")
+            params.append(normalize_timestamp(since))
+        if until:
+            clauses.append("timestamp < ?")
+            params.append(normalize_timestamp(until))
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        sql = f"SELECT * FROM agent_events {where} ORDER BY timestamp DESC LIMIT ?"
+        return self._with_details(self._query(sql, params + [limit]))
+
+    @staticmethod
+    def _with_details(rows: list) -> list:
+        for row in rows:
+            row["details"] = loads_details(row["details"])
+        return rows
+
+    def event_count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM agent_events").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def _print_rows(rows: list, columns: tuple, as_json: bool):
+    if as_json:
+        for row in rows:
+            print(json.dumps(row, default=str))
+        return
+    for row in rows:
+        values = []
+        for column in columns:
+            value = row.get(column)
+            if value is None:
+                value = "-"
+            elif isinstance(value, float):
+                value = f"{value:.1f}"
+            values.append(str(value).replace("\n", " "))
+        print("  ".join(values))
+    print(f"({len(rows)} rows)")
+
+
+def main(argv: list = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument(
+        "--db",
+        default=os.getenv("ADK_EVENT_SQLITE_PATH", DEFAULT_TRACE_DB),
+        help="Trace database (defaults to ADK_EVENT_SQLITE_PATH).",
+    )
+    output = argparse.ArgumentParser(add_help=False)
+    output.add_argument("--json", action="store_true", help="Print one JSON object per row.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    ingest = commands.add_parser("ingest", parents=[output], help="Ingest newline-delimited JSON event files.")
+    ingest.add_argument("files", nargs="+")
+
+    traces = commands.add_parser("traces", parents=[output], help="List traces, most recent first.")
+    traces.add_argument("--status", choices=["SUCCESS", "FAILURE", "INCOMPLETE"])
+    traces.add_argument("--min-duration-ms", type=float)
+    traces.add_argument("--max-duration-ms", type=float)
+    traces.add_argument("--since")
+    traces.add_argument("--until")
+    traces.add_argument("--limit", type=int, default=50)
+
+    events = commands.add_parser("events", parents=[output], help="Show all events of a trace in order.")
+    events.add_argument("trace_id")
+    events.add_argument("--type", dest="event_type")
+    events.add_argument("--agent", dest="agent_id")
+
+    find = commands.add_parser("find", parents=[output], help="Find events across traces.")
+    find.add_argument("--type", dest="event_type")
+    find.add_argument("--agent", dest="agent_id")
+    find.add_argument("--status")
+    find.add_argument("--min-duration-ms", type=float)
+    find.add_argument("--since")
+    find.add_argument("--until")
+    find.add_argument("--limit", type=int, default=50)
+
+    args = parser.parse_args(argv)
+    store = TraceStore(args.db)
+    try:
+        if args.command == "ingest":
+            for path in args.files:
+                print(f"{path}: {store.ingest_jsonl(path)} new events")
+        elif args.command == "traces":
+            rows = store.list_traces(
+                status=args.status,
+                min_duration_ms=args.min_duration_ms,
+                max_duration_ms=args.max_duration_ms,
+                since=args.since,
+                until=args.until,
+                limit=args.limit,
+            )
+            _print_rows(rows, TRACE_COLUMNS, args.json)
+        else:
+            if args.command == "events":
+                rows = store.get_trace_events(args.trace_id, event_type=args.event_type, agent_id=args.agent_id)
+            else:
+                rows = store.find_events(
+                    event_type=args.event_type,
+                    agent_id=args.agent_id,
+                    status=args.status,
+                    min_duration_ms=args.min_duration_ms,
+                    since=args.since,
+                    until=args.until,
+                    limit=args.limit,
+                )
+            columns = ("timestamp", "trace_id", "agent_id", "event_type", "status", "duration_ms", "message_summary")
+            _print_rows(rows, columns, args.json)
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,480 @@
+# agents/tracing.py
+"""
+Span-based instrumentation.
+
+A span times a unit of work with the monotonic `time.perf_counter_ns` clock and,
+with ADK_SPAN_EVENTS=1, logs SPAN_START / SPAN_END events (off by default, as
+they add two rows per span to the event stream). Spans nest: a span started inside another
+(in the same task, or a task created from it) becomes its child, and a span
+started for an incoming message becomes a child of the sender's span, whose
+`span_id` travels in the message `context` next to the `trace_id`:
+
+    async with span("llm_call", kind="llm", agent_id=self.name, context=context) as llm_span:
+        ...
+        await self.send_message(recipient_id=..., content=..., context=llm_span.inject())
+
+Finished spans can also be exported as OTLP/JSON, to an OTLP/HTTP endpoint
+(ADK_OTLP_ENDPOINT, e.g. http://localhost:4318/v1/traces) or a file
+(ADK_OTLP_FILE). `python -m agents.tracing collect` runs a minimal local
+collector that accepts OTLP/JSON and appends it to a file.
+"""
+
+import argparse
+import contextvars
+import functools
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+
+import asyncio
+import uuid
+
+_current_span = contextvars.ContextVar("adk_current_span", default=None)
+_span_events = None  # Whether spans log SPAN_START / SPAN_END events; read from ADK_SPAN_EVENTS on first use
+
+# OTLP span kinds: 1 INTERNAL, 2 SERVER, 3 CLIENT
+OTLP_SPAN_KINDS = {"workflow": 2, "task": 2, "llm": 3}
+
+
+def current_span():
+    """
+    Returns the span active in the current task, or None.
+    """
+    return _current_span.get()
+
+
+def new_span_id() -> str:
+    return os.urandom(8).hex()
+
+
+def span_events_enabled() -> bool:
+    """
+    Returns whether spans log SPAN_START / SPAN_END events (ADK_SPAN_EVENTS=1).
+    """
+    global _span_events
+    if _span_events is None:
+        from .utils import get_env  # utils imports this module
+
+        _span_events = get_env("ADK_SPAN_EVENTS", "0") == "1"
+    return _span_events
+
+
+def set_span_events(enabled: bool):
+    """
+    Turns SPAN_START / SPAN_END events on or off, overriding ADK_SPAN_EVENTS.
+    """
+    global _span_events
+    _span_events = enabled
+
+
+class Span:
+    """
+    A timed unit of work within a trace.
+    """
+
+    __slots__ = (
+        "name",
+        "kind",
+        "agent_id",
+        "trace_id",
+        "span_id",
+        "parent_span_id",
+        "attributes",
+        "status",
+        "start_ns",
+        "end_ns",
+        "start_unix_ns",
+    )
+
+    def __init__(
+        self,
+        name: str,
+        agent_id: str,
+        trace_id: str,
+        parent_span_id: str = None,
+        kind: str = "internal",
+        attributes: dict = None,
+    ):
+        self.name = name
+        self.kind = kind
+        self.agent_id = agent_id
+        self.trace_id = trace_id
+        self.span_id = new_span_id()
+        self.parent_span_id = parent_span_id
+        self.attributes = dict(attributes or {})
+        self.status = "SUCCESS"
+        self.start_ns = time.perf_counter_ns()
+        self.start_unix_ns = time.time_ns()
+        self.end_ns = None
+
+    @property
+    def duration_ns(self) -> int:
+        return (self.end_ns if self.end_ns is not None else time.perf_counter_ns()) - self.start_ns
+
+    def elapsed_ms(self) -> float:
+        """
+        Milliseconds since the span started (its duration, once it has ended).
+        """
+        return self.duration_ns / 1e6
+
+    def set_attribute(self, key: str, value):
+        self.attributes[key] = value
+
+    def record_error(self, exc: BaseException):
+        self.status = "FAILURE"
+        self.attributes["error"] = f"{type(exc).__name__}: {exc}"
+
+    def inject(self, context: dict = None) -> dict:
+        """
+        Returns `context` extended with this span's trace and span IDs, for an
+        outgoing message.
+        """
+        return dict(context or {}, trace_id=self.trace_id, span_id=self.span_id, parent_span_id=self.parent_span_id)
+
+    def end(self):
+        if self.end_ns is None:
+            self.end_ns = time.perf_counter_ns()
+
+
+class _SpanScope:
+    """
+    The async context manager returned by `span()`.
+    """
+
+    def __init__(self, name, kind, agent_id, trace_id, context, parent_span_id, attributes, emit):
+        self._args = (name, kind, agent_id, trace_id, context, parent_span_id, attributes)
+        self._emit = span_events_enabled() if emit is None else emit
+        self._span = None
+        self._token = None
+
+    async def __aenter__(self) -> Span:
+        name, kind, agent_id, trace_id, context, parent_span_id, attributes = self._args
+        parent = current_span()
+        context = context or {}
+        trace_id = trace_id or context.get("trace_id") or (parent.trace_id if parent else None) or "UNKNOWN_TRACE"
+        if parent_span_id is None:
+            # A remote parent (the sender of the message being handled) wins over the local one
+            parent_span_id = context.get("span_id") or (
+                parent.span_id if parent and parent.trace_id == trace_id else None
+            )
+        agent_id = agent_id or (parent.agent_id if parent else None)
+        self._span = Span(name, agent_id, trace_id, parent_span_id, kind, attributes)
+        self._token = _current_span.set(self._span)
+        if self._emit:
+            await _log_span_event(self._span, "SPAN_START")
+        return self._span
+
+    async def __aexit__(self, exc_type, exc, tb):
+        s = self._span
+        s.end()
+        _current_span.reset(self._token)
+        if exc is not None and s.status == "SUCCESS":
+            if isinstance(exc, asyncio.CancelledError):
+                s.status = "CANCELLED"
+            else:
+                s.record_error(exc)
+        if self._emit:
+            await _log_span_event(s, "SPAN_END")
+        exporter = get_span_exporter()
+        if exporter is not None and exporter.add(s):
+            await asyncio.to_thread(exporter.flush)
+        return False
+
+
+def span(
+    name: str,
+    kind: str = "internal",
+    agent_id: str = None,
+    trace_id: str = None,
+    context: dict = None,
+    parent_span_id: str = None,
+    attributes: dict = None,
+    emit: bool = None,
+) -> _SpanScope:
+    """
+    Starts a span, to be used as `async with span(...) as s:`.
+
+    Args:
+        name (str): The span name.
+        kind (str, optional): "workflow", "task", "stage", "llm" or "internal". Defaults to "internal".
+        agent_id (str, optional): The agent doing the work. Defaults to the parent span's agent.
+        trace_id (str, optional): The trace. Defaults to the context's, then the parent span's.
+        context (dict, optional): The context of the message being handled; its `span_id`
+                                  becomes the parent. Defaults to None.
+        parent_span_id (str, optional): Explicit parent span. Defaults to None.
+        attributes (dict, optional): Initial attributes. Defaults to None.
+        emit (bool, optional): Log SPAN_START / SPAN_END events. Defaults to ADK_SPAN_EVENTS.
+
+    Returns:
+        _SpanScope: An async context manager yielding the Span.
+    """
+    return _SpanScope(name, kind, agent_id, trace_id, context, parent_span_id, attributes, emit)
+
+
+def traced(name: str = None, kind: str = "internal"):
+    """
+    Decorator running a coroutine function inside a span (named after the
+    function by default) that inherits agent and trace from the current span.
+    """
+
+    def decorator(func):
+        span_name = name or func.__qualname__
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            async with span(span_name, kind=kind):
+                return await func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+async def _log_span_event(s: Span, event_type: str):
+    from .utils import log_agent_event  # utils imports this module
+
+    details = {"name": s.name, "kind": s.kind}
+    if event_type == "SPAN_END":
+        details["duration_ns"] = s.duration_ns
+        details.update(s.attributes)
+    await log_agent_event(
+        event_type=event_type,
+        agent_id=s.agent_id,
+        trace_id=s.trace_id,
+        message_summary=f"{s.name} {'started' if event_type == 'SPAN_START' else 'finished'}",
+        duration_ms=int(s.duration_ns // 1_000_000) if event_type == "SPAN_END" else None,
+        status=s.status if event_type == "SPAN_END" else None,
+        details=details,
+        span_id=s.span_id,
+        parent_span_id=s.parent_span_id,
+    )
+
+
+# --- OTLP export ---
+
+
+def otlp_trace_id(trace_id: str) -> str:
+    """
+    Returns the 32-hex-digit OTLP trace ID for a trace ID (a UUID, or any string).
+    """
+    try:
+        return uuid.UUID(trace_id).hex
+    except (ValueError, TypeError, AttributeError):
+        return hashlib.sha256(str(trace_id).encode("utf-8")).hexdigest()[:32]
+
+
+def _otlp_value(value) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": value if isinstance(value, str) else json.dumps(value, default=str)}
+
+
+def to_otlp_span(s: Span) -> dict:
+    attributes = dict(s.attributes, **{"adk.agent_id": s.agent_id, "adk.trace_id": s.trace_id, "adk.kind": s.kind})
+    otlp = {
+        "traceId": otlp_trace_id(s.trace_id),
+        "spanId": s.span_id,
+        "name": s.name,
+        "kind": OTLP_SPAN_KINDS.get(s.kind, 1),
+        "startTimeUnixNano": str(s.start_unix_ns),
+        "endTimeUnixNano": str(s.start_unix_ns + s.duration_ns),
+        "attributes": [{"key": key, "value": _otlp_value(value)} for key, value in attributes.items() if value is not None],
+        "status": {"code": 1 if s.status == "SUCCESS" else 2},
+    }
+    if s.parent_span_id:
+        otlp["parentSpanId"] = s.parent_span_id
+    return otlp
+
+
+def to_otlp_request(spans: list, service_name: str = "adk-agents") -> dict:
+    """
+    Returns an OTLP/JSON ExportTraceServiceRequest for finished spans.
+    """
+    return {
+        "resourceSpans": [
+            {
+                "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": service_name}}]},
+                "scopeSpans": [{"scope": {"name": "agents.tracing"}, "spans": [to_otlp_span(s) for s in spans]}],
+            }
+        ]
+    }
+
+
+class SpanExporter:
+    """
+    Base class for span exporters. Spans are buffered and written in batches;
+    `flush` is blocking and is called from a worker thread.
+    """
+
+    def __init__(self, batch_size: int = 256):
+        self.batch_size = batch_size
+        self._buffer = []
+        self._lock = threading.Lock()
+
+    def add(self, s: Span) -> bool:
+        """
+        Buffers a finished span and returns True when a batch is ready to flush.
+        """
+        with self._lock:
+            self._buffer.append(s)
+            return len(self._buffer) >= self.batch_size
+
+    def flush(self):
+        with self._lock:
+            spans, self._buffer = self._buffer, []
+        if spans:
+            try:
+                self._write(to_otlp_request(spans))
+            except Exception as e:
+                print(f"ERROR exporting {len(spans)} spans: {e}")
+
+    def _write(self, request: dict):
+        raise NotImplementedError
+
+
+class OTLPHttpExporter(SpanExporter):
+    """
+    POSTs OTLP/JSON to an OTLP/HTTP traces endpoint.
+    """
+
+    def __init__(self, endpoint: str, batch_size: int = 256, timeout: float = 5.0):
+        super().__init__(batch_size)
+        self.endpoint = endpoint
+        self.timeout = timeout
+
+    def _write(self, request: dict):
+        import urllib.request  # Only needed when exporting over HTTP
+
+        data = json.dumps(request).encode("utf-8")
+        http_request = urllib.request.Request(self.endpoint, data=data, headers={"Content-Type": "application/json"})
+        with urllib.request.urlopen(http_request, timeout=self.timeout) as response:
+            response.read()
+
+
+class OTLPFileExporter(SpanExporter):
+    """
+    Appends one OTLP/JSON request per line to a local file.
+    """
+
+    def __init__(self, path: str, batch_size: int = 256):
+        super().__init__(batch_size)
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+
+    def _write(self, request: dict):
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(request) + "\n")
+
+
+_span_exporter = None
+_exporter_configured = False
+
+
+def get_span_exporter() -> SpanExporter:
+    """
+    Returns the span exporter configured by ADK_OTLP_ENDPOINT or ADK_OTLP_FILE,
+    or None if spans are not exported.
+    """
+    global _span_exporter, _exporter_configured
+    if not _exporter_configured:
+        from .utils import get_env
+
+        endpoint = get_env("ADK_OTLP_ENDPOINT")
+        path = get_env("ADK_OTLP_FILE")
+        batch_size = int(get_env("ADK_OTLP_BATCH_SIZE", "256"))
+        if endpoint:
+            _span_exporter = OTLPHttpExporter(endpoint, batch_size)
+        elif path:
+            _span_exporter = OTLPFileExporter(path, batch_size)
+        _exporter_configured = True
+    return _span_exporter
+
+
+def set_span_exporter(exporter: SpanExporter):
+    """
+    Replaces the span exporter (None disables export).
+    """
+    global _span_exporter, _exporter_configured
+    _span_exporter = exporter
+    _exporter_configured = True
+
+
+async def flush_spans():
+    """
+    Exports every buffered span.
+    """
+    if _span_exporter is not None:
+        await asyncio.to_thread(_span_exporter.flush)
+
+
+# --- Local collector stand-in ---
+
+
+def run_collector(host: str, port: int, output_path: str):
+    """
+    Serves an OTLP/HTTP endpoint that accepts OTLP/JSON trace exports and
+    appends each request as one line to `output_path`. Blocks until interrupted.
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    lock = threading.Lock()
+
+    class CollectorHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            try:
+                request = json.loads(body)
+            except ValueError:
+                self.send_error(400, "Expected OTLP/JSON")
+                return
+            count = sum(
+                len(scope.get("spans", []))
+                for resource in request.get("resourceSpans", [])
+                for scope in resource.get("scopeSpans", [])
+            )
+            with lock, open(output_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(request) + "\n")
+            print(f"collector: received {count} spans")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.end_headers()
+            self.wfile.write(b"{}")
+
+        def log_message(self, format, *args):
+            pass
+
+    directory = os.path.dirname(output_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    server = ThreadingHTTPServer((host, port), CollectorHandler)
+    print(f"Collecting OTLP/JSON spans on http://{host}:{port}/v1/traces into {output_path}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def main(argv: list = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    collect = commands.add_parser("collect", help="Run a local OTLP/HTTP (JSON) collector.")
+    collect.add_argument("--host", default="127.0.0.1")
+    collect.add_argument("--port", type=int, default=4318)
+    collect.add_argument("--output", "-o", default="./.adk_spans/otlp_spans.jsonl")
+    args = parser.parse_args(argv)
+    run_collector(args.host, args.port, args.output)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,834 @@
+# agents/transport.py
+"""
+Pluggable message transports, so each agent type can run as a pool of worker
+processes on this host or on others.
+
+By default agents talk through the ADK's in-process routing. An agent with a
+transport attached instead sends every message as an Envelope through the
+transport and serves its own queue: worker agents pull requests and run
+`handle_message`, while the ProjectManagerAgent pulls replies and hands them
+to `receive_message`, keyed by sender and trace. Message content and context
+(including the trace_id and parent span) travel unchanged, so the agents'
+code is the same whichever transport carries it.
+
+Transports:
+    InProcessTransport       asyncio queues in one process (no isolation; for testing)
+    MultiprocessingTransport multiprocessing queues shared with worker processes on this host
+    BrokerTransport          a MessageBroker reached over a Unix socket or TCP, for workers on any host
+
+Every agent type has one queue, and all workers of a type compete for it, so a
+request goes to whichever worker is free. Delivery is at most once: a message
+taken by a worker that dies is lost.
+
+Each worker process has its own LLM governor, so a pool's share of ADK_LLM_RPM
+and ADK_LLM_TPM is split evenly among its processes, and its own event spool
+(a worker-<pid> directory under ADK_EVENT_SPOOL_DIR), since a spool has one writer.
+
+Each serving agent also has a Mailbox of messages it has taken but not yet
+started (see agents/mailbox.py). Bounded by ADK_MAILBOX_CAPACITY, it applies
+the ADK_MAILBOX_POLICY when full: "block" makes an in-process sender wait and
+leaves cross-process messages on the shared queue for other workers, while
+"reject" and "drop_oldest" shed a message and answer its sender at once.
+
+Usage:
+    python -m agents.transport broker --listen unix:///tmp/adk-broker.sock
+    python -m agents.transport worker CodingAgent --broker unix:///tmp/adk-broker.sock --processes 4
+    python main.py --transport broker --broker unix:///tmp/adk-broker.sock --workers CodingAgent=0
+"""
+
+import argparse
+import contextlib
+import importlib
+import json
+import multiprocessing
+import os
+import queue
+import signal
+import struct
+import sys
+from collections import deque
+
+import asyncio
+
+from .mailbox import OVERFLOW_POLICIES, SHED_REPLY_PREFIX, Mailbox
+from .utils import close_agent_events, get_env, log_agent_event
+
+# Agents that can run in worker processes, as module:class relative to this package
+WORKER_AGENTS = {
+    "RequirementsAgent": ".requirements_agent:RequirementsAgent",
+    "CodingAgent": ".coding_agent:CodingAgent",
+}
+TRANSPORTS = ("inprocess", "multiprocessing", "broker")
+
+_FRAME_HEADER = struct.Struct("!I")  # Broker frames are a 4-byte length followed by that much JSON
+
+
+class Envelope:
+    """
+    A message between agents as carried by a transport.
+    """
+
+    __slots__ = ("recipient_id", "sender_id", "content", "context")
+
+    def __init__(self, recipient_id: str, sender_id: str, content: str, context: dict = None):
+        """
+        Initializes the Envelope.
+
+        Args:
+            recipient_id (str): The agent (type) the message is for.
+            sender_id (str): The sending agent.
+            content (str): The message text.
+            context (dict, optional): The message context, carrying the trace_id and span IDs. Defaults to None.
+        """
+        self.recipient_id = recipient_id
+        self.sender_id = sender_id
+        self.content = content
+        self.context = context or {}
+
+    @property
+    def trace_id(self) -> str:
+        return self.context.get("trace_id")
+
+    def to_dict(self) -> dict:
+        return {
+            "recipient_id": self.recipient_id,
+            "sender_id": self.sender_id,
+            "content": self.content,
+            "context": self.context,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Envelope":
+        return cls(data["recipient_id"], data["sender_id"], data["content"], data.get("context"))
+
+
+class Transport:
+    """
+    Base class of the message transports. `receive(agent_id)` takes the next
+    message from the agent's queue; each process should have at most one
+    receiver per agent_id at a time.
+    """
+
+    name = "base"
+
+    async def send(self, envelope: Envelope):
+        raise NotImplementedError
+
+    async def receive(self, agent_id: str) -> Envelope:
+        raise NotImplementedError
+
+    def bind_mailbox(self, agent_id: str, mailbox: Mailbox, on_shed) -> bool:
+        """
+        Delivers the agent's messages straight into `mailbox`, calling the
+        coroutine `on_shed(envelope)` for each message it sheds.
+
+        Returns:
+            bool: False if the transport cannot, and the agent must pull from `receive` instead.
+        """
+        return False
+
+    async def close(self):
+        pass
+
+
+class InProcessTransport(Transport):
+    """
+    One asyncio queue per agent, within a single process.
+    """
+
+    name = "inprocess"
+
+    def __init__(self):
+        self._queues = {}
+        self._mailboxes = {}  # agent_id -> (Mailbox, on_shed), for agents served from a mailbox
+
+    def _queue(self, agent_id: str) -> asyncio.Queue:
+        agent_queue = self._queues.get(agent_id)
+        if agent_queue is None:
+            agent_queue = self._queues[agent_id] = asyncio.Queue()
+        return agent_queue
+
+    def bind_mailbox(self, agent_id: str, mailbox: Mailbox, on_shed) -> bool:
+        self._mailboxes[agent_id] = (mailbox, on_shed)
+        return True
+
+    async def send(self, envelope: Envelope):
+        bound = self._mailboxes.get(envelope.recipient_id)
+        if bound is None:
+            self._queue(envelope.recipient_id).put_nowait(envelope)
+            return
+        mailbox, on_shed = bound
+        shed = await mailbox.put(envelope)  # Waits for room under the "block" policy
+        if shed is not None:
+            await on_shed(shed)
+
+    async def receive(self, agent_id: str) -> Envelope:
+        return await self._queue(agent_id).get()
+
+
+class MultiprocessingTransport(Transport):
+    """
+    One `multiprocessing` queue per agent, shared with worker processes started
+    from this one. The queues are created up front, so every agent that will
+    send or receive must be named when the transport is created; the transport
+    is then passed to the workers as a Process argument.
+    """
+
+    name = "multiprocessing"
+
+    def __init__(self, agent_ids: list, context=None, poll_interval: float = 0.1):
+        """
+        Initializes the MultiprocessingTransport.
+
+        Args:
+            agent_ids (list): Every agent that will have a queue.
+            context (optional): The multiprocessing context. Defaults to the "spawn" context.
+            poll_interval (float, optional): How long a blocked receive waits before checking for
+                                             shutdown, in seconds. Defaults to 0.1.
+        """
+        context = context or multiprocessing.get_context("spawn")
+        self._queues = {agent_id: context.Queue() for agent_id in agent_ids}
+        self.poll_interval = poll_interval
+        self._pending = {}  # agent_id -> in-flight get, kept if the receiver is cancelled
+
+    def __getstate__(self):
+        return {"_queues": self._queues, "poll_interval": self.poll_interval}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state, _pending={})
+
+    def _agent_queue(self, agent_id: str):
+        try:
+            return self._queues[agent_id]
+        except KeyError:
+            raise ValueError(f"No queue for agent '{agent_id}' in this MultiprocessingTransport.") from None
+
+    def _get(self, agent_id: str) -> dict:
+        try:
+            return self._agent_queue(agent_id).get(timeout=self.poll_interval)
+        except queue.Empty:
+            return None
+
+    async def send(self, envelope: Envelope):
+        # Pickling and the pipe write happen in the queue's feeder thread
+        self._agent_queue(envelope.recipient_id).put(envelope.to_dict())
+
+    async def receive(self, agent_id: str) -> Envelope:
+        while True:
+            pending = self._pending.get(agent_id)
+            if pending is None:
+                pending = self._pending[agent_id] = asyncio.ensure_future(asyncio.to_thread(self._get, agent_id))
+            # A cancelled receiver leaves the get running; its message goes to the next receive
+            data = await asyncio.shield(pending)
+            del self._pending[agent_id]
+            if data is not None:
+                return Envelope.from_dict(data)
+
+    async def close(self):
+        for pending in self._pending.values():
+            pending.cancel()
+        self._pending.clear()
+
+
+def parse_address(address: str) -> tuple:
+    """
+    Parses a broker address: "unix:///path/to.sock" (or "unix:/path") or
+    "tcp://host:port" (or "host:port").
+
+    Returns:
+        tuple: ("unix", path) or ("tcp", (host, port)).
+
+    Raises:
+        ValueError: If the address is malformed.
+    """
+    if address.startswith("unix:"):
+        path = address[len("unix:") :]
+        path = path[2:] if path.startswith("//") else path
+        if not path:
+            raise ValueError(f"Broker address '{address}' has no socket path.")
+        return "unix", path
+    if address.startswith("tcp://"):
+        address = address[len("tcp://") :]
+    host, _, port = address.rpartition(":")
+    if not host or not port.isdigit():
+        raise ValueError(f"Invalid broker address '{address}', expected unix:///path or tcp://host:port.")
+    return "tcp", (host, int(port))
+
+
+async def _open_connection(address: str) -> tuple:
+    kind, target = parse_address(address)
+    if kind == "unix":
+        return await asyncio.open_unix_connection(target)
+    return await asyncio.open_connection(*target)
+
+
+def _write_frame(writer: asyncio.StreamWriter, payload: dict):
+    data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    writer.write(_FRAME_HEADER.pack(len(data)) + data)
+
+
+async def _read_frame(reader: asyncio.StreamReader) -> dict:
+    header = await reader.readexactly(_FRAME_HEADER.size)
+    (length,) = _FRAME_HEADER.unpack(header)
+    return json.loads(await reader.readexactly(length))
+
+
+class MessageBroker:
+    """
+    A minimal Redis-like broker: named FIFO queues with push and blocking pop,
+    served over a Unix socket or TCP. A pop is answered as soon as its queue has
+    a message; waiting pops are served in arrival order.
+    """
+
+    def __init__(self, address: str):
+        """
+        Initializes the MessageBroker.
+
+        Args:
+            address (str): Where to listen, e.g. "unix:///tmp/adk-broker.sock" or "tcp://0.0.0.0:7400".
+        """
+        self.address = address
+        self._queues = {}  # name -> deque of messages
+        self._waiters = {}  # name -> deque of writers with an outstanding pop
+        self._server = None
+        self.pushed = 0
+        self.delivered = 0
+
+    async def start(self):
+        kind, target = parse_address(self.address)
+        if kind == "unix":
+            if os.path.exists(target):
+                os.unlink(target)  # A stale socket from an earlier broker
+            self._server = await asyncio.start_unix_server(self._serve_connection, target)
+        else:
+            self._server = await asyncio.start_server(self._serve_connection, *target)
+
+    async def serve_forever(self):
+        if self._server is None:
+            await self.start()
+        await self._server.serve_forever()
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+            kind, target = parse_address(self.address)
+            if kind == "unix" and os.path.exists(target):
+                os.unlink(target)
+
+    def depths(self) -> dict:
+        return {name: len(messages) for name, messages in self._queues.items() if messages}
+
+    def _push(self, name: str, message: dict):
+        self.pushed += 1
+        waiters = self._waiters.get(name)
+        while waiters:
+            writer = waiters.popleft()
+            if not writer.is_closing():
+                _write_frame(writer, {"message": message})
+                self.delivered += 1
+                return
+        self._queues.setdefault(name, deque()).append(message)
+
+    def _pop(self, name: str, writer: asyncio.StreamWriter):
+        messages = self._queues.get(name)
+        if messages:
+            _write_frame(writer, {"message": messages.popleft()})
+            self.delivered += 1
+        else:
+            self._waiters.setdefault(name, deque()).append(writer)
+
+    async def _serve_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                request = await _read_frame(reader)
+                if request["op"] == "push":
+                    self._push(request["queue"], request["message"])
+                elif request["op"] == "pop":
+                    self._pop(request["queue"], writer)
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass  # The client went away
+        finally:
+            for waiters in self._waiters.values():
+                if writer in waiters:
+                    waiters.remove(writer)
+            writer.close()
+
+
+class BrokerTransport(Transport):
+    """
+    A transport through a MessageBroker. Sends share one connection, so messages
+    from one process arrive in the order they were sent; each receiving agent
+    has a connection of its own for its blocking pops. Only the address is
+    pickled, so the transport can be handed to worker processes.
+    """
+
+    name = "broker"
+
+    def __init__(self, address: str):
+        """
+        Initializes the BrokerTransport.
+
+        Args:
+            address (str): The broker address, e.g. "unix:///tmp/adk-broker.sock" or "tcp://broker:7400".
+        """
+        parse_address(address)  # Fail fast on a malformed address
+        self.address = address
+        self._sender = None  # (reader, writer), opened on first send
+        self._send_lock = None
+        self._receivers = {}  # agent_id -> (reader, writer)
+        self._pending = {}  # agent_id -> in-flight pop, kept if the receiver is cancelled
+
+    def __getstate__(self):
+        return {"address": self.address}
+
+    def __setstate__(self, state):
+        self.__init__(state["address"])
+
+    async def send(self, envelope: Envelope):
+        if self._send_lock is None:
+            self._send_lock = asyncio.Lock()
+        async with self._send_lock:
+            if self._sender is None:
+                self._sender = await _open_connection(self.address)
+            writer = self._sender[1]
+            _write_frame(writer, {"op": "push", "queue": envelope.recipient_id, "message": envelope.to_dict()})
+            await writer.drain()
+
+    async def _pop(self, agent_id: str) -> dict:
+        if agent_id not in self._receivers:
+            self._receivers[agent_id] = await _open_connection(self.address)
+        reader, writer = self._receivers[agent_id]
+        _write_frame(writer, {"op": "pop", "queue": agent_id})
+        await writer.drain()
+        return (await _read_frame(reader))["message"]
+
+    async def receive(self, agent_id: str) -> Envelope:
+        pending = self._pending.get(agent_id)
+        if pending is None:
+            pending = self._pending[agent_id] = asyncio.ensure_future(self._pop(agent_id))
+        # A cancelled receiver leaves the pop outstanding; its message goes to the next receive
+        data = await asyncio.shield(pending)
+        del self._pending[agent_id]
+        return Envelope.from_dict(data)
+
+    async def close(self):
+        for pending in self._pending.values():
+            pending.cancel()
+        self._pending.clear()
+        connections = list(self._receivers.values()) + ([self._sender] if self._sender else [])
+        for _, writer in connections:
+            writer.close()
+        self._receivers.clear()
+        self._sender = None
+
+
+def create_transport(kind: str, agent_ids: list = None, address: str = None) -> Transport:
+    """
+    Creates a transport by name.
+
+    Args:
+        kind (str): "inprocess", "multiprocessing" or "broker".
+        agent_ids (list, optional): Every agent that will have a queue (multiprocessing only).
+        address (str, optional): The broker address (broker only). Defaults to ADK_BROKER_ADDRESS.
+
+    Raises:
+        ValueError: If the kind is unknown or the broker has no address.
+    """
+    if kind == "inprocess":
+        return InProcessTransport()
+    if kind == "multiprocessing":
+        return MultiprocessingTransport(agent_ids or [])
+    if kind == "broker":
+        address = address or get_env("ADK_BROKER_ADDRESS")
+        if not address:
+            raise ValueError("The broker transport needs an address (--broker or ADK_BROKER_ADDRESS).")
+        return BrokerTransport(address)
+    raise ValueError(f"Unknown transport '{kind}', expected one of {TRANSPORTS}.")
+
+
+class TransportMixin:
+    """
+    Lets an agent send and receive through a Transport instead of the ADK's
+    in-process routing, once `attach_transport` has been called. Agents that
+    call `receive_message` for replies (`receives_replies = True`) get their
+    inbound messages sorted into per-(sender, trace) mailboxes; every other
+    agent runs `handle_message` for each inbound message, with at most
+    `concurrency` running at once. Inbound requests wait in the agent's
+    Mailbox; an unbounded one only takes a message off a cross-process queue
+    when a handler is free, so a busy worker leaves requests for its peers.
+    """
+
+    receives_replies = False
+    transport = None
+    mailbox = None
+    _reply_queues = None
+
+    def attach_transport(self, transport: Transport, concurrency: int = None, mailbox: Mailbox = None):
+        """
+        Routes this agent's messages through `transport`. Call before `start()`.
+
+        Args:
+            transport (Transport): The transport to use.
+            concurrency (int, optional): Messages handled at once. Defaults to ADK_WORKER_CONCURRENCY, or 16.
+            mailbox (Mailbox, optional): Holds requests waiting for a handler. Defaults to Mailbox.from_env.
+        """
+        self.transport = transport
+        self.concurrency = concurrency or int(get_env("ADK_WORKER_CONCURRENCY", "16"))
+        self._reply_queues = {}  # (sender_id, trace_id) -> asyncio.Queue of replies
+        if not self.receives_replies:
+            self.mailbox = mailbox if mailbox is not None else Mailbox.from_env(self.name)
+
+    async def send_message(self, recipient_id: str, content: str, context: dict):
+        if self.transport is None:
+            return await super().send_message(recipient_id=recipient_id, content=content, context=context)
+        await self.transport.send(Envelope(recipient_id, self.name, content, context))
+
+    async def receive_message(self, sender_id: str, context: dict = None):
+        if self.transport is None:
+            return await super().receive_message(sender_id=sender_id, context=context)
+        key = (sender_id, (context or {}).get("trace_id"))
+        replies = self._reply_queues.get(key)
+        if replies is None:
+            replies = self._reply_queues[key] = asyncio.Queue()
+        try:
+            return await replies.get()
+        finally:
+            if replies.empty() and self._reply_queues.get(key) is replies:
+                del self._reply_queues[key]
+
+    def _deliver_reply(self, envelope: Envelope):
+        key = (envelope.sender_id, envelope.trace_id)
+        replies = self._reply_queues.get(key)
+        if replies is None:
+            replies = self._reply_queues[key] = asyncio.Queue()
+        replies.put_nowait(envelope)
+
+    async def _handle_envelope(self, envelope: Envelope):
+        try:
+            await self.handle_message(envelope.content, envelope.sender_id, envelope.context)
+        except Exception as e:
+            print(f"{self.name}: Error handling message from {envelope.sender_id} (trace {envelope.trace_id}): {e}")
+
+    async def _shed(self, envelope: Envelope):
+        """
+        Logs a message shed by the full mailbox and tells its sender, so the
+        sender's workflow fails now instead of waiting for a reply.
+        """
+        dropped = self.mailbox.policy == "drop_oldest"
+        outcome = "dropped" if dropped else "rejected"
+        reason = f"{self.name} mailbox is full ({self.mailbox.capacity} waiting); request {outcome}."
+        try:
+            await log_agent_event(
+                event_type="MESSAGE_DROPPED" if dropped else "MESSAGE_REJECTED",
+                agent_id=self.name,
+                trace_id=envelope.trace_id or "UNKNOWN_TRACE",
+                message_summary=reason,
+                source_agent_id=envelope.sender_id,
+                status="FAILURE",
+                details={
+                    "mailbox_policy": self.mailbox.policy,
+                    "mailbox_capacity": self.mailbox.capacity,
+                    "mailbox_depth": self.mailbox.depth,
+                },
+            )
+            await self.transport.send(
+                Envelope(envelope.sender_id, self.name, SHED_REPLY_PREFIX + reason, {"trace_id": envelope.trace_id})
+            )
+        except Exception as e:
+            print(f"{self.name}: Error shedding message from {envelope.sender_id} (trace {envelope.trace_id}): {e}")
+
+    async def _pump(self, room: asyncio.Semaphore):
+        """
+        Moves messages from the transport into the mailbox. With `room`, a
+        message is only taken once the mailbox can hold it; without, every
+        message is taken and the overflow policy sheds the excess.
+        """
+        while True:
+            if room is not None:
+                await room.acquire()
+            try:
+                envelope = await self.transport.receive(self.name)
+            except BaseException:
+                if room is not None:
+                    room.release()
+                raise
+            shed = await self.mailbox.put(envelope)
+            if shed is not None:
+                await self._shed(shed)
+
+    def _start_pump(self) -> tuple:
+        """
+        Starts moving messages from the transport into the mailbox, unless the
+        transport delivers into it directly.
+
+        Returns:
+            tuple: (pump task or None, semaphore limiting the messages taken or None,
+                    whether a message frees its room when it starts rather than when it ends).
+        """
+        mailbox = self.mailbox
+        if self.transport.bind_mailbox(self.name, mailbox, self._shed):
+            return None, None, False
+        room, release_room_on_start = None, False
+        if not mailbox.bounded:
+            room = asyncio.Semaphore(self.concurrency)  # Take a message only when a handler is free
+        elif mailbox.policy == "block":
+            room = asyncio.Semaphore(mailbox.capacity)  # Leave the rest on the shared queue
+            release_room_on_start = True
+        return asyncio.create_task(self._pump(room)), room, release_room_on_start
+
+    async def serve(self):
+        """
+        Pulls this agent's messages from the transport until cancelled.
+        """
+        if self.receives_replies:
+            while True:
+                self._deliver_reply(await self.transport.receive(self.name))
+
+        mailbox = self.mailbox
+        slots = asyncio.Semaphore(self.concurrency)
+        pump, room, release_room_on_start = self._start_pump()
+        handlers = set()
+        try:
+            while True:
+                await slots.acquire()
+                envelope, waited = await mailbox.get()
+                if release_room_on_start:
+                    room.release()
+                envelope.context = dict(envelope.context or {})
+                envelope.context["mailbox_wait_ms"] = int(waited * 1000)
+                envelope.context["mailbox_depth"] = mailbox.depth
+                handler = asyncio.create_task(self._handle_envelope(envelope))
+                handlers.add(handler)
+                handler.add_done_callback(handlers.discard)
+                handler.add_done_callback(lambda _: slots.release())
+                if room is not None and not release_room_on_start:
+                    handler.add_done_callback(lambda _: room.release())
+        finally:
+            if pump is not None:
+                pump.cancel()
+            for handler in handlers:
+                handler.cancel()
+
+    async def start(self):
+        if self.transport is None:
+            return await super().start()
+        await self.serve()
+
+
+def create_agent(agent_name: str):
+    """
+    Instantiates one of the WORKER_AGENTS by name.
+    """
+    try:
+        module_name, _, class_name = WORKER_AGENTS[agent_name].partition(":")
+    except KeyError:
+        raise ValueError(f"Unknown worker agent '{agent_name}', expected one of {sorted(WORKER_AGENTS)}.") from None
+    module = importlib.import_module(module_name, __package__)
+    return getattr(module, class_name)(name=agent_name)
+
+
+async def run_agent_worker(
+    agent_name: str,
+    transport: Transport,
+    concurrency: int = None,
+    mailbox_capacity: int = None,
+    mailbox_policy: str = None,
+):
+    """
+    Runs one agent against `transport` until cancelled or sent SIGTERM, then
+    delivers its buffered events. The mailbox settings default to the environment.
+    """
+    agent = create_agent(agent_name)
+    agent.attach_transport(transport, concurrency, Mailbox.from_env(agent_name, mailbox_capacity, mailbox_policy))
+    task = asyncio.create_task(agent.start())
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        # Without signal handlers (on this platform or thread) terminate() stops the process outright
+        with contextlib.suppress(NotImplementedError, RuntimeError):
+            loop.add_signal_handler(signum, task.cancel)
+    print(f"{agent_name} worker {os.getpid()} serving through the {transport.name} transport.")
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
+    finally:
+        await close_agent_events()
+        await transport.close()
+
+
+def _isolate_worker_process(llm_share: float):
+    """
+    Gives a new worker process its own event spool directory and its share of
+    the LLM rate limits, before anything reads them.
+    """
+    spool_dir = get_env("ADK_EVENT_SPOOL_DIR")
+    if spool_dir:
+        os.environ["ADK_EVENT_SPOOL_DIR"] = os.path.join(spool_dir, f"worker-{os.getpid()}")
+    os.environ["ADK_LLM_QUOTA_SHARE"] = repr(llm_share)
+
+
+def _worker_process_main(
+    agent_name: str, transport: Transport, concurrency: int, mailbox_settings: tuple, llm_share: float
+):
+    _isolate_worker_process(llm_share)
+    asyncio.run(run_agent_worker(agent_name, transport, concurrency, *mailbox_settings))
+
+
+class WorkerPool:
+    """
+    Runs an agent type in `processes` worker processes, all serving the agent's
+    queue on a transport that can cross processes.
+    """
+
+    def __init__(
+        self,
+        agent_name: str,
+        transport: Transport,
+        processes: int = 1,
+        concurrency: int = None,
+        mailbox_capacity: int = None,
+        mailbox_policy: str = None,
+        llm_share: float = None,
+    ):
+        """
+        Initializes the WorkerPool.
+
+        Args:
+            agent_name (str): One of WORKER_AGENTS.
+            transport (Transport): A MultiprocessingTransport or BrokerTransport.
+            processes (int, optional): Number of worker processes. Defaults to 1.
+            concurrency (int, optional): Messages each worker handles at once. Defaults to ADK_WORKER_CONCURRENCY.
+            mailbox_capacity (int, optional): Each worker's mailbox capacity. Defaults to ADK_MAILBOX_CAPACITY.
+            mailbox_policy (str, optional): Each worker's overflow policy. Defaults to ADK_MAILBOX_POLICY.
+            llm_share (float, optional): Fraction of ADK_LLM_RPM / ADK_LLM_TPM the whole pool may use,
+                                         split evenly among its processes. Defaults to ADK_LLM_QUOTA_SHARE, or 1.
+        """
+        if agent_name not in WORKER_AGENTS:
+            raise ValueError(f"Unknown worker agent '{agent_name}', expected one of {sorted(WORKER_AGENTS)}.")
+        if isinstance(transport, InProcessTransport):
+            raise ValueError("Worker processes need a multiprocessing or broker transport.")
+        self.agent_name = agent_name
+        self.transport = transport
+        self.processes = processes
+        self.concurrency = concurrency
+        self.mailbox_settings = (mailbox_capacity, mailbox_policy)
+        self.llm_share = llm_share if llm_share is not None else float(get_env("ADK_LLM_QUOTA_SHARE", "1"))
+        self._context = multiprocessing.get_context("spawn")  # Forking a process with a running loop is unsafe
+        self._workers = []
+
+    def start(self):
+        for index in range(self.processes):
+            worker = self._context.Process(
+                target=_worker_process_main,
+                args=(
+                    self.agent_name,
+                    self.transport,
+                    self.concurrency,
+                    self.mailbox_settings,
+                    self.llm_share / max(1, self.processes),
+                ),
+                name=f"{self.agent_name}-{index}",
+                daemon=True,
+            )
+            worker.start()
+            self._workers.append(worker)
+
+    def alive(self) -> int:
+        return sum(1 for worker in self._workers if worker.is_alive())
+
+    def join(self):
+        for worker in self._workers:
+            worker.join()
+
+    def stop(self, timeout: float = 10.0):
+        """
+        Asks every worker to finish (SIGTERM, after which it flushes its events)
+        and kills any that are still running after `timeout` seconds.
+        """
+        for worker in self._workers:
+            if worker.is_alive():
+                worker.terminate()
+        for worker in self._workers:
+            worker.join(timeout)
+            if worker.is_alive():
+                print(f"Worker {worker.name} did not stop within {timeout:g}s; killing it.")
+                worker.kill()
+                worker.join()
+        self._workers.clear()
+
+
+def parse_worker_counts(text: str) -> dict:
+    """
+    Parses "CodingAgent=4,RequirementsAgent=2" into {"CodingAgent": 4, "RequirementsAgent": 2}.
+
+    Raises:
+        ValueError: On a malformed entry or an agent that cannot run as a worker.
+    """
+    counts = {}
+    for entry in filter(None, (part.strip() for part in (text or "").split(","))):
+        agent_name, _, count = entry.partition("=")
+        if agent_name not in WORKER_AGENTS or not count.strip().isdigit():
+            raise ValueError(f"Invalid worker count '{entry}', expected AGENT=N with AGENT in {sorted(WORKER_AGENTS)}.")
+        counts[agent_name] = int(count)
+    return counts
+
+
+def main(argv: list = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    broker = commands.add_parser("broker", help="Run a message broker.")
+    broker.add_argument("--listen", default=get_env("ADK_BROKER_ADDRESS"), help="Defaults to ADK_BROKER_ADDRESS.")
+
+    worker = commands.add_parser("worker", help="Run a pool of agent workers against a broker.")
+    worker.add_argument("agent", choices=sorted(WORKER_AGENTS))
+    worker.add_argument("--broker", default=get_env("ADK_BROKER_ADDRESS"), help="Defaults to ADK_BROKER_ADDRESS.")
+    worker.add_argument("--processes", type=int, default=1, help="Worker processes. Defaults to 1.")
+    worker.add_argument("--concurrency", type=int, help="Messages each worker handles at once.")
+    worker.add_argument(
+        "--mailbox-capacity", type=int, help="Requests each worker holds. Defaults to ADK_MAILBOX_CAPACITY."
+    )
+    worker.add_argument(
+        "--mailbox-policy", choices=OVERFLOW_POLICIES, help="What a full mailbox does. Defaults to ADK_MAILBOX_POLICY."
+    )
+    worker.add_argument(
+        "--llm-share",
+        type=float,
+        help="Fraction of ADK_LLM_RPM / ADK_LLM_TPM this pool may use, split among its processes. "
+        "Defaults to ADK_LLM_QUOTA_SHARE, or 1.",
+    )
+
+    args = parser.parse_args(argv)
+    if args.command == "broker":
+        if not args.listen:
+            parser.error("broker needs --listen or ADK_BROKER_ADDRESS")
+        message_broker = MessageBroker(args.listen)
+        print(f"Message broker listening on {args.listen}.")
+        with contextlib.suppress(KeyboardInterrupt):
+            asyncio.run(message_broker.serve_forever())
+        return 0
+
+    if not args.broker:
+        parser.error("worker needs --broker or ADK_BROKER_ADDRESS")
+    pool = WorkerPool(
+        args.agent,
+        BrokerTransport(args.broker),
+        args.processes,
+        args.concurrency,
+        args.mailbox_capacity,
+        args.mailbox_policy,
+        args.llm_share,
+    )
+    pool.start()
+    try:
+        pool.join()
+    except KeyboardInterrupt:
+        pool.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
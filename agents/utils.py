@@ -1,36 +1,251 @@
-import datetime
 import os
+import subprocess
 
-import uuid
-from dotenv import load_dotenv
-from google import genai
-from google.cloud import bigquery
+from .blob_store import BlobStore, LocalBlobStore, externalize_details, resolve_details
+from .event_backends import BigQueryBackend, EventBackend, create_event_backend
+from .event_sink import BatchingEventSink
+from .event_spool import EventSpool, SpooledEventSink, SpoolReplayer
+from .events import AgentEvent, dumps_json, loads_details
+from .metrics import EVENT_ERRORS, EVENTS_EMITTED
+from .tracing import current_span, flush_spans
+
+# Nothing in this module talks to the network or the filesystem at import time.
+# The environment file, the project lookup, the cloud clients and the model handle
+# are all resolved on first use, so importing the agents stays cheap and works offline.
+
+# --- BigQuery configuration ---
+BIGQUERY_DATASET = "adk_traces"
+BIGQUERY_TABLE = "agent_events"
+
+LLM_MODEL_NAME = "gemini-2.0-pro"
+
+_env_loaded = False
+_project_id = None
+_genai_client = None
+_llm_model = None
+_event_backend = None  # Created on first use
+_event_sink = None  # Created on first use, inside the running event loop
+_blob_store = None  # Created on first use; False when disabled
+
+
+def load_environment():
+    """
+    Loads environment variables from .env.local, once.
+    """
+    global _env_loaded
+    if not _env_loaded:
+        from dotenv import load_dotenv
+
+        load_dotenv(dotenv_path="./.env.local")
+        _env_loaded = True
+
+
+def get_env(name: str, default: str = None) -> str:
+    """
+    Returns an environment variable, loading .env.local first.
+    """
+    load_environment()
+    return os.environ.get(name, default)
 
-# Load environment variables from .env.local
-load_dotenv(dotenv_path="./.env.local")
 
 # --- Configuration from environment variables ---
-PROJECT_ID = os.environ.get("GOOGLE_CLOUD_PROJECT")
-if not PROJECT_ID:
-    # Fallback to gcloud config if .env.local is not set or is not primary, else raise Error
-    PROJECT_ID = os.popen("gcloud config get-value project").read().strip()
-    if not PROJECT_ID:
-        raise ValueError(
-            "GOOGLE_CLOUD_PROJECT environment variable is not set and gcloud project config is not found."
-        )
+def get_project_id() -> str:
+    """
+    Returns the Google Cloud project ID, looked up once.
+
+    Raises:
+        ValueError: If neither GOOGLE_CLOUD_PROJECT nor the gcloud config provides a project.
+    """
+    global _project_id
+    if _project_id is None:
+        project_id = get_env("GOOGLE_CLOUD_PROJECT")
+        if not project_id:
+            # Fallback to gcloud config if .env.local is not set or is not primary, else raise Error
+            try:
+                project_id = subprocess.run(
+                    ["gcloud", "config", "get-value", "project"], capture_output=True, text=True, check=False
+                ).stdout.strip()
+            except OSError:
+                project_id = None
+            if not project_id:
+                raise ValueError(
+                    "GOOGLE_CLOUD_PROJECT environment variable is not set and gcloud project config is not found."
+                )
+        _project_id = project_id
+    return _project_id
 
-LOCATION = os.environ.get("GOOGLE_CLOUD_LOCATION", "us-central1")
 
-# Ensure Vertex AI is used for GenAI
-os.environ["GOOGLE_GENAI_USE_VERTEXAI"] = "TRUE"
+def get_location() -> str:
+    return get_env("GOOGLE_CLOUD_LOCATION", "us-central1")
 
-# --- BigQuery configuration ---
-BIGQUERY_DATASET = "adk_traces"
-BIGQUERY_TABLE = "agent_events"
 
-# --- Initialize BigQuery client ---
-bq_client = bigquery.Client(project=PROJECT_ID)
-table_ref = bq_client.dataset(BIGQUERY_DATASET).table(BIGQUERY_TABLE)
+def event_backend_name() -> str:
+    """
+    Returns the name of the event backend in use, or of the one ADK_EVENT_BACKEND
+    selects if none was created yet, without creating it (which may need GCP access).
+    """
+    if _event_backend is not None:
+        return _event_backend.name
+    # "bigquery" (default), "sqlite" or "jsonl". The local backends need no GCP access.
+    return get_env("ADK_EVENT_BACKEND", "bigquery").lower()
+
+
+def get_event_backend() -> EventBackend:
+    """
+    Returns the process-wide event backend selected by ADK_EVENT_BACKEND,
+    creating it on first use.
+    """
+    global _event_backend
+    if _event_backend is None:
+        kind = event_backend_name()
+        if kind == BigQueryBackend.name:
+            _event_backend = BigQueryBackend(get_project_id(), BIGQUERY_DATASET, BIGQUERY_TABLE)
+        elif kind == "sqlite":
+            path = get_env("ADK_EVENT_SQLITE_PATH", "./.adk_events/agent_events.sqlite3")
+            _event_backend = create_event_backend(kind, path=path)
+        else:
+            path = get_env("ADK_EVENT_JSONL_PATH", "./.adk_events/agent_events.jsonl")
+            _event_backend = create_event_backend(kind, path=path)
+    return _event_backend
+
+
+def set_event_backend(backend: EventBackend):
+    """
+    Replaces the event backend, e.g. with a local or fake backend for tests and
+    benchmarks. Must be called before the first event is logged.
+    """
+    global _event_backend
+    _event_backend = backend
+
+
+def _externalize_rows(rows: list) -> list:
+    """
+    Returns `rows` with every details string of ADK_BLOB_THRESHOLD characters or
+    more moved to the blob store. Rows that need no change are passed through.
+    """
+    store = get_blob_store()
+    if store is None:
+        return rows
+    threshold = int(get_env("ADK_BLOB_THRESHOLD", "1024"))
+    externalized = []
+    for row in rows:
+        details = row.get("details")
+        if details and len(details) >= threshold:  # Shorter JSON cannot hold a value this long
+            details = externalize_details(loads_details(details), store, threshold)
+            row = dict(row, details=dumps_json(details))  # The sink may retry with the original rows
+        externalized.append(row)
+    return externalized
+
+
+def _insert_rows(rows: list, row_ids: list) -> list:
+    """
+    Writes a batch of rows to the configured event backend. The event sinks call
+    this from a worker thread, so large payloads are compressed and written to
+    the blob store here rather than on the event loop.
+    """
+    return get_event_backend().insert_rows(_externalize_rows(rows), row_ids)
+
+
+def get_event_sink():
+    """
+    Returns the process-wide event sink, creating it on first use. This is a
+    SpooledEventSink when ADK_EVENT_SPOOL_DIR is set, else a BatchingEventSink.
+    """
+    global _event_sink
+    if _event_sink is None:
+        batch_size = int(get_env("ADK_EVENT_BATCH_SIZE", "500"))
+        flush_interval = float(get_env("ADK_EVENT_FLUSH_INTERVAL", "1.0"))
+        # Setting a spool directory makes every event land in a local append-only log
+        # first; a background replayer then drains it to the backend in bulk.
+        spool_dir = get_env("ADK_EVENT_SPOOL_DIR")
+        if spool_dir:
+            spool = EventSpool(
+                spool_dir,
+                segment_max_bytes=int(get_env("ADK_EVENT_SPOOL_SEGMENT_BYTES", str(16 * 1024 * 1024))),
+                max_spool_bytes=int(get_env("ADK_EVENT_SPOOL_MAX_BYTES", str(1024 * 1024 * 1024))),
+                fsync=get_env("ADK_EVENT_SPOOL_FSYNC", "interval"),  # always | interval | never
+            )
+            _event_sink = SpooledEventSink(
+                spool,
+                SpoolReplayer(spool, _insert_rows, batch_size=batch_size),
+                replay_interval=flush_interval,
+                backpressure_timeout=float(get_env("ADK_EVENT_SPOOL_BACKPRESSURE_TIMEOUT", "30.0")),
+            )
+        else:
+            _event_sink = BatchingEventSink(
+                _insert_rows,
+                max_batch_size=batch_size,
+                flush_interval=flush_interval,
+                max_queue_size=int(get_env("ADK_EVENT_QUEUE_SIZE", "10000")),
+            )
+    return _event_sink
+
+
+def set_event_sink(sink):
+    """
+    Replaces the event sink, e.g. with one writing to a simulated warehouse.
+    Must be called before the first event is logged.
+    """
+    global _event_sink
+    _event_sink = sink
+
+
+async def flush_agent_events():
+    """
+    Waits until every event logged so far has been delivered.
+    """
+    if _event_sink is not None:
+        await _event_sink.flush()
+
+
+async def close_agent_events():
+    """
+    Flushes pending events and exported spans and shuts down the event sink.
+    Call once on shutdown.
+    """
+    global _event_sink, _event_backend
+    await flush_spans()
+    if _event_sink is not None:
+        await _event_sink.close()
+        _event_sink = None
+    if _event_backend is not None:
+        _event_backend.close()
+        _event_backend = None
+
+
+# --- Blob store for large event payloads ---
+def get_blob_store() -> BlobStore:
+    """
+    Returns the blob store large event details are moved to, or None unless
+    ADK_BLOB_STORE=1. Rows keep only references to externalized payloads, so
+    ADK_BLOB_DIR must be durable storage: on an ephemeral disk (e.g. Cloud Run)
+    the payloads would be lost.
+    """
+    global _blob_store
+    if _blob_store is None:
+        if get_env("ADK_BLOB_STORE", "0") == "1":
+            _blob_store = LocalBlobStore(get_env("ADK_BLOB_DIR", "./.adk_blobs"))
+        else:
+            _blob_store = False
+    return _blob_store or None
+
+
+def set_blob_store(store: BlobStore):
+    """
+    Replaces the blob store, e.g. with an InMemoryBlobStore. Pass None to keep
+    every payload inline.
+    """
+    global _blob_store
+    _blob_store = store if store is not None else False
+
+
+def resolve_event_details(details: dict) -> dict:
+    """
+    Returns event details with every blob reference replaced by its full text,
+    for the debugger.
+    """
+    store = get_blob_store()
+    return resolve_details(details, store) if store is not None else details
 
 
 # --- Logging Utility Function ---
@@ -44,9 +259,14 @@ async def log_agent_event(
     duration_ms: int = None,
     status: str = None,
     details: dict = None,
+    span_id: str = None,
+    parent_span_id: str = None,
 ):
     """
-    Logs an event to the BigQuery agent_events table.
+    Logs an event to the agent_events table of the configured event backend.
+
+    The event is queued on the background event sink and written in batches, so
+    this call does not wait for a BigQuery round trip.
 
     Args:
         event_type (str): The type of the event (e.g., "AGENT_START", "MESSAGE_SEND", "TASK_COMPLETE", "ERROR").
@@ -58,53 +278,113 @@ async def log_agent_event(
         duration_ms (int, optional): The duration of an operation in milliseconds. Defaults to None.
         status (str, optional): The status of a event or task (e.g. "SUCCESS", "FAILURE"). Defaults to None.
         details (dict, optional): A dictionary of additional structured details for the event. Defaults to None.
+                                  With a blob store, string values of ADK_BLOB_THRESHOLD characters or more
+                                  are stored once in it when the row is shipped, and replaced by their
+                                  digest and length.
+        span_id (str, optional): The span the event belongs to. Defaults to the current span of this trace.
+        parent_span_id (str, optional): The parent of that span. Defaults to the current span's parent.
     """
+    if span_id is None:
+        active = current_span()
+        if active is not None and active.trace_id == trace_id:
+            span_id, parent_span_id = active.span_id, active.parent_span_id
+
+    event = AgentEvent(
+        event_type=event_type,
+        agent_id=agent_id,
+        trace_id=trace_id,
+        message_summary=message_summary,
+        source_agent_id=source_agent_id,
+        target_agent_id=target_agent_id,
+        duration_ms=duration_ms,
+        status=status,
+        details=details,
+        span_id=span_id,
+        parent_span_id=parent_span_id,
+    )
 
-    event_data = {
-        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
-        "trace_id": trace_id,
-        "event_id": str(uuid.uuid4()),
-        "agent_id": agent_id,
-        "event_type": event_type,
-        "message_summary": message_summary,
-        "source_agent_id": source_agent_id,
-        "target_agent_id": target_agent_id,
-        "duration_ms": duration_ms,
-        "status": status,
-        "details": (
-            str(details) if details else None
-        ),  # Store dict as string for BigQuery STRING type
-    }
-
-    try:
-        errors = bq_client.insert_rows_json(table_ref, [event_data])
-        if errors:
-            print(f"BigQuery insert errors for {agent_id} ({event_type}): {errors}")
-            # Optionally raise an exception or handle more robustly
-        # else:
-        #     print(f"Logged event from {agent_id}: {event_type} - {message_summary}")
-    except Exception as e:
-        print(f"CRITICAL ERROR logging to BigQuery for {agent_id} ({event_type}): {e}")
-        # * FUTURE: Preferably use a robust error handling mechanism in production.
+    EVENTS_EMITTED.labels(event_type).inc()
+    if status == "FAILURE" or event_type == "ERROR":
+        EVENT_ERRORS.labels(event_type).inc()
+
+    await get_event_sink().submit(event.to_row())
 
 
 # --- LLM Instance Initialization ---
-# Initialize the GenAI client, specifying Vertex AI usage with project and location
-# This client abstracts the model interaction
-try:
-    # Use Vertex AI specific client initialization
-    genai_client = genai.Client(project=PROJECT_ID, location=LOCATION, vertexai=True)
+def get_genai_client():
+    """
+    Returns the GenAI client, specifying Vertex AI usage with project and location.
+    Created on first use.
+    """
+    global _genai_client
+    if _genai_client is None:
+        from google import genai
 
-    # Get the GenerativeModel instance via the client's model attribute
-    llm_model = genai_client.models.get("gemini-2.0-pro")
+        # Ensure Vertex AI is used for GenAI
+        os.environ["GOOGLE_GENAI_USE_VERTEXAI"] = "TRUE"
+        _genai_client = genai.Client(project=get_project_id(), location=get_location(), vertexai=True)
+    return _genai_client
+
+
+def get_llm_model():
+    """
+    Returns the shared GenerativeModel instance, fetched on first use.
+
+    Raises:
+        RuntimeError: If the GenAI client or model could not be initialized.
+    """
+    global _llm_model
+    if _llm_model is None:
+        try:
+            # Get the GenerativeModel instance via the client's model attribute
+            _llm_model = get_genai_client().models.get(LLM_MODEL_NAME)
+            print(f"LLM initialized. Project: {get_project_id()}, Location: {get_location()}, LLM: {_llm_model.name}")
+        except Exception as e:
+            print(f"Error: Could not initialize google-genai client or model: {e}")
+            print(
+                "Ensure GOOGLE_CLOUD_PROJECT and GOOGLE_CLOUD_LOCATION are correctly set, and that the service account used has 'Vertex AI User' role."
+            )
+            raise RuntimeError(f"LLM model '{LLM_MODEL_NAME}' is unavailable: {e}") from e
+    return _llm_model
+
+
+def set_llm_model(model):
+    """
+    Replaces the shared model handle behind `llm_model`, e.g. with a fake for
+    benchmarks. Agents constructed earlier pick it up on their next call.
+    """
+    global _llm_model
+    _llm_model = model
+
+
+class LazyLLMModel:
+    """
+    A stand-in for the shared GenerativeModel that resolves it on first attribute
+    access, so agents can be constructed without any network calls. Failures
+    surface as exceptions from the model call, which the agents already handle.
+    """
+
+    def __init__(self, model_name: str):
+        self.model_name = model_name
+
+    def __getattr__(self, attr: str):
+        return getattr(get_llm_model(), attr)
+
+    def __repr__(self):
+        state = "resolved" if _llm_model is not None else "unresolved"
+        return f"<LazyLLMModel {self.model_name} ({state})>"
+
+
+# Shared by all agents; the real model handle is fetched on the first call.
+llm_model = LazyLLMModel(LLM_MODEL_NAME)
 
-    print(
-        f"Utils loaded. Project: {PROJECT_ID}, Location: {LOCATION}, LLM: {llm_model.name}"
-    )
-except Exception as e:
-    print(f"Error: Could not initialize google-genai client or model: {e}")
-    print(
-        "Ensure GOOGLE_CLOUD_PROJECT and GOOGLE_CLOUD_LOCATION are correctly set, and that the service account used has 'Vertex AI User' role."
-    )
 
-    llm_model = None  # Set to None so agents will fail gracefully or be handled
+def __getattr__(name: str):
+    # Lazily computed module attributes kept for backwards compatibility
+    if name == "PROJECT_ID":
+        return get_project_id()
+    if name == "LOCATION":
+        return get_location()
+    if name == "genai_client":
+        return get_genai_client()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,318 @@
+# agents/workflow.py
+
+import time
+from collections import deque
+
+import asyncio
+
+from .metrics import STAGE_LATENCY
+
+# Prefix of the final message of a streamed reply. The rest of that message is
+# the complete, authoritative text; the chunks before it are progressive output.
+STREAM_END_MARKER = "\x00END_OF_STREAM\x00"
+
+
+class WorkflowState:
+    """
+    The state of a single SDLC workflow run by the ProjectManagerAgent, keyed by
+    its trace_id. Each concurrent workflow gets its own instance, so overlapping
+    requests never share a trace.
+    """
+
+    __slots__ = (
+        "trace_id",
+        "request_text",
+        "sender_id",
+        "started_at",
+        "started_ns",
+        "stage_timings",
+        "requirements_text",
+        "generated_code",
+        "status",
+        "tenant",
+        "priority",
+        "queue_wait_ms",
+    )
+
+    def __init__(self, trace_id: str, request_text: str, sender_id: str):
+        """
+        Initializes the WorkflowState.
+
+        Args:
+            trace_id (str): The unique ID of the workflow.
+            request_text (str): The initial high-level request.
+            sender_id (str): The ID of the entity that submitted the request.
+        """
+        self.trace_id = trace_id
+        self.request_text = request_text
+        self.sender_id = sender_id
+        self.started_at = time.time()
+        self.started_ns = time.perf_counter_ns()  # Monotonic, for durations
+        self.stage_timings = {}  # Stage name -> duration in milliseconds
+        self.requirements_text = None
+        self.generated_code = None
+        self.status = "RUNNING"  # "QUEUED" while waiting for a scheduler slot
+        self.tenant = None
+        self.priority = None
+        self.queue_wait_ms = None  # Time spent waiting for a scheduler slot
+
+    def record_stage(self, stage: str, duration_ms: float) -> int:
+        """
+        Records how long a stage took and returns the duration in whole milliseconds.
+        """
+        STAGE_LATENCY.labels(stage).observe(duration_ms / 1000)
+        self.stage_timings[stage] = int(duration_ms)
+        return self.stage_timings[stage]
+
+
+class WorkflowRegistry:
+    """
+    A trace-keyed registry of the workflows currently in flight. Finished
+    workflows are evicted so the registry only grows with concurrency.
+    """
+
+    def __init__(self):
+        self._workflows = {}
+
+    def start(self, trace_id: str, request_text: str, sender_id: str) -> WorkflowState:
+        """
+        Registers a new workflow.
+
+        Raises:
+            ValueError: If a workflow with the same trace_id is already running.
+        """
+        if trace_id in self._workflows:
+            raise ValueError(f"Workflow {trace_id} is already running.")
+        state = WorkflowState(trace_id, request_text, sender_id)
+        self._workflows[trace_id] = state
+        return state
+
+    def get(self, trace_id: str) -> WorkflowState:
+        return self._workflows.get(trace_id)
+
+    def evict(self, trace_id: str) -> WorkflowState:
+        return self._workflows.pop(trace_id, None)
+
+    def active_trace_ids(self) -> list:
+        return list(self._workflows)
+
+    def __len__(self):
+        return len(self._workflows)
+
+    def __contains__(self, trace_id: str):
+        return trace_id in self._workflows
+
+
+def unpack_reply(reply, default_trace_id: str) -> tuple:
+    """
+    Extracts the text and trace_id of a reply from `receive_message`, which may be
+    a plain string or a message object with `content` and `context`.
+
+    Returns:
+        tuple: (text, trace_id). Falls back to `default_trace_id` when the reply
+               carries no trace information.
+    """
+    if isinstance(reply, str):
+        return reply, default_trace_id
+    content = getattr(reply, "content", reply)
+    text = getattr(content, "text", content)
+    context = getattr(reply, "context", None) or {}
+    return text, context.get("trace_id", default_trace_id)
+
+
+class ReplyDemultiplexer:
+    """
+    Routes replies to the workflow they belong to.
+
+    Several workflows may be waiting on the same sender at the same time. Each
+    waiter pulls replies through `receive`; a reply that belongs to another trace
+    is handed to that trace's waiter (or parked until it starts waiting) instead
+    of being consumed by the wrong workflow. Replies to traces that are no longer
+    (or never were) in flight are dropped rather than parked forever.
+    """
+
+    def __init__(self, receive, is_active=None):
+        """
+        Initializes the ReplyDemultiplexer.
+
+        Args:
+            receive (callable): Coroutine function `receive(sender_id, trace_id)` returning the
+                                next reply from `sender_id`, e.g. a wrapper around `receive_message`.
+            is_active (callable, optional): `is_active(trace_id)` tells whether a trace is still in
+                                            flight. Defaults to None, which parks every reply.
+        """
+        self._receive = receive
+        self._is_active = is_active
+        self._waiters = {}  # (sender_id, trace_id) -> Future
+        self._parked = {}  # (sender_id, trace_id) -> deque of texts received before anyone waited
+
+    def _route(self, sender_id: str, trace_id: str, text: str):
+        key = (sender_id, trace_id)
+        waiter = self._waiters.get(key)
+        if waiter is not None and not waiter.done():
+            waiter.set_result(text)
+        elif self._is_active is not None and not self._is_active(trace_id):
+            # A late reply (e.g. after a timeout) or one for an unknown trace: nobody will wait for it
+            print(f"Dropping a reply from {sender_id} for inactive trace {trace_id}.")
+        else:
+            self._parked.setdefault(key, deque()).append(text)
+
+    async def wait_for(self, sender_id: str, trace_id: str) -> str:
+        """
+        Waits for the reply from `sender_id` that belongs to `trace_id`.
+
+        Returns:
+            str: The reply text.
+        """
+        key = (sender_id, trace_id)
+        parked = self._parked.get(key)
+        if parked:
+            text = parked.popleft()
+            if not parked:
+                del self._parked[key]
+            return text
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters[key] = waiter
+        try:
+            while not waiter.done():
+                receiving = asyncio.ensure_future(self._receive(sender_id, trace_id))
+                done, _ = await asyncio.wait({waiter, receiving}, return_when=asyncio.FIRST_COMPLETED)
+                if receiving in done:
+                    text, reply_trace_id = unpack_reply(receiving.result(), trace_id)
+                    self._route(sender_id, reply_trace_id, text)
+                else:
+                    # Another waiter received our reply for us
+                    receiving.cancel()
+            return waiter.result()
+        finally:
+            self._waiters.pop(key, None)
+
+    def discard(self, trace_id: str):
+        """
+        Drops any parked replies of a finished trace.
+        """
+        for key in [key for key in self._parked if key[1] == trace_id]:
+            del self._parked[key]
+
+
+def _fail_future(future: asyncio.Future, exc: BaseException):
+    if future.done():
+        return
+    if isinstance(exc, asyncio.CancelledError):
+        future.cancel()
+    else:
+        future.set_exception(exc)
+        future.exception()  # Mark as retrieved; callers that care still see it when awaiting
+
+
+class WorkflowHandle:
+    """
+    An awaitable handle to a workflow submitted to the ProjectManagerAgent.
+
+    Callers can wait on individual stages (`requirements_ready`, `code_ready`)
+    or on the whole workflow (`await handle` or `handle.finished`), so they only
+    wait as long as the real work takes.
+    """
+
+    def __init__(self, state: WorkflowState):
+        """
+        Initializes the WorkflowHandle.
+
+        Args:
+            state (WorkflowState): The state of the workflow this handle tracks.
+        """
+        loop = asyncio.get_running_loop()
+        self.state = state
+        self.requirements_ready = loop.create_future()  # Resolves to the requirements text
+        self.code_ready = loop.create_future()  # Resolves to the generated code
+        self.finished = loop.create_future()  # Resolves to the final WorkflowState
+        self.task = None
+        self._code_chunks = asyncio.Queue()  # Streamed code chunks; None marks the end
+        self._streamed = False
+
+    @property
+    def trace_id(self) -> str:
+        return self.state.trace_id
+
+    def done(self) -> bool:
+        return self.finished.done()
+
+    def cancel(self):
+        if self.task is not None:
+            self.task.cancel()
+
+    def set_requirements(self, requirements_text: str):
+        if not self.requirements_ready.done():
+            self.requirements_ready.set_result(requirements_text)
+
+    def add_code_chunk(self, chunk: str):
+        self._streamed = True
+        self._code_chunks.put_nowait(chunk)
+
+    def set_code(self, generated_code: str):
+        if not self.code_ready.done():
+            if not self._streamed:
+                self._code_chunks.put_nowait(generated_code)
+            self._code_chunks.put_nowait(None)
+            self.code_ready.set_result(generated_code)
+
+    async def code_chunks(self):
+        """
+        Yields the generated code as it is produced: chunk by chunk when the
+        CodingAgent streams, otherwise once as a whole. Stops early if the
+        workflow fails.
+        """
+        while True:
+            chunk = await self._code_chunks.get()
+            if chunk is None:
+                return
+            yield chunk
+
+    def set_finished(self):
+        if not self.finished.done():
+            self.finished.set_result(self.state)
+
+    def set_failed(self, exc: BaseException):
+        """
+        Fails every stage that has not completed yet.
+        """
+        if not self.code_ready.done():
+            self._code_chunks.put_nowait(None)
+        for future in (self.requirements_ready, self.code_ready, self.finished):
+            _fail_future(future, exc)
+
+    def __await__(self):
+        return self.finished.__await__()
+
+
+class ReadinessMixin:
+    """
+    Gives an agent a readiness signal that is set when its `start()` runs, so
+    callers can wait for agents to be listening instead of sleeping.
+    """
+
+    _ready_event = None
+
+    @property
+    def ready(self) -> asyncio.Event:
+        if self._ready_event is None:
+            self._ready_event = asyncio.Event()
+        return self._ready_event
+
+    def mark_ready(self):
+        self.ready.set()
+
+    async def wait_ready(self, timeout: float = None):
+        """
+        Waits until the agent has started.
+
+        Args:
+            timeout (float, optional): Seconds to wait before raising asyncio.TimeoutError. Defaults to None.
+        """
+        await asyncio.wait_for(self.ready.wait(), timeout)
+
+    async def start(self):
+        # The agent is ready to receive as soon as it enters its listening loop
+        self.mark_ready()
+        return await super().start()
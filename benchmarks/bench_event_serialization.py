@@ -0,0 +1,139 @@
+# benchmarks/bench_event_serialization.py
+"""
+Event serialization benchmark: compares building and JSON-encoding event rows
+the old way (a fresh dict per event with `str(details)`) against `AgentEvent`
+with JSON-encoded details. Reports the time per event and the memory held per
+in-memory record.
+
+Usage:
+    python -m benchmarks.bench_event_serialization
+    python -m benchmarks.bench_event_serialization --events 50000 --repeat 5
+"""
+
+import argparse
+import datetime
+import json
+import statistics
+import sys
+import time
+import tracemalloc
+
+import uuid
+
+from agents.events import JSON_ENCODER, AgentEvent
+
+SAMPLE_DETAILS = {
+    "llm_prompt_length": 1834,
+    "llm_response_length": 2210,
+    "llm_source": "model",
+    "llm_queue_wait_ms": 12.5,
+    "stage_timings_ms": {"requirements": 812, "coding": 2411},
+    "error": None,
+}
+
+
+def legacy_row(index: int) -> dict:
+    """
+    Builds a row the way `log_agent_event` did before `AgentEvent`.
+    """
+    return {
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "trace_id": "trace-benchmark",
+        "event_id": str(uuid.uuid4()),
+        "agent_id": "CodingAgent",
+        "event_type": "LLM_CALL_COMPLETE",
+        "message_summary": f"LLM call {index} complete",
+        "source_agent_id": None,
+        "target_agent_id": None,
+        "duration_ms": index % 5000,
+        "status": "SUCCESS",
+        "details": str(SAMPLE_DETAILS),
+    }
+
+
+def event_row(index: int) -> dict:
+    return AgentEvent(
+        event_type="LLM_CALL_COMPLETE",
+        agent_id="CodingAgent",
+        trace_id="trace-benchmark",
+        message_summary=f"LLM call {index} complete",
+        duration_ms=index % 5000,
+        status="SUCCESS",
+        details=SAMPLE_DETAILS,
+    ).to_row()
+
+
+def time_per_event(build, events: int, repeat: int) -> float:
+    """
+    Returns the median time in microseconds to build and encode one row (as the
+    sinks and `insert_rows_json` do).
+    """
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for index in range(events):
+            json.dumps(build(index), default=str)
+        samples.append((time.perf_counter() - start) * 1e6 / events)
+    return statistics.median(samples)
+
+
+def retained_bytes_per_event(factory, events: int) -> float:
+    """
+    Returns the memory retained per object when `events` objects are kept alive.
+    """
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    kept = [factory(index) for index in range(events)]
+    used = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+    del kept
+    return used / events
+
+
+def make_dict(index: int) -> dict:
+    return {
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "trace_id": "trace-benchmark",
+        "event_id": str(uuid.uuid4()),
+        "agent_id": "CodingAgent",
+        "event_type": "LLM_CALL_COMPLETE",
+        "message_summary": f"LLM call {index} complete",
+        "source_agent_id": None,
+        "target_agent_id": None,
+        "duration_ms": index % 5000,
+        "status": "SUCCESS",
+        "details": SAMPLE_DETAILS,
+    }
+
+
+def make_event(index: int) -> AgentEvent:
+    return AgentEvent(
+        event_type="LLM_CALL_COMPLETE",
+        agent_id="CodingAgent",
+        trace_id="trace-benchmark",
+        message_summary=f"LLM call {index} complete",
+        duration_ms=index % 5000,
+        status="SUCCESS",
+        details=SAMPLE_DETAILS,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=20000, help="Events per run.")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per variant.")
+    args = parser.parse_args()
+
+    print(f"Python {sys.version.split()[0]}, details encoder: {JSON_ENCODER}")
+    legacy_us = time_per_event(legacy_row, args.events, args.repeat)
+    event_us = time_per_event(event_row, args.events, args.repeat)
+    print(f"dict + str(details):   {legacy_us:.2f}us per event")
+    print(f"AgentEvent + JSON:     {event_us:.2f}us per event ({legacy_us / event_us:.2f}x)")
+
+    dict_bytes = retained_bytes_per_event(make_dict, args.events)
+    event_bytes = retained_bytes_per_event(make_event, args.events)
+    print(f"memory per in-memory record: dict {dict_bytes:.0f}B, AgentEvent {event_bytes:.0f}B")
+
+
+if __name__ == "__main__":
+    main()
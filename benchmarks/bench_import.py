@@ -0,0 +1,102 @@
+# benchmarks/bench_import.py
+"""
+Startup benchmark: measures how long `import agents.coding_agent` takes in a
+fresh interpreter, optionally side by side with another git revision, and
+enforces an import-time budget.
+
+Usage:
+    python -m benchmarks.bench_import
+    python -m benchmarks.bench_import --compare-ref HEAD~1 --budget-ms 1500
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tarfile
+import tempfile
+
+IMPORT_SNIPPET = (
+    "import time; start = time.perf_counter(); import {module}; "
+    "print((time.perf_counter() - start) * 1000)"
+)
+
+
+def measure_import(tree: str, module: str, runs: int) -> list:
+    """
+    Imports `module` from `tree` in `runs` fresh interpreters.
+
+    Returns:
+        list: Import times in milliseconds. Runs that failed to import are skipped.
+    """
+    timings = []
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, "-c", IMPORT_SNIPPET.format(module=module)],
+            cwd=tree,
+            capture_output=True,
+            text=True,
+        )
+        if result.returncode != 0:
+            print(f"  import failed in {tree}: {result.stderr.strip().splitlines()[-1:]}")
+            continue
+        timings.append(float(result.stdout.strip().splitlines()[-1]))
+    return timings
+
+
+def export_revision(ref: str, destination: str):
+    """
+    Extracts the tree of git revision `ref` into `destination`.
+    """
+    archive = os.path.join(destination, "tree.tar")
+    subprocess.run(["git", "archive", "--format=tar", "-o", archive, ref], check=True)
+    with tarfile.open(archive) as tar:
+        if hasattr(tarfile, "data_filter"):
+            tar.extractall(destination, filter="data")
+        else:
+            tar.extractall(destination)
+    os.remove(archive)
+
+
+def report(label: str, timings: list):
+    if not timings:
+        print(f"{label}: no successful imports")
+        return
+    print(
+        f"{label}: median {statistics.median(timings):.1f}ms, "
+        f"min {min(timings):.1f}ms, max {max(timings):.1f}ms over {len(timings)} runs"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="agents.coding_agent", help="Module to import.")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters per tree.")
+    parser.add_argument("--compare-ref", help="Git revision to measure as the 'before' tree.")
+    parser.add_argument(
+        "--budget-ms", type=float, help="Fail (exit code 1) if the current tree's median import time exceeds this."
+    )
+    args = parser.parse_args()
+
+    if args.compare_ref:
+        with tempfile.TemporaryDirectory() as before_tree:
+            export_revision(args.compare_ref, before_tree)
+            report(f"before ({args.compare_ref})", measure_import(before_tree, args.module, args.runs))
+
+    after = measure_import(os.getcwd(), args.module, args.runs)
+    report("after (working tree)", after)
+
+    if args.budget_ms is not None:
+        if not after:
+            print("Import budget check failed: module could not be imported.")
+            sys.exit(1)
+        median = statistics.median(after)
+        if median > args.budget_ms:
+            print(f"Import budget exceeded: {median:.1f}ms > {args.budget_ms:.1f}ms")
+            sys.exit(1)
+        print(f"Import budget met: {median:.1f}ms <= {args.budget_ms:.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
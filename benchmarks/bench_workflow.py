@@ -0,0 +1,264 @@
+# benchmarks/bench_workflow.py
+"""
+End-to-end workflow benchmark: runs the full ProjectManagerAgent ->
+RequirementsAgent -> CodingAgent workflow offline against a FakeLLM and a fake
+BigQuery client, at several levels of concurrent traces. Reports throughput,
+p50/p99 trace latency and peak RSS per level, and saves the results as JSON so
+runs can be compared over time.
+
+Each level runs in a fresh interpreter, so peak RSS and the shared caches,
+governor and event sink are per level. The LLM response cache is disabled and
+every request is unique, so each trace makes real (fake) model calls.
+
+Usage:
+    python -m benchmarks.bench_workflow
+    python -m benchmarks.bench_workflow --levels 1,10,100 --llm-latency-ms 800 --llm-failure-rate 0.02
+    python -m benchmarks.bench_workflow --baseline .adk_bench/bench_workflow-20260101-120000.json
+"""
+
+import argparse
+import contextlib
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+import asyncio
+import uuid
+
+DEFAULT_LEVELS = "1,10,100,1000"
+DEFAULT_OUTPUT_DIR = "./.adk_bench"
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument(
+        "--levels", default=DEFAULT_LEVELS, help=f"Concurrent traces per level. Defaults to {DEFAULT_LEVELS}."
+    )
+    parser.add_argument("--llm-latency-ms", type=float, default=200.0, help="Median fake LLM latency. Defaults to 200.")
+    parser.add_argument("--llm-sigma", type=float, default=0.5, help="Log-normal spread of LLM latency.")
+    parser.add_argument("--llm-failure-rate", type=float, default=0.0, help="Fraction of failing LLM calls.")
+    parser.add_argument("--bq-latency-ms", type=float, default=50.0, help="Median fake insert latency. Defaults to 50.")
+    parser.add_argument("--bq-failure-rate", type=float, default=0.0, help="Fraction of failing inserts.")
+    parser.add_argument(
+        "--llm-concurrency",
+        type=int,
+        help="Sets ADK_LLM_MAX_CONCURRENCY for the run. Defaults to the environment's setting.",
+    )
+    parser.add_argument("--stream", action="store_true", help="Stream the CodingAgent's output (ADK_STREAM_CODE=1).")
+    parser.add_argument("--seed", type=int, default=1234, help="Seed for the fakes. Defaults to 1234.")
+    parser.add_argument("--timeout", type=float, default=1800.0, help="Seconds allowed per level. Defaults to 1800.")
+    parser.add_argument("--output", "-o", help=f"Result file. Defaults to a timestamped file in {DEFAULT_OUTPUT_DIR}.")
+    parser.add_argument("--baseline", help="A previous result file to compare against.")
+    parser.add_argument("--worker", type=int, help=argparse.SUPPRESS)  # Runs one level in this process
+    return parser.parse_args(argv)
+
+
+def peak_rss_mb() -> float:
+    """
+    Returns this process's peak resident set size in MiB, or None where the
+    `resource` module is unavailable.
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024  # Bytes on macOS, KiB on Linux
+
+
+async def run_level(concurrency: int, args) -> dict:
+    """
+    Runs `concurrency` traces at once through freshly started agents and
+    returns the measurements for this level.
+    """
+    from agents.blob_store import InMemoryBlobStore
+    from agents.coding_agent import CodingAgent
+    from agents.event_backends import BigQueryBackend
+    from agents.fakes import FakeBigQueryClient, FakeLLM
+    from agents.project_manager_agent import ProjectManagerAgent
+    from agents.requirements_agent import RequirementsAgent
+    from agents.scheduler import FairScheduler
+    from agents.trace_analysis import percentile
+    from agents.utils import (
+        BIGQUERY_DATASET,
+        BIGQUERY_TABLE,
+        close_agent_events,
+        set_blob_store,
+        set_event_backend,
+        set_llm_model,
+    )
+    from main import DEFAULT_REQUEST, run_trace
+
+    llm = FakeLLM(
+        latency_ms=args.llm_latency_ms, sigma=args.llm_sigma, failure_rate=args.llm_failure_rate, seed=args.seed
+    )
+    bigquery = FakeBigQueryClient(latency_ms=args.bq_latency_ms, failure_rate=args.bq_failure_rate, seed=args.seed)
+    set_llm_model(llm)
+    set_event_backend(BigQueryBackend("benchmark", BIGQUERY_DATASET, BIGQUERY_TABLE, client=bigquery))
+    set_blob_store(InMemoryBlobStore())
+
+    requirements_agent = RequirementsAgent(name="RequirementsAgent")
+    coding_agent = CodingAgent(name="CodingAgent")
+    project_manager_agent = ProjectManagerAgent(
+        name="ProjectManagerAgent",
+        other_agents={"RequirementsAgent": requirements_agent, "CodingAgent": coding_agent},
+        scheduler=FairScheduler(concurrency),  # Every trace of the level is admitted at once
+    )
+    agents = [project_manager_agent, requirements_agent, coding_agent]
+    agent_tasks = [asyncio.create_task(agent.start()) for agent in agents]
+    await asyncio.gather(*(agent.wait_ready() for agent in agents))
+
+    requests = [
+        {"request": f"{DEFAULT_REQUEST} (benchmark request {index})", "trace_id": str(uuid.uuid4())}
+        for index in range(concurrency)
+    ]
+    start = time.perf_counter()
+    results = await asyncio.gather(*(run_trace(project_manager_agent, request) for request in requests))
+    wall_s = time.perf_counter() - start
+
+    drain_start = time.perf_counter()
+    await close_agent_events()
+    drain_s = time.perf_counter() - drain_start
+    for task in agent_tasks:
+        task.cancel()
+    await asyncio.gather(*agent_tasks, return_exceptions=True)
+
+    latencies_ms = [result["wall_time"] * 1000 for result in results]
+    return {
+        "concurrency": concurrency,
+        "traces": len(results),
+        "failed": sum(1 for result in results if result["error"]),
+        "wall_s": wall_s,
+        "throughput_traces_per_s": len(results) / wall_s,
+        "latency_ms": {
+            "p50": percentile(latencies_ms, 50),
+            "p99": percentile(latencies_ms, 99),
+            "mean": sum(latencies_ms) / len(latencies_ms),
+            "max": max(latencies_ms),
+        },
+        "peak_rss_mb": peak_rss_mb(),
+        "event_drain_s": drain_s,
+        "llm_calls": llm.calls,
+        "llm_failures": llm.failures,
+        "bq_inserts": bigquery.inserts,
+        "bq_failures": bigquery.failures,
+        "bq_rows": bigquery.rows,
+    }
+
+
+def run_worker(args):
+    """
+    Runs one level with all agent output silenced and prints its result as JSON.
+    """
+    stdout = sys.stdout
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        result = asyncio.run(run_level(args.worker, args))
+    stdout.write(json.dumps(result) + "\n")
+
+
+def spawn_level(concurrency: int, argv: list, env: dict, timeout: float) -> dict:
+    """
+    Runs one level in a fresh interpreter and returns its result, or a dict with
+    an `error` if it failed.
+    """
+    command = [sys.executable, "-m", "benchmarks.bench_workflow", *argv, "--worker", str(concurrency)]
+    try:
+        completed = subprocess.run(command, capture_output=True, text=True, env=env, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        return {"concurrency": concurrency, "error": f"timed out after {timeout:.0f}s"}
+    lines = completed.stdout.strip().splitlines()
+    if completed.returncode != 0 or not lines:
+        stderr = completed.stderr.strip().splitlines()
+        return {"concurrency": concurrency, "error": stderr[-1] if stderr else "no output"}
+    return json.loads(lines[-1])
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=False
+        ).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def print_results(results: list, baseline: dict = None):
+    previous = {result["concurrency"]: result for result in (baseline or {}).get("results", [])}
+    print(f"{'traces':>7} {'traces/s':>9} {'p50 ms':>9} {'p99 ms':>9} {'rss MiB':>8} {'failed':>7}  vs baseline")
+    for result in results:
+        if "error" in result:
+            print(f"{result['concurrency']:>7} ERROR: {result['error']}")
+            continue
+        rss = result["peak_rss_mb"]
+        line = (
+            f"{result['concurrency']:>7} {result['throughput_traces_per_s']:>9.2f} "
+            f"{result['latency_ms']['p50']:>9.0f} {result['latency_ms']['p99']:>9.0f} "
+            f"{rss if rss is not None else float('nan'):>8.1f} {result['failed']:>7}"
+        )
+        before = previous.get(result["concurrency"])
+        if before and "error" not in before:
+            throughput = result["throughput_traces_per_s"] / before["throughput_traces_per_s"] - 1
+            p99 = result["latency_ms"]["p99"] / before["latency_ms"]["p99"] - 1
+            line += f"  throughput {throughput:+.1%}, p99 {p99:+.1%}"
+        print(line)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.worker:
+        run_worker(args)
+        return
+
+    levels = [int(level) for level in args.levels.split(",") if level.strip()]
+    env = dict(os.environ, ADK_LLM_CACHE="0", ADK_STREAM_CODE="1" if args.stream else "0")
+    if args.llm_concurrency:
+        env["ADK_LLM_MAX_CONCURRENCY"] = str(args.llm_concurrency)
+    # Everything except the output options is passed on to the per-level workers
+    worker_argv = [
+        f"--llm-latency-ms={args.llm_latency_ms}",
+        f"--llm-sigma={args.llm_sigma}",
+        f"--llm-failure-rate={args.llm_failure_rate}",
+        f"--bq-latency-ms={args.bq_latency_ms}",
+        f"--bq-failure-rate={args.bq_failure_rate}",
+        f"--seed={args.seed}",
+    ]
+
+    print(f"Python {platform.python_version()}, levels {levels}, LLM median {args.llm_latency_ms:g}ms")
+    results = []
+    for concurrency in levels:
+        print(f"Running {concurrency} concurrent trace(s)...", flush=True)
+        results.append(spawn_level(concurrency, worker_argv, env, args.timeout))
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_results(results, baseline)
+
+    started = datetime.datetime.now()
+    output = args.output or os.path.join(DEFAULT_OUTPUT_DIR, f"bench_workflow-{started:%Y%m%d-%H%M%S}.json")
+    if os.path.dirname(output):
+        os.makedirs(os.path.dirname(output), exist_ok=True)
+    report = {
+        "benchmark": "bench_workflow",
+        "timestamp": started.isoformat(timespec="seconds"),
+        "git_revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {
+            key: value for key, value in vars(args).items() if key not in ("worker", "output", "baseline", "levels")
+        },
+        "env": {key: env[key] for key in sorted(env) if key.startswith("ADK_")},
+        "results": results,
+    }
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results saved to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -92,84 +92,311 @@
 #     asyncio.run(main())
 
 # main.py
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
 import asyncio
 import uuid
 
 from agents.coding_agent import CodingAgent
+from agents.llm_calls import create_llm_governor, set_llm_governor
+from agents.mailbox import OVERFLOW_POLICIES, Mailbox
+from agents.metrics import start_metrics_server
 from agents.project_manager_agent import ProjectManagerAgent
 from agents.requirements_agent import RequirementsAgent
-from agents.utils import log_agent_event  # Import for initial logging
+from agents.scheduler import PRIORITIES, FairScheduler
+from agents.tracing import span
+from agents.transport import (
+    TRANSPORTS,
+    WORKER_AGENTS,
+    MessageBroker,
+    WorkerPool,
+    create_transport,
+    parse_worker_counts,
+)
+from agents.utils import close_agent_events, event_backend_name, get_env, log_agent_event  # Import for initial logging
+
+DEFAULT_REQUEST = "Develop a Python script to calculate the nth Fibonacci number, including basic tests."
+# Test cases for simulated failures (pass one as a request to try):
+# "Develop a Python script for a simple calculator with add and subtract. force_req_fail."
+# "Develop a Python script for generating prime numbers up to N. force_code_fail."
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run multi-agent SDLC workflows, one trace per request.")
+    parser.add_argument(
+        "--input",
+        "-i",
+        help="File with one request per line, either plain text or JSONL objects with a 'request' "
+        "field (and optional 'trace_id', 'tenant' and 'priority'). Use '-' for stdin. "
+        "Defaults to a single demo request.",
+    )
+    parser.add_argument(
+        "--concurrency",
+        "-c",
+        type=int,
+        default=4,
+        help="Maximum number of traces running at the same time, shared fairly across tenants. Defaults to 4.",
+    )
+    parser.add_argument(
+        "--metrics-port",
+        type=int,
+        default=None,
+        help="Serve Prometheus metrics on http://127.0.0.1:PORT/metrics while running. "
+        "Defaults to ADK_METRICS_PORT, or off.",
+    )
+    parser.add_argument(
+        "--transport",
+        choices=TRANSPORTS,
+        default=get_env("ADK_TRANSPORT"),
+        help="Carry agent messages over this transport instead of the ADK's in-process routing, "
+        "so agents can run in worker processes. Defaults to ADK_TRANSPORT, or off.",
+    )
+    parser.add_argument(
+        "--broker",
+        default=get_env("ADK_BROKER_ADDRESS"),
+        help="Broker address for --transport broker, e.g. unix:///tmp/adk-broker.sock or tcp://host:7400. "
+        "Defaults to ADK_BROKER_ADDRESS, or a broker started for this run.",
+    )
+    parser.add_argument(
+        "--workers",
+        default="",
+        help="Worker processes per agent type, e.g. CodingAgent=4,RequirementsAgent=2. Agents not listed run "
+        "in this process; 0 means workers started elsewhere (`python -m agents.transport worker`) serve it.",
+    )
+    parser.add_argument(
+        "--mailbox-capacity",
+        type=int,
+        default=None,
+        help="Requests each RequirementsAgent and CodingAgent holds before its overflow policy applies; 0 for "
+        "unbounded. Defaults to ADK_MAILBOX_CAPACITY, or 0. A bounded mailbox implies --transport inprocess.",
+    )
+    parser.add_argument(
+        "--mailbox-policy",
+        choices=OVERFLOW_POLICIES,
+        default=None,
+        help="What a full mailbox does with a new request: block the sender, reject it, or drop the oldest. "
+        "Defaults to ADK_MAILBOX_POLICY, or block.",
+    )
+    args = parser.parse_args(argv)
+    if args.metrics_port is None:
+        args.metrics_port = int(get_env("ADK_METRICS_PORT", "0"))
+    try:
+        args.workers = parse_worker_counts(args.workers)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.workers and args.transport in (None, "inprocess"):
+        parser.error("--workers needs --transport multiprocessing or broker")
+    if not args.transport:
+        capacity = args.mailbox_capacity if args.mailbox_capacity is not None else get_env("ADK_MAILBOX_CAPACITY", "0")
+        if int(capacity) > 0:
+            args.transport = "inprocess"  # The ADK's routing has no mailboxes to bound
+    return args
+
+
+def read_requests(lines) -> list:
+    """
+    Parses workflow requests, one per line. A line starting with '{' is read as a
+    JSON object with a 'request' field and optional 'trace_id', 'tenant' and
+    'priority' ("interactive" or "batch") fields; any other non-blank line is
+    the request text itself.
 
+    Args:
+        lines (iterable): Lines of input.
 
-async def main():
+    Returns:
+        list: Dicts with 'request', 'trace_id', 'tenant' and 'priority' keys (the last two may be None).
     """
-    Main function to initialize and run the multi-agent SDLC workflow.
-    It sets up the agents, provides an initial user request, and orchestrates
-    the flow of tasks and messages between them.
+    requests = []
+    for line_number, line in enumerate(lines, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        if line.startswith("{"):
+            try:
+                record = json.loads(line)
+                request_text = record["request"]
+            except (ValueError, KeyError) as e:
+                raise ValueError(f"Invalid JSONL request on line {line_number}: {e}") from e
+            trace_id = record.get("trace_id")
+            tenant, priority = record.get("tenant"), record.get("priority")
+            if priority is not None and priority not in PRIORITIES:
+                raise ValueError(f"Invalid priority '{priority}' on line {line_number}, expected one of {PRIORITIES}.")
+        else:
+            request_text, trace_id, tenant, priority = line, None, None, None
+        requests.append(
+            {"request": request_text, "trace_id": trace_id or str(uuid.uuid4()), "tenant": tenant, "priority": priority}
+        )
+    return requests
+
+
+def load_requests(input_path: str) -> list:
+    if input_path is None:
+        return read_requests([DEFAULT_REQUEST])
+    if input_path == "-":
+        return read_requests(sys.stdin)
+    with open(input_path, encoding="utf-8") as f:
+        return read_requests(f)
+
+
+async def run_trace(project_manager_agent: ProjectManagerAgent, request: dict) -> dict:
+    """
+    Submits a single workflow trace and waits for the Project Manager to finish
+    it. The Project Manager's scheduler decides when it starts.
+
+    Returns:
+        dict: The trace_id, wall time in seconds and error (None on success).
+    """
+    trace_id = request["trace_id"]
+    async with span("run_trace", kind="workflow", agent_id="MainRunner", trace_id=trace_id) as trace_span:
+        print(f"\nUser: Sending request (Trace ID: {trace_id}): '{request['request']}'")
+        error = None
+        try:
+            # ProjectManagerAgent is designed to handle this message directly; the
+            # handle resolves as soon as the whole workflow for this trace has finished.
+            context = {"trace_id": trace_id}
+            for key in ("tenant", "priority"):
+                if request.get(key) is not None:
+                    context[key] = request[key]
+            handle = project_manager_agent.submit(
+                content=request["request"], sender_id="User", context=trace_span.inject(context)
+            )
+            await handle
+        except Exception as e:
+            error = str(e)
+            trace_span.record_error(e)
+            print(f"MainRunner: Trace {trace_id} failed: {e}")
+        wall_time = trace_span.elapsed_ms() / 1000
+
+        # Log a final event indicating this workflow's conclusion
+        await log_agent_event(
+            event_type="WORKFLOW_FINALIZED",
+            agent_id="MainRunner",
+            trace_id=trace_id,
+            message_summary="Multi-agent SDLC workflow initiated by MainRunner has concluded.",
+            duration_ms=int(wall_time * 1000),
+            status="FAILURE" if error else "COMPLETE",
+            details={"error": error} if error else None,
+        )
+    return {"trace_id": trace_id, "wall_time": wall_time, "error": error}
+
+
+async def start_transport(args) -> tuple:
+    """
+    Creates the transport selected by --transport, starting a broker for this
+    run when the broker transport has no address.
+
+    Returns:
+        tuple: (transport, embedded MessageBroker or None), or (None, None) for the ADK's routing.
     """
-    print("Initializing agents...")
-    # Instantiate agents
-    requirements_agent = RequirementsAgent(name="RequirementsAgent")
-    coding_agent = CodingAgent(name="CodingAgent")
+    if not args.transport:
+        return None, None
+    broker = None
+    address = args.broker
+    if args.transport == "broker" and not address:
+        address = f"unix://{os.path.join(tempfile.mkdtemp(prefix='adk-broker-'), 'broker.sock')}"
+        broker = MessageBroker(address)
+        await broker.start()
+        print(f"MainRunner: Started a message broker on {address}")
+    agent_ids = ["ProjectManagerAgent", *WORKER_AGENTS]
+    return create_transport(args.transport, agent_ids=agent_ids, address=address), broker
+
+
+def create_agents(args, scheduler: FairScheduler) -> tuple:
+    """
+    Instantiates the agents. Agent types given worker processes run there instead of here.
 
+    Returns:
+        tuple: (ProjectManagerAgent, dict of the other in-process agents by name).
+    """
+    other_agents = {
+        name: agent_class(name=name)
+        for name, agent_class in (("RequirementsAgent", RequirementsAgent), ("CodingAgent", CodingAgent))
+        if name not in args.workers
+    }
     # The ProjectManagerAgent needs references to other agents to send messages
     # This is a simple way to connect them for local execution.
     project_manager_agent = ProjectManagerAgent(
         name="ProjectManagerAgent",
-        other_agents={
-            "RequirementsAgent": requirements_agent,
-            "CodingAgent": coding_agent,
-        },
+        other_agents=other_agents,
+        scheduler=scheduler,
     )
+    return project_manager_agent, other_agents
 
-    # In ADK, agents need to be "registered" or "started" for the internal
-    # message routing to work. `Agent.start()` usually makes them listen.
-    # We create tasks for all agents to run concurrently.
-    agent_tasks = [
-        asyncio.create_task(project_manager_agent.start()),
-        asyncio.create_task(requirements_agent.start()),
-        asyncio.create_task(coding_agent.start()),
-    ]
-    print("All agents started and listening...")
-
-    # Give them a moment to initialize fully
-    await asyncio.sleep(1)
-
-    # Simulate an initial user request to the ProjectManagerAgent
-    user_request = "Develop a Python script to calculate the nth Fibonacci number, including basic tests."
-    # Test cases for simulated failures (uncomment one to try):
-    # user_request = "Develop a Python script for a simple calculator with add and subtract. force_req_fail."
-    # user_request = "Develop a Python script for generating prime numbers up to N. force_code_fail."
-
-    # For the initial message from a "User" to the PM agent, we directly call handle_message.
-    # ADK's internal routing takes over for messages between agents.
-    initial_trace_id = str(uuid.uuid4())  # Generate a new trace_id for this session
-    initial_context = {"trace_id": initial_trace_id}
 
-    print(
-        f"\nUser: Sending initial request (Trace ID: {initial_trace_id}): '{user_request}'"
-    )
-    # ProjectManagerAgent is designed to handle this message directly
-    await project_manager_agent.handle_message(
-        content=user_request, sender_id="User", context=initial_context
-    )
+def connect_transport(args, transport, agents: list, llm_in_process: bool) -> list:
+    """
+    Attaches the in-process agents to `transport` and starts the worker pools.
 
-    # Allow time for all agents to complete their tasks and log
-    # This sleep is crucial for async operations to complete before the script exits.
-    print("\nWaiting for agents to complete their workflow...")
-    await asyncio.sleep(30)  # Adjust based on how long LLM calls take
-
-    # Log a final event indicating the overall workflow conclusion
-    await log_agent_event(
-        event_type="WORKFLOW_FINALIZED",
-        agent_id="MainRunner",
-        trace_id=initial_trace_id,  # Use the initial trace_id for the overall workflow
-        message_summary="Multi-agent SDLC workflow initiated by MainRunner has concluded.",
-        status="COMPLETE",
-    )
+    Returns:
+        list: The started WorkerPools.
+    """
+    for agent in agents:
+        mailbox = None
+        if not agent.receives_replies:
+            mailbox = Mailbox.from_env(agent.name, args.mailbox_capacity, args.mailbox_policy)
+        agent.attach_transport(transport, mailbox=mailbox)
+    # Every process making model calls has its own governor, so each gets an even share of the quota
+    llm_processes = (1 if llm_in_process else 0) + sum(args.workers.values())
+    llm_share = float(get_env("ADK_LLM_QUOTA_SHARE", "1")) / max(1, llm_processes)
+    pools = []
+    for agent_name, processes in args.workers.items():
+        if processes:
+            pools.append(
+                WorkerPool(
+                    agent_name,
+                    transport,
+                    processes,
+                    mailbox_capacity=args.mailbox_capacity,
+                    mailbox_policy=args.mailbox_policy,
+                    llm_share=llm_share * processes,
+                )
+            )
+            pools[-1].start()
+    # This process keeps its own share, without changing ADK_LLM_QUOTA_SHARE for the rest of it
+    set_llm_governor(create_llm_governor(share=llm_share))
+    print(f"MainRunner: Messages go through the {transport.name} transport; workers: {args.workers or 'none'}")
+    return pools
+
+
+def print_summary(results: list, batch_time: float, scheduler: FairScheduler):
+    print("\nMainRunner: Per-trace wall time:")
+    for result in results:
+        outcome = f"FAILED ({result['error']})" if result["error"] else "OK"
+        print(f"  {result['trace_id']}: {result['wall_time']:.2f}s {outcome}")
+    failed = sum(1 for result in results if result["error"])
     print(
-        "MainRunner: Workflow initiated by user has concluded. Check BigQuery for traces."
+        f"MainRunner: {len(results)} trace(s) finished in {batch_time:.2f}s "
+        f"({len(results) / batch_time:.2f} traces/s, {failed} failed)."
     )
+    tenants = scheduler.stats()["tenants"]
+    if len(tenants) > 1:
+        for tenant, stats in tenants.items():
+            print(
+                f"MainRunner: Tenant {tenant}: {stats['admitted']} trace(s), queue wait "
+                f"avg {stats['avg_queue_wait_ms']:.0f}ms, max {stats['max_queue_wait_ms']:.0f}ms."
+            )
+    backend = event_backend_name()
+    if backend == "sqlite":
+        print("MainRunner: Inspect traces with `python -m agents.trace_store traces`.")
+    elif backend == "jsonl":
+        path = get_env("ADK_EVENT_JSONL_PATH", "./.adk_events/agent_events.jsonl")
+        print(f"MainRunner: Events were appended to {path}; load them with `python -m agents.trace_store ingest {path}`.")
+    else:
+        print("MainRunner: Check BigQuery for traces.")
+
+
+async def shutdown(agent_tasks: list, pools: list, transport, broker):
+    """
+    Delivers buffered events, cancels the agent tasks, and stops the worker
+    pools, the transport and the embedded broker, if any.
+    """
+    # Deliver every buffered event before shutting down
+    await close_agent_events()
 
     # Gracefully cancel agent tasks
     for task in agent_tasks:
@@ -178,6 +405,58 @@ async def main():
     await asyncio.gather(*agent_tasks, return_exceptions=True)
     print("All agent tasks cancelled.")
 
+    # Workers flush their own events when stopped
+    for pool in pools:
+        pool.stop()
+    if transport is not None:
+        await transport.close()
+    if broker is not None:
+        await broker.close()
+
+
+async def main(argv=None):
+    """
+    Main function to initialize and run the multi-agent SDLC workflow.
+    It sets up the agents, runs every input request as an independent trace with
+    a bounded concurrency, and shuts down as soon as every trace has finished.
+    """
+    args = parse_args(argv)
+    requests = load_requests(args.input)
+    if not requests:
+        print("No requests to run.")
+        return
+
+    if args.metrics_port:
+        start_metrics_server(args.metrics_port)
+        print(f"MainRunner: Serving metrics on http://127.0.0.1:{args.metrics_port}/metrics")
+
+    transport, broker = await start_transport(args)
+    agent_tasks, pools = [], []
+    try:
+        print("Initializing agents...")
+        scheduler = FairScheduler.from_env(args.concurrency)
+        project_manager_agent, other_agents = create_agents(args, scheduler)
+        agents = [project_manager_agent, *other_agents.values()]
+        if transport is not None:
+            pools = connect_transport(args, transport, agents, bool(other_agents))
+
+        # In ADK, agents need to be "registered" or "started" for the internal
+        # message routing to work. `Agent.start()` usually makes them listen.
+        # We create tasks for all agents to run concurrently.
+        agent_tasks = [asyncio.create_task(agent.start()) for agent in agents]
+
+        # Wait until every agent is listening
+        await asyncio.gather(*(agent.wait_ready() for agent in agents))
+        print("All agents started and listening...")
+
+        print(f"\nMainRunner: Running {len(requests)} request(s) with concurrency {args.concurrency}...")
+        batch_start = time.perf_counter()
+        results = await asyncio.gather(*(run_trace(project_manager_agent, request) for request in requests))
+        print_summary(results, time.perf_counter() - batch_start, scheduler)
+    finally:
+        # Also runs when setup or a trace fails, so workers, sockets and buffered events are not leaked
+        await shutdown(agent_tasks, pools, transport, broker)
+
 
 if __name__ == "__main__":
     asyncio.run(main())
@@ -0,0 +1,44 @@
+-- schema/agent_events.sql
+--
+-- BigQuery table that agents.event_backends.BigQueryBackend streams events into
+-- (dataset and table from agents.utils.BIGQUERY_DATASET / BIGQUERY_TABLE).
+-- Safe to run repeatedly: it creates the table, or adds the columns an older
+-- table is missing. Run it before deploying a version that adds event columns;
+-- until then the backend leaves the missing columns out of every row.
+--
+--   bq query --use_legacy_sql=false < schema/agent_events.sql
+
+CREATE TABLE IF NOT EXISTS `adk_traces.agent_events` (
+  timestamp TIMESTAMP,
+  trace_id STRING,
+  event_id STRING,
+  agent_id STRING,
+  event_type STRING,
+  message_summary STRING,
+  source_agent_id STRING,
+  target_agent_id STRING,
+  duration_ms INTEGER,
+  status STRING,
+  details JSON,
+  schema_version INTEGER,
+  span_id STRING,
+  parent_span_id STRING
+);
+
+-- Rows record the version of their layout (agents.events.SCHEMA_VERSION)
+ALTER TABLE `adk_traces.agent_events` ADD COLUMN IF NOT EXISTS schema_version INTEGER;
+
+-- Row schema version 3: the span each event belongs to, and that span's parent
+ALTER TABLE `adk_traces.agent_events` ADD COLUMN IF NOT EXISTS span_id STRING;
+ALTER TABLE `adk_traces.agent_events` ADD COLUMN IF NOT EXISTS parent_span_id STRING;
+
+-- Tables created before `details` became a JSON column have it as STRING.
+-- The backend writes the same JSON text to either, and readers parse both,
+-- so such tables keep working. BigQuery cannot ALTER a column from STRING to
+-- JSON; to convert one, pause the writers and rebuild the table. Schema
+-- version 1 rows hold a Python repr rather than JSON and are kept as
+-- {"raw": ...}, as agents.events.loads_details does for unparsable values.
+--
+--   CREATE OR REPLACE TABLE `adk_traces.agent_events` AS
+--   SELECT * REPLACE (COALESCE(SAFE.PARSE_JSON(details), TO_JSON(STRUCT(details AS raw))) AS details)
+--   FROM `adk_traces.agent_events`;
@@ -0,0 +1,68 @@
+# tests/test_event_sink.py
+
+import asyncio
+
+from agents.event_sink import BatchingEventSink
+
+
+class Recorder:
+    """An async `insert_rows` that records every batch it is given."""
+
+    def __init__(self):
+        self.batches = []
+
+    async def insert_rows(self, rows: list, row_ids: list):
+        await asyncio.sleep(0)
+        self.batches.append(rows)
+
+    @property
+    def rows(self) -> list:
+        return [row for batch in self.batches for row in batch]
+
+
+def test_close_delivers_every_row_in_batches():
+    recorder = Recorder()
+
+    async def run():
+        sink = BatchingEventSink(recorder.insert_rows, max_batch_size=4, flush_interval=0.05)
+        for index in range(10):
+            await sink.submit({"event_id": index})
+        await sink.close()
+        return sink
+
+    sink = asyncio.run(run())
+
+    assert [row["event_id"] for row in recorder.rows] == list(range(10))
+    assert max(len(batch) for batch in recorder.batches) <= 4
+    assert sink._worker is None
+
+
+def test_worker_stops_when_cancelled_while_rows_are_submitted():
+    recorder = Recorder()
+
+    async def producer(sink: BatchingEventSink, stop: asyncio.Event):
+        index = 0
+        while not stop.is_set():
+            await sink.submit({"event_id": index})
+            index += 1
+            await asyncio.sleep(0)
+
+    async def run():
+        sink = BatchingEventSink(recorder.insert_rows, max_batch_size=8, flush_interval=0.01)
+        stop = asyncio.Event()
+        producers = [asyncio.create_task(producer(sink, stop)) for _ in range(4)]
+        for _ in range(50):
+            await asyncio.sleep(0.001)
+            worker = sink._worker
+            worker.cancel()
+            # A swallowed cancellation would leave the worker running and this wait would time out
+            await asyncio.wait_for(asyncio.gather(worker, return_exceptions=True), 1)
+            assert worker.cancelled()
+            await sink.submit({"event_id": "restart"})  # The next submission starts a new worker
+        stop.set()
+        await asyncio.gather(*producers)
+        await asyncio.wait_for(sink.close(), 5)
+
+    asyncio.run(run())
+
+    assert recorder.rows
@@ -0,0 +1,102 @@
+# tests/test_event_spool.py
+
+import json
+
+import pytest
+
+from agents.event_spool import CHECKPOINT_FILE, EventSpool, SpoolReplayer
+
+
+class StandInWarehouse:
+    """
+    A local stand-in for `insert_rows_json`. Like a BigQuery table, it rejects
+    rows with fields it does not have as "invalid" and stops the rest of the
+    request, and it de-duplicates rows on their insert IDs.
+    """
+
+    def __init__(self, columns=("event_id", "event_type"), outage=False):
+        self.columns = set(columns)
+        self.outage = outage
+        self.rows = {}
+        self.calls = 0
+
+    def insert_rows(self, rows: list, row_ids: list) -> list:
+        self.calls += 1
+        if self.outage:
+            raise ConnectionError("warehouse unreachable")
+        invalid = {index for index, row in enumerate(rows) if set(row) - self.columns}
+        if not invalid:
+            self.rows.update(zip(row_ids, rows))
+            return []
+        return [
+            {"index": index, "errors": [{"reason": "invalid" if index in invalid else "stopped", "message": "..."}]}
+            for index in range(len(rows))
+        ]
+
+
+def make_spool(tmp_path, warehouse: StandInWarehouse, rows: list) -> tuple:
+    spool = EventSpool(str(tmp_path), fsync="never")
+    spool.append(rows)
+    return spool, SpoolReplayer(spool, warehouse.insert_rows, batch_size=10)
+
+
+def row(event_id: str, **extra) -> dict:
+    return dict({"event_id": event_id, "event_type": "AGENT_START"}, **extra)
+
+
+def test_replay_delivers_rows_and_advances_the_checkpoint(tmp_path):
+    warehouse = StandInWarehouse()
+    spool, replayer = make_spool(tmp_path, warehouse, [row("e1"), row("e2")])
+
+    assert replayer.replay_once() == 2
+    assert set(warehouse.rows) == {"e1", "e2"}
+    assert replayer.pending_bytes() == 0
+    assert json.loads((tmp_path / CHECKPOINT_FILE).read_text())["segment"] == spool.active_segment
+
+    spool.append([row("e3")])
+    assert replayer.replay_once() == 1
+    assert set(warehouse.rows) == {"e1", "e2", "e3"}
+
+
+def test_outage_keeps_rows_spooled_until_the_warehouse_recovers(tmp_path):
+    warehouse = StandInWarehouse(outage=True)
+    spool, replayer = make_spool(tmp_path, warehouse, [row("e1"), row("e2")])
+
+    with pytest.raises(ConnectionError):
+        replayer.replay_once()
+    assert replayer.pending_bytes() > 0
+
+    warehouse.outage = False
+    assert replayer.replay_once() == 2
+    assert set(warehouse.rows) == {"e1", "e2"}
+    assert not (tmp_path / "dead_letter.jsonl").exists()
+
+
+def test_permanently_rejected_rows_are_dead_lettered(tmp_path):
+    warehouse = StandInWarehouse()
+    spool, replayer = make_spool(tmp_path, warehouse, [row("e1"), row("bad", span_id="s1"), row("e3")])
+
+    replayer.replay_once()
+
+    # The valid rows get through and the spool is drained instead of retrying forever
+    assert set(warehouse.rows) == {"e1", "e3"}
+    assert replayer.pending_bytes() == 0
+    dead = [json.loads(line) for line in (tmp_path / "dead_letter.jsonl").read_text().splitlines()]
+    assert [entry["row"]["event_id"] for entry in dead] == ["bad"]
+    assert dead[0]["errors"][0]["reason"] == "invalid"
+
+    calls = warehouse.calls
+    replayer.replay_once()
+    assert warehouse.calls == calls
+    assert "dead_letter.jsonl" not in spool.segments()
+
+
+def test_retryable_row_errors_are_not_dead_lettered(tmp_path):
+    spool = EventSpool(str(tmp_path), fsync="never")
+    spool.append([row("e1")])
+    replayer = SpoolReplayer(spool, lambda rows, row_ids: [{"index": 0, "errors": [{"reason": "backendError"}]}])
+
+    with pytest.raises(RuntimeError):
+        replayer.replay_once()
+    assert replayer.pending_bytes() > 0
+    assert not (tmp_path / "dead_letter.jsonl").exists()
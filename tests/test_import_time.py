@@ -0,0 +1,41 @@
+# tests/test_import_time.py
+
+import os
+import statistics
+import subprocess
+import sys
+
+import pytest
+
+from benchmarks.bench_import import measure_import
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Median time allowed for `import agents.coding_agent` in a fresh interpreter
+IMPORT_BUDGET_MS = float(os.environ.get("ADK_IMPORT_BUDGET_MS", "1500"))
+
+# Modules that must only be loaded on first use, not on import
+LAZY_MODULES = ("google.genai", "google.cloud.bigquery", "dotenv")
+
+pytest.importorskip("google.adk", reason="the agents need the ADK")
+
+
+def test_import_stays_within_budget():
+    timings = measure_import(REPO_ROOT, "agents.coding_agent", runs=3)
+
+    assert timings, "agents.coding_agent could not be imported"
+    assert statistics.median(timings) <= IMPORT_BUDGET_MS
+
+
+def test_import_does_not_initialize_clients():
+    snippet = (
+        "import sys, agents.coding_agent, agents.utils as utils; "
+        f"print([name for name in {LAZY_MODULES!r} if name in sys.modules]); "
+        "print(utils._llm_model is None and utils._event_backend is None)"
+    )
+    result = subprocess.run([sys.executable, "-c", snippet], cwd=REPO_ROOT, capture_output=True, text=True)
+
+    assert result.returncode == 0, result.stderr
+    loaded, lazy = result.stdout.strip().splitlines()[-2:]
+    assert loaded == "[]"
+    assert lazy == "True"
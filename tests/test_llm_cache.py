@@ -0,0 +1,48 @@
+# tests/test_llm_cache.py
+
+import time
+
+import asyncio
+
+from agents.llm_cache import DiskCache, LLMResponseCache, MemoryLRUCache
+
+
+def test_memory_cache_evicts_the_least_recently_used_entry():
+    cache = MemoryLRUCache(max_entries=2)
+    cache.put("a", "A")
+    cache.put("b", "B")
+    assert cache.get("a") == "A"  # "b" is now the least recently used
+
+    cache.put("c", "C")
+
+    assert len(cache) == 2
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == ("A", "C")
+
+
+def test_disk_cache_entries_expire_after_their_ttl(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, "time", lambda: now[0])
+    cache = DiskCache(str(tmp_path / "cache" / "llm.sqlite3"), ttl_seconds=60)
+    cache.put("key", "response")
+
+    now[0] += 59
+    assert cache.get("key") == "response"
+
+    now[0] += 1
+    assert cache.get("key") is None
+    assert cache.evict_expired() == 1
+    cache.close()
+
+
+def test_disk_hits_are_promoted_to_memory(tmp_path):
+    disk = DiskCache(str(tmp_path / "llm.sqlite3"))
+    disk.put("key", "response")
+    cache = LLMResponseCache(MemoryLRUCache(), disk)
+
+    async def run():
+        return await cache.get("key"), await cache.get("key"), await cache.get("other")
+
+    assert asyncio.run(run()) == (("response", "disk"), ("response", "memory"), (None, None))
+    assert cache.counters() == {"hits": 2, "misses": 1, "memory_entries": 1}
+    disk.close()
@@ -0,0 +1,96 @@
+# tests/test_llm_governor.py
+
+import asyncio
+import pytest
+
+from agents.llm_governor import LLMGovernor
+
+
+def make_governor(**settings) -> LLMGovernor:
+    settings = dict({"requests_per_minute": 0, "max_concurrency": 8, "max_retries": 0, "backoff_base": 0}, **settings)
+    return LLMGovernor(**settings)
+
+
+def run_concurrently(governor: LLMGovernor, calls: list) -> list:
+    """
+    Starts one `governor.run` per (agent_id, call) pair, in order, and returns their outcomes.
+    """
+
+    async def run():
+        tasks = [asyncio.create_task(governor.run(agent_id, 1, call)) for agent_id, call in calls]
+        return await asyncio.gather(*tasks, return_exceptions=True)
+
+    return asyncio.run(run())
+
+
+def throttled_call(started: list):
+    async def call():
+        started.append(None)
+        await asyncio.sleep(0.01)  # Every call is in flight before the first one fails
+        raise RuntimeError("429 Resource exhausted")
+
+    return call
+
+
+def test_throttling_cuts_the_limit_once_per_window():
+    governor = make_governor()
+    started = []
+
+    outcomes = run_concurrently(governor, [("CodingAgent", throttled_call(started)) for _ in range(8)])
+
+    # Eight calls in flight report the same congestion: one decrease, not eight
+    assert len(started) == 8
+    assert all(isinstance(outcome, RuntimeError) for outcome in outcomes)
+    assert governor.throttled == 8
+    assert governor.concurrency_limit == 4
+
+    # A call admitted after the decrease that is throttled again starts a new window
+    run_concurrently(governor, [("CodingAgent", throttled_call(started))])
+    assert governor.concurrency_limit == 2
+
+
+def test_successes_raise_the_limit_and_cancellations_leave_it():
+    governor = make_governor()
+    governor.concurrency_limit = 4.0
+
+    async def succeed():
+        return "ok"
+
+    [(result, _)] = run_concurrently(governor, [("CodingAgent", succeed)])
+    assert result == "ok"
+    assert governor.concurrency_limit == pytest.approx(4.25)
+
+    async def run_and_cancel():
+        task = asyncio.create_task(governor.run("CodingAgent", 1, lambda: asyncio.sleep(10)))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    asyncio.run(run_and_cancel())
+    assert governor.concurrency_limit == pytest.approx(4.25)
+    assert governor.in_flight == 0
+
+
+def test_waiting_calls_are_admitted_round_robin_across_agents():
+    governor = make_governor(max_concurrency=1)
+    order = []
+
+    async def run():
+        gate = asyncio.Event()
+        blocker = asyncio.create_task(governor.run("Blocker", 1, gate.wait))
+
+        def call(label: str):
+            async def record():
+                order.append(label)
+
+            return record
+
+        requests = [("A", "a1"), ("A", "a2"), ("A", "a3"), ("B", "b1"), ("B", "b2")]
+        tasks = [asyncio.create_task(governor.run(agent_id, 1, call(label))) for agent_id, label in requests]
+        await asyncio.sleep(0)  # Every call is queued behind the blocker
+        gate.set()
+        await asyncio.gather(blocker, *tasks)
+
+    asyncio.run(run())
+
+    assert order == ["a1", "b1", "a2", "b2", "a3"]
@@ -0,0 +1,58 @@
+# tests/test_llm_hedging.py
+
+import asyncio
+
+from agents.llm_hedging import first_valid, hedged_call
+
+
+class ScriptedCall:
+    """
+    A call whose successive invocations take the given latencies and return
+    the given results, recording which invocations were cancelled.
+    """
+
+    def __init__(self, latencies: list, results: list):
+        self.latencies = latencies
+        self.results = results
+        self.started = 0
+        self.cancelled = []
+
+    async def __call__(self):
+        index = self.started
+        self.started += 1
+        try:
+            await asyncio.sleep(self.latencies[index])
+        except asyncio.CancelledError:
+            self.cancelled.append(index)
+            raise
+        return self.results[index]
+
+
+def test_hedge_wins_and_the_slow_original_is_cancelled():
+    call = ScriptedCall(latencies=[10, 0.01], results=["slow", "fast"])
+    hedges = []
+
+    async def on_hedge(index: int):
+        hedges.append(index)
+
+    result = asyncio.run(hedged_call(call, delay=0.02, on_hedge=on_hedge))
+
+    assert result == ("fast", 1, 2)
+    assert hedges == [1]
+    assert call.cancelled == [0]
+
+
+def test_no_hedge_when_the_original_returns_in_time():
+    call = ScriptedCall(latencies=[0.01, 0.01], results=["first", "second"])
+
+    assert asyncio.run(hedged_call(call, delay=0.5)) == ("first", 0, 1)
+    assert call.started == 1
+
+
+def test_first_valid_candidate_wins_and_the_rest_are_cancelled():
+    call = ScriptedCall(latencies=[0.01, 0.02, 10], results=["invalid", "valid", "late"])
+
+    result = asyncio.run(first_valid(call, candidates=3, validator=lambda text: text == "valid"))
+
+    assert result == ("valid", 1, 3)
+    assert call.cancelled == [2]
@@ -0,0 +1,77 @@
+# tests/test_mailbox.py
+
+import asyncio
+import pytest
+
+from agents.mailbox import Mailbox
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def fill(mailbox: Mailbox, messages: list) -> list:
+    """
+    Puts `messages` in order and drains the mailbox.
+
+    Returns:
+        list: (messages shed by the puts, messages left in the mailbox).
+    """
+
+    async def run():
+        shed = [await mailbox.put(message) for message in messages]
+        left = [(await mailbox.get())[0] for _ in range(mailbox.depth)]
+        return [message for message in shed if message is not None], left
+
+    return asyncio.run(run())
+
+
+def test_reject_sheds_the_new_message():
+    mailbox = Mailbox("CodingAgent", capacity=2, policy="reject")
+
+    shed, left = fill(mailbox, ["m1", "m2", "m3"])
+
+    assert shed == ["m3"]
+    assert left == ["m1", "m2"]
+    assert mailbox.stats()["shed"] == 1
+
+
+def test_drop_oldest_sheds_the_oldest_message():
+    mailbox = Mailbox("CodingAgent", capacity=2, policy="drop_oldest")
+
+    shed, left = fill(mailbox, ["m1", "m2", "m3"])
+
+    assert shed == ["m1"]
+    assert left == ["m2", "m3"]
+    assert mailbox.stats()["shed"] == 1
+
+
+def test_block_waits_for_space_and_reports_the_wait():
+    clock = FakeClock()
+    mailbox = Mailbox("CodingAgent", capacity=1, policy="block", clock=clock)
+
+    async def run():
+        await mailbox.put("m1")
+        sender = asyncio.create_task(mailbox.put("m2"))
+        await asyncio.sleep(0)
+        blocked = not sender.done()
+        clock.now = 2.0
+        first = await mailbox.get()
+        assert await sender is None
+        return blocked, first, await mailbox.get()
+
+    blocked, first, second = asyncio.run(run())
+
+    assert blocked
+    assert first == ("m1", 2.0)
+    assert second == ("m2", 2.0)  # The wait counts from when the sender started blocking
+    assert mailbox.stats()["shed"] == 0
+
+
+def test_unknown_policy_is_rejected():
+    with pytest.raises(ValueError):
+        Mailbox("CodingAgent", capacity=1, policy="drop_newest")
@@ -0,0 +1,128 @@
+# tests/test_scheduler.py
+
+import asyncio
+import pytest
+
+from agents.scheduler import FairScheduler, parse_tenant_settings, request_class
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def admission_order(scheduler: FairScheduler, clock: FakeClock, requests: list) -> tuple:
+    """
+    Queues `requests` ((label, tenant, priority) tuples) in order, then finishes
+    admitted workflows one at a time, oldest first, advancing the clock by one
+    second per finished workflow.
+
+    Returns:
+        tuple: (labels in admission order, label -> queue wait in milliseconds).
+    """
+
+    async def run():
+        order, waits = [], {}
+
+        async def workflow(label: str, tenant: str, priority: str):
+            waits[label] = await scheduler.acquire(tenant, priority)
+            order.append(label)
+
+        tenants = {label: tenant for label, tenant, _ in requests}
+        tasks = [asyncio.create_task(workflow(*request)) for request in requests]
+        await asyncio.sleep(0)  # Every request is queued, and the first ones admitted
+        for finished in range(len(requests)):
+            await asyncio.sleep(0)  # Admitted workflows record themselves
+            clock.now += 1.0
+            scheduler.release(tenants[order[finished]])
+        await asyncio.gather(*tasks)
+        return order, waits
+
+    return asyncio.run(run())
+
+
+def test_tenants_share_slots_fairly():
+    clock = FakeClock()
+    scheduler = FairScheduler(1, clock=clock)
+    requests = [(f"A{i}", "A", "batch") for i in range(4)] + [(f"B{i}", "B", "batch") for i in range(2)]
+
+    order, _ = admission_order(scheduler, clock, requests)
+
+    # B's requests arrived after all of A's, yet the tenants alternate once both are queued
+    assert order == ["A0", "A1", "B0", "A2", "B1", "A3"]
+
+
+def test_interactive_work_has_strict_priority():
+    clock = FakeClock()
+    scheduler = FairScheduler(1, clock=clock)
+    requests = [(f"bulk{i}", "bulk", "batch") for i in range(3)] + [
+        ("ui0", "alice", "interactive"),
+        ("ui1", "bob", "interactive"),
+    ]
+
+    order, waits = admission_order(scheduler, clock, requests)
+
+    assert order == ["bulk0", "ui0", "ui1", "bulk1", "bulk2"]
+    assert waits == {"bulk0": 0.0, "ui0": 1000.0, "ui1": 2000.0, "bulk1": 3000.0, "bulk2": 4000.0}
+
+
+def test_weights_set_each_tenants_share():
+    clock = FakeClock()
+    scheduler = FairScheduler(1, weights={"A": 2}, clock=clock)
+    requests = [(f"A{i}", "A", "batch") for i in range(6)] + [(f"B{i}", "B", "batch") for i in range(3)]
+
+    order, _ = admission_order(scheduler, clock, requests)
+
+    assert order == ["A0", "A1", "A2", "B0", "A3", "A4", "B1", "A5", "B2"]
+
+
+def test_concurrency_caps_skip_a_busy_tenant():
+    clock = FakeClock()
+    scheduler = FairScheduler(3, caps={"A": 1}, clock=clock)
+    requests = [(f"A{i}", "A", "batch") for i in range(3)] + [(f"B{i}", "B", "batch") for i in range(3)]
+
+    order, _ = admission_order(scheduler, clock, requests)
+
+    assert order[:3] == ["A0", "B0", "B1"]
+    assert scheduler.stats()["tenants"]["A"]["admitted"] == 3
+
+
+def test_stats_report_per_tenant_queue_wait():
+    clock = FakeClock()
+    scheduler = FairScheduler(1, clock=clock)
+    requests = [("A0", "A", "batch"), ("A1", "A", "batch"), ("B0", "B", "batch")]
+
+    admission_order(scheduler, clock, requests)
+
+    tenants = scheduler.stats()["tenants"]
+    assert tenants["A"] == {
+        "admitted": 2,
+        "running": 0,
+        "queued": 0,
+        "avg_queue_wait_ms": 500.0,
+        "max_queue_wait_ms": 1000.0,
+    }
+    assert tenants["B"]["max_queue_wait_ms"] == 2000.0
+
+
+@pytest.mark.parametrize("weight", [0, -1.5])
+def test_non_positive_weights_are_rejected(weight):
+    with pytest.raises(ValueError):
+        FairScheduler(1, weights={"A": weight})
+
+
+def test_request_class_defaults_and_validation():
+    assert request_class({"trace_id": "t"}) == ("default", "batch")
+    assert request_class({"tenant": "acme", "priority": "interactive"}) == ("acme", "interactive")
+    with pytest.raises(ValueError):
+        request_class({"priority": "urgent"})
+
+
+def test_parse_tenant_settings():
+    assert parse_tenant_settings("acme=3, globex=0.5") == {"acme": 3.0, "globex": 0.5}
+    assert parse_tenant_settings("") == {}
+    with pytest.raises(ValueError):
+        parse_tenant_settings("acme")
@@ -0,0 +1,77 @@
+# tests/test_single_flight.py
+
+import asyncio
+import pytest
+
+from agents.single_flight import SingleFlight
+
+
+class CountingCall:
+    """A call that counts its invocations and finishes when `release` is set."""
+
+    def __init__(self, result=None, error: Exception = None):
+        self.result = result
+        self.error = error
+        self.calls = 0
+        self.release = None
+
+    async def __call__(self):
+        self.calls += 1
+        await self.release.wait()
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+def run_callers(flight: SingleFlight, call: CountingCall, callers: int = 3) -> list:
+    async def run():
+        call.release = asyncio.Event()
+        tasks = [asyncio.create_task(flight.do("key", call)) for _ in range(callers)]
+        await asyncio.sleep(0)  # Every caller has joined the call in flight
+        call.release.set()
+        return await asyncio.gather(*tasks, return_exceptions=True)
+
+    return asyncio.run(run())
+
+
+def test_concurrent_callers_share_one_result():
+    flight = SingleFlight()
+    call = CountingCall(result="code")
+
+    outcomes = run_callers(flight, call)
+
+    assert call.calls == 1
+    assert outcomes == [("code", False), ("code", True), ("code", True)]
+    assert flight.in_flight() == 0
+
+
+def test_concurrent_callers_share_one_exception():
+    flight = SingleFlight()
+    error = RuntimeError("model unavailable")
+    call = CountingCall(error=error)
+
+    outcomes = run_callers(flight, call)
+
+    assert call.calls == 1
+    assert outcomes == [error, error, error]
+    assert "key" not in flight
+
+
+def test_cancelling_a_waiter_does_not_cancel_the_shared_call():
+    flight = SingleFlight()
+    call = CountingCall(result="code")
+
+    async def run():
+        call.release = asyncio.Event()
+        first = asyncio.create_task(flight.do("key", call))
+        second = asyncio.create_task(flight.do("key", call))
+        await asyncio.sleep(0)
+        first.cancel()  # The caller that started the call goes away
+        await asyncio.sleep(0)
+        call.release.set()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(run()) == ("code", True)
+    assert call.calls == 1
@@ -0,0 +1,51 @@
+# tests/test_workflow.py
+
+from types import SimpleNamespace
+
+import asyncio
+
+from agents.workflow import ReplyDemultiplexer
+
+
+def reply(text: str, trace_id: str) -> SimpleNamespace:
+    return SimpleNamespace(content=text, context={"trace_id": trace_id})
+
+
+def make_demultiplexer(replies: list, active: set) -> ReplyDemultiplexer:
+    inbox = asyncio.Queue()
+    for message in replies:
+        inbox.put_nowait(message)
+
+    async def receive(sender_id: str, trace_id: str):
+        return await inbox.get()
+
+    return ReplyDemultiplexer(receive, is_active=lambda trace_id: trace_id in active)
+
+
+def test_late_and_unknown_trace_replies_are_dropped():
+    async def run():
+        replies = [reply("late", "finished"), reply("stray", "unknown"), reply("code", "t1")]
+        demultiplexer = make_demultiplexer(replies, active={"t1"})
+        text = await demultiplexer.wait_for("CodingAgent", "t1")
+        return text, demultiplexer._parked
+
+    text, parked = asyncio.run(run())
+
+    assert text == "code"
+    assert parked == {}
+
+
+def test_replies_for_active_traces_are_parked_until_awaited():
+    async def run():
+        replies = [reply("code 2", "t2"), reply("code 1", "t1")]
+        demultiplexer = make_demultiplexer(replies, active={"t1", "t2"})
+        first = await demultiplexer.wait_for("CodingAgent", "t1")
+        parked = list(demultiplexer._parked)
+        second = await demultiplexer.wait_for("CodingAgent", "t2")
+        return first, parked, second
+
+    first, parked, second = asyncio.run(run())
+
+    assert first == "code 1"
+    assert parked == [("CodingAgent", "t2")]
+    assert second == "code 2"